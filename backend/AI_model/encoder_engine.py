@@ -0,0 +1,111 @@
+# encoder_engine.py
+"""Table-driven URL encoder producing the same ids as encoders_from_notebook.
+
+CHAR2ID / TOKCHAR2ID are compiled into dense code-point lookup tables, so encoding a
+string is a single NumPy gather (``np.frombuffer`` over the ASCII bytes in the common
+case). Each URL is normalised and tokenised once and the tokens are shared by the word
+and token-char encodings. Whole batches are encoded by concatenating every URL (or
+token) into one string, gathering once and scattering into the padded output arrays.
+"""
+from typing import List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from AI_model.utils_from_notebook import PAD_ID, UNK_ID, TOKEN_SPLIT, normalize_url
+
+
+def build_char_table(char2id: Mapping[str, int]) -> np.ndarray:
+    """Dense code point -> id table; code points missing from the vocab map to UNK_ID."""
+    singles = {k: v for k, v in char2id.items() if len(k) == 1}
+    size = max([256] + [ord(k) + 1 for k in singles])
+    table = np.full(size, UNK_ID, np.int64)
+    for ch, idx in singles.items():
+        table[ord(ch)] = idx
+    return table
+
+
+def lookup_chars(table: np.ndarray, s: str) -> np.ndarray:
+    """Map every character of ``s`` to its id through ``table``."""
+    if s.isascii():
+        return table[np.frombuffer(s.encode("ascii"), np.uint8)]
+    codes = np.frombuffer(s.encode("utf-32-le", "surrogatepass"), np.uint32)
+    ids = np.full(codes.shape[0], UNK_ID, np.int64)
+    known = codes < table.shape[0]
+    ids[known] = table[codes[known]]
+    return ids
+
+
+def _scatter_index(lengths: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """(row, col) positions of each element when ragged rows of ``lengths`` are left-aligned."""
+    lens = np.asarray(lengths, np.int64)
+    rows = np.repeat(np.arange(lens.shape[0]), lens)
+    starts = np.repeat(np.cumsum(lens) - lens, lens)
+    cols = np.arange(rows.shape[0]) - starts
+    return rows, cols
+
+
+class UrlEncoder:
+    def __init__(self, char2id: Mapping[str, int], word2id: Mapping[str, int], tokenchar2id: Mapping[str, int],
+                 max_len: int = 256, max_words: int = 64, max_tok_char: int = 16):
+        self.char_table = build_char_table(char2id)
+        self.tokchar_table = build_char_table(tokenchar2id)
+        self.word2id = word2id
+        self.max_len = max_len
+        self.max_words = max_words
+        self.max_tok_char = max_tok_char
+
+    @staticmethod
+    def tokenize(u: str) -> Tuple[str, List[str]]:
+        """Return (normalized_url, word_tokens) for one URL."""
+        s = normalize_url(u)
+        return s, [t for t in TOKEN_SPLIT.split(s) if t]
+
+    def encode(self, u: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Encode one URL into ([max_len], [max_words], [max_words, max_tok_char]) arrays."""
+        x_char, x_word, x_tokc = self.encode_batch([u])
+        return x_char[0], x_word[0], x_tokc[0]
+
+    def encode_batch(self, urls: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.encode_tokenized([self.tokenize(u) for u in urls])
+
+    def encode_tokenized(self, items: Sequence[Tuple[str, List[str]]], max_len: Optional[int] = None,
+                         max_words: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Encode pre-tokenised (normalized_url, tokens) pairs; see ``tokenize``.
+
+        ``max_len`` / ``max_words`` override the padded widths for this call (e.g. to trim a
+        length-bucketed batch); inputs longer than them are truncated as usual.
+        """
+        n = len(items)
+        L = self.max_len if max_len is None else max_len
+        W = self.max_words if max_words is None else max_words
+        C = self.max_tok_char
+        x_char = np.full((n, L), PAD_ID, np.int64)
+        x_word = np.full((n, W), PAD_ID, np.int64)
+        x_tokc = np.full((n, W, C), PAD_ID, np.int64)
+        if n == 0:
+            return x_char, x_word, x_tokc
+
+        # char_url: one gather over every URL's first L characters
+        chars = [s[:L] for s, _ in items]
+        rows, cols = _scatter_index([len(c) for c in chars])
+        x_char[rows, cols] = lookup_chars(self.char_table, "".join(chars))
+
+        # word ids: dict lookup per token, scattered in one assignment
+        toks = [t[:W] for _, t in items]
+        flat = [tok for ts in toks for tok in ts]
+        if not flat:
+            return x_char, x_word, x_tokc
+        rows, cols = _scatter_index([len(ts) for ts in toks])
+        lookup_many = getattr(self.word2id, "lookup_many", None)
+        if lookup_many is not None:
+            # Array-backed vocab (AI_model/vocab_array.py): one vectorised binary search
+            x_word[rows, cols] = lookup_many(flat, UNK_ID)
+        else:
+            get = self.word2id.get
+            x_word[rows, cols] = np.fromiter((get(t, UNK_ID) for t in flat), np.int64, len(flat))
+
+        # token chars: one gather over every token's first C characters
+        pieces = [t[:C] for t in flat]
+        tok_idx, char_idx = _scatter_index([len(p) for p in pieces])
+        x_tokc[rows[tok_idx], cols[tok_idx], char_idx] = lookup_chars(self.tokchar_table, "".join(pieces))
+        return x_char, x_word, x_tokc
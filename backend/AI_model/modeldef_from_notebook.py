@@ -2,27 +2,55 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Optional
+
+
+def _resolve_projection(in_dim: int, conv_in: int, proj_in_out: Optional[tuple]) -> nn.Module:
+    """Projection from the branch input width to the conv width, fixed when the model is built."""
+    if proj_in_out is not None:
+        if tuple(proj_in_out) != (in_dim, conv_in):
+            raise RuntimeError(f"Checkpoint projection maps {proj_in_out[0]} -> {proj_in_out[1]} features, "
+                               f"but the branch feeds {in_dim} features into convs expecting {conv_in}.")
+        return nn.Linear(in_dim, conv_in, bias=True)
+    if in_dim != conv_in:
+        raise RuntimeError(f"Branch input has {in_dim} features but its convs expect {conv_in}, "
+                           "and the checkpoint has no projection between them.")
+    return nn.Identity()
+
+# How the token-char branch pools each word's characters:
+#   dense               - nn.Embedding lookup to [B*W, C, Dt], then mean over C (the notebook's original path)
+#   bag                 - fused nn.EmbeddingBag sum / C: the same padding-inclusive mean, no [B*W, C, Dt] tensor
+#   bag_exclude_padding - nn.EmbeddingBag mean over the non-padding characters only (not what the model was
+#                         trained on; scores shift for short words)
+TOK_POOLING_MODES = ("dense", "bag", "bag_exclude_padding")
+
 
 class _Branch(nn.Module):
     def __init__(self, vocab_size: int, emb_dim: int,
-                 conv_specs: List[tuple], proj_in_out=None, emb_name="emb", padding_idx=0):
+                 conv_specs: List[tuple], proj_in_out=None, emb_name="emb", padding_idx=0,
+                 in_dim: Optional[int] = None, tok_pooling: str = "dense"):
         super().__init__()
+        if tok_pooling not in TOK_POOLING_MODES:
+            raise ValueError(f"Unknown token pooling '{tok_pooling}'. Expected one of {TOK_POOLING_MODES}.")
+        self.tok_pooling = tok_pooling
         if emb_name == "word_emb":
             self.word_emb = nn.Embedding(vocab_size, emb_dim, padding_idx=padding_idx)
             self.emb = None
-        else:
+        elif tok_pooling == "dense":
             self.emb = nn.Embedding(vocab_size, emb_dim, padding_idx=padding_idx)
             self.word_emb = None
+        else:
+            # Same "emb.weight" parameter as nn.Embedding, so checkpoints load unchanged
+            exclude = tok_pooling == "bag_exclude_padding"
+            self.emb = nn.EmbeddingBag(vocab_size, emb_dim, mode="mean" if exclude else "sum",
+                                       padding_idx=padding_idx if exclude else None)
+            self.word_emb = None
 
         self._conv_in = conv_specs[0][1]  # in_ch from first conv
 
-        self.proj = None
-        if proj_in_out is not None:
-            in_dim, out_dim = proj_in_out
-            self.proj = nn.Linear(in_dim, out_dim, bias=True)
-        elif self._conv_in != emb_dim:
-            self.proj = nn.Linear(emb_dim, self._conv_in, bias=True)
+        # Width of the features fed to the convs: the embedding, or a merged [word | token-char] tensor
+        in_dim = emb_dim if in_dim is None else in_dim
+        self.proj = _resolve_projection(in_dim, self._conv_in, proj_in_out)
 
         self.convs = nn.ModuleList()
         for (out_ch, in_ch, k) in conv_specs:
@@ -31,25 +59,29 @@ class _Branch(nn.Module):
     def _embed(self, x):
         return self.emb(x) if self.emb is not None else self.word_emb(x)
 
+    def _pool_tokens(self, x_tokc: torch.Tensor) -> torch.Tensor:
+        """[B, W, C] token-char ids -> [B, W, Dt] per-word mean character embedding."""
+        B, W, C = x_tokc.shape
+        flat = x_tokc.reshape(B * W, C)
+        if self.tok_pooling == "dense":
+            return self.emb(flat).mean(dim=1).view(B, W, -1)
+        # A 2-D input is a batch of fixed-length bags (offsets 0, C, 2C, ...)
+        pooled = self.emb(flat)
+        if self.tok_pooling == "bag":
+            pooled = pooled / C
+        return pooled.view(B, W, -1)
+
     def _maybe_project(self, x_e: torch.Tensor) -> torch.Tensor:
-        in_feat = x_e.shape[-1]
-        need = self._conv_in
-        if in_feat == need:
-            if self.proj is not None and getattr(self.proj, "in_features", None) == need and getattr(self.proj, "out_features", None) == need:
-                return self.proj(x_e)
-            return x_e
-
-        #  in_feat -> need
-        if self.proj is None or getattr(self.proj, "in_features", None) != in_feat or getattr(self.proj, "out_features", None) != need:
-            self.proj = nn.Linear(in_feat, need, bias=True)
+        # Shapes were resolved at build time: a checkpoint Linear or an Identity
         return self.proj(x_e)
 
     def _apply_convs(self, x_e):  # x_e: [B, L, D]
         x = x_e.transpose(1, 2)   # [B, D, L]
         outs = []
         for conv in self.convs:
-            y = F.relu(conv(x))
-            y = F.max_pool1d(y, y.shape[2]).squeeze(2)  # [B, out_ch]
+            # Global max over time (same values as max_pool1d over the full length), written as a
+            # reduction so traced/exported graphs do not bake in the sequence length
+            y = torch.amax(F.relu(conv(x)), dim=2)  # [B, out_ch]
             outs.append(y)
         return outs[0] if len(outs) == 1 else torch.cat(outs, dim=1)
 
@@ -70,60 +102,72 @@ class URLNetDynamic(nn.Module):
         self._branch_names = list(branches.keys())
         self.fc = nn.Linear(fc_in_features, 1)
 
-    def forward(self, x_char, x_word, x_tokc):
-        outs = []
+    def branch_features(self, x_char, x_word, x_tokc, only: Optional[Tuple[str, ...]] = None) -> Dict[str, torch.Tensor]:
+        """Pooled conv features per fc input group, in fc column order.
+
+        Keys are ``char_url`` and ``word_cnn`` (which includes the merged token-char
+        embeddings), or ``char_tok`` when it is the only word-level branch. ``only`` limits
+        the computation to those groups (e.g. for a cheap first cascade stage).
+        """
+        feats: Dict[str, torch.Tensor] = {}
 
         # 1) char_url
-        if hasattr(self, "char_url"):
-            outs.append(getattr(self, "char_url")(x_char))  # expects [B, Lc]
+        if hasattr(self, "char_url") and (only is None or "char_url" in only):
+            feats["char_url"] = getattr(self, "char_url")(x_char)  # expects [B, Lc]
 
         # 2) word_cnn +char_tok
         has_word = hasattr(self, "word_cnn")
         has_tok  = hasattr(self, "char_tok")
 
         if has_word:
-            word_br: _Branch = getattr(self, "word_cnn")
-            word_e = word_br._embed(x_word)  # [B, W, Dw]
-
-            if has_tok:
-                tok_br: _Branch = getattr(self, "char_tok")
-                # x_tokc: [B, W, C]
-                B, W, C = x_tokc.shape
-                flat = x_tokc.reshape(B * W, C)     # [B*W, C]
-                tok_e = tok_br._embed(flat)         # [B*W, C, Dt]
-                tok_e = tok_e.mean(dim=1)           # [B*W, Dt]
-                tok_e = tok_e.view(B, W, -1)        # [B, W, Dt]
-
-                # [B, W, Dw+Dt]
-                merged = torch.cat([word_e, tok_e], dim=2)
-                out_word = word_br.forward(merged)
-            else:
-                out_word = word_br.forward(x_word)
-
-            outs.append(out_word)
+            if only is None or "word_cnn" in only:
+                word_br: _Branch = getattr(self, "word_cnn")
+                word_e = word_br._embed(x_word)  # [B, W, Dw]
+
+                if has_tok:
+                    tok_br: _Branch = getattr(self, "char_tok")
+                    # x_tokc: [B, W, C]
+                    tok_e = tok_br._pool_tokens(x_tokc)  # [B, W, Dt]
+
+                    # [B, W, Dw+Dt]
+                    merged = torch.cat([word_e, tok_e], dim=2)
+                    feats["word_cnn"] = word_br.forward(merged)
+                else:
+                    feats["word_cnn"] = word_br.forward(x_word)
+
+        elif has_tok and (only is None or "char_tok" in only):
+            tok_br: _Branch = getattr(self, "char_tok")
+            tok_e = tok_br._pool_tokens(x_tokc)  # [B,W,Dt]
+            tok_e = tok_br._maybe_project(tok_e)
+            feats["char_tok"] = tok_br._apply_convs(tok_e)
+        return feats
+
+    def embed(self, x_char, x_word, x_tokc) -> torch.Tensor:
+        """Penultimate features: the concatenated branch outputs that ``fc`` scores, [B, fc_in]."""
+        outs = list(self.branch_features(x_char, x_word, x_tokc).values())
+        return torch.cat(outs, dim=1) if len(outs) > 1 else outs[0]
 
-        else:
-            if has_tok:
-                tok_br: _Branch = getattr(self, "char_tok")
-                B, W, C = x_tokc.shape
-                flat = x_tokc.reshape(B * W, C)
-                tok_e = tok_br._embed(flat).mean(dim=1).view(B, W, -1)  # [B,W,Dt]
-                tok_e = tok_br._maybe_project(tok_e)
-                outs.append(tok_br._apply_convs(tok_e))
-
-        h = torch.cat(outs, dim=1) if len(outs) > 1 else outs[0]
+    def forward(self, x_char, x_word, x_tokc):
+        h = self.embed(x_char, x_word, x_tokc)
         logit = self.fc(h)
         prob = torch.sigmoid(logit)
         return {"logit": logit.squeeze(1), "prob": prob.squeeze(1)}
 
-def _branch_from_sd(prefix: str, sd: dict, declared_vocab_size: int, padding_idx=0) -> Tuple[_Branch, int]:
+def _embedding_from_sd(prefix: str, sd: dict) -> Tuple[str, torch.Tensor]:
     if f"{prefix}.emb.weight" in sd:
-        emb_w = sd[f"{prefix}.emb.weight"]; emb_name = "emb"
-    elif f"{prefix}.word_emb.weight" in sd:
-        emb_w = sd[f"{prefix}.word_emb.weight"]; emb_name = "word_emb"
-    else:
-        raise RuntimeError(f"Missing embedding for '{prefix}' in checkpoint.")
+        return "emb", sd[f"{prefix}.emb.weight"]
+    if f"{prefix}.word_emb.weight" in sd:
+        return "word_emb", sd[f"{prefix}.word_emb.weight"]
+    raise RuntimeError(f"Missing embedding for '{prefix}' in checkpoint.")
+
+
+def _branch_from_sd(prefix: str, sd: dict, declared_vocab_size: int, padding_idx=0,
+                    in_dim: Optional[int] = None, tok_pooling: str = "dense") -> Tuple[_Branch, int]:
+    emb_name, emb_w = _embedding_from_sd(prefix, sd)
     ckpt_vocab_rows, emb_dim = emb_w.shape
+    if declared_vocab_size > ckpt_vocab_rows:
+        raise RuntimeError(f"'{prefix}' vocabulary uses ids up to {declared_vocab_size - 1}, "
+                           f"but the checkpoint embedding has only {ckpt_vocab_rows} rows.")
 
     conv_specs = []
     i = 0
@@ -134,24 +178,41 @@ def _branch_from_sd(prefix: str, sd: dict, declared_vocab_size: int, padding_idx
         i += 1
     if not conv_specs:
         raise RuntimeError(f"No convs found for '{prefix}' in checkpoint.")
+    if len({in_ch for (_, in_ch, _) in conv_specs}) != 1:
+        raise RuntimeError(f"Convs of '{prefix}' disagree on their input width: {conv_specs}")
 
     proj_in_out = None
     if f"{prefix}.proj.weight" in sd and f"{prefix}.proj.bias" in sd:
         pw = sd[f"{prefix}.proj.weight"]  # [out, in]
         proj_in_out = (pw.shape[1], pw.shape[0])  # (in, out)
 
-    br = _Branch(
-        vocab_size=ckpt_vocab_rows,
-        emb_dim=emb_dim,
-        conv_specs=conv_specs,
-        proj_in_out=proj_in_out,
-        emb_name=emb_name,
-        padding_idx=padding_idx,
-    )
+    try:
+        br = _Branch(
+            vocab_size=ckpt_vocab_rows,
+            emb_dim=emb_dim,
+            conv_specs=conv_specs,
+            proj_in_out=proj_in_out,
+            emb_name=emb_name,
+            padding_idx=padding_idx,
+            in_dim=in_dim,
+            tok_pooling=tok_pooling,
+        )
+    except RuntimeError as e:
+        raise RuntimeError(f"'{prefix}': {e}") from None
     out_total = sum(o for (o, _, _) in conv_specs)
     return br, out_total
 
-def build_urlnet_from_state_dict(CHAR2ID: dict, WORD2ID: dict, TOKCHAR2ID: dict, sd: dict) -> nn.Module:
+def _id_space(vocab: dict) -> int:
+    # Ids are used directly as embedding rows, so the table needs max(id) + 1 rows
+    return max(vocab.values(), default=0) + 1
+
+
+def build_urlnet_from_state_dict(CHAR2ID: dict, WORD2ID: dict, TOKCHAR2ID: dict, sd: dict,
+                                tok_pooling: str = "bag") -> nn.Module:
+    """Build URLNetDynamic with every layer shape taken from ``sd``; raises RuntimeError on any mismatch.
+
+    ``tok_pooling`` picks the token-char pooling implementation (see TOK_POOLING_MODES).
+    """
     def has_prefix(pfx: str) -> bool:
         return any(k.startswith(pfx + ".") for k in sd.keys())
 
@@ -159,23 +220,83 @@ def build_urlnet_from_state_dict(CHAR2ID: dict, WORD2ID: dict, TOKCHAR2ID: dict,
     fc_in = 0
 
     if has_prefix("char_url"):
-        br, c = _branch_from_sd("char_url", sd, len(CHAR2ID))
+        br, c = _branch_from_sd("char_url", sd, _id_space(CHAR2ID))
         branches["char_url"] = br; fc_in += c
 
+    tok_dim = None
+    if has_prefix("char_tok"):
+        tok_dim = _embedding_from_sd("char_tok", sd)[1].shape[1]
+
     if has_prefix("word_cnn"):
-        br, c = _branch_from_sd("word_cnn", sd, len(WORD2ID))
+        # With char_tok present, word_cnn convolves the [word emb | mean token-char emb] concatenation
+        word_dim = _embedding_from_sd("word_cnn", sd)[1].shape[1]
+        br, c = _branch_from_sd("word_cnn", sd, _id_space(WORD2ID),
+                                in_dim=word_dim + tok_dim if tok_dim is not None else None)
         branches["word_cnn"] = br; fc_in += c
 
     if has_prefix("char_tok"):
-
-        br, _ = _branch_from_sd("char_tok", sd, len(TOKCHAR2ID))
+        if "word_cnn" in branches:
+            # Only the embedding is used (merged into word_cnn); its own proj/convs never run
+            w = sd.get("char_tok.proj.weight", sd.get("char_tok.convs.0.weight"))
+            unused_in = w.shape[1] if w is not None else None
+            br, _ = _branch_from_sd("char_tok", sd, _id_space(TOKCHAR2ID), in_dim=unused_in,
+                                    tok_pooling=tok_pooling)
+        else:
+            br, c = _branch_from_sd("char_tok", sd, _id_space(TOKCHAR2ID), tok_pooling=tok_pooling)
+            fc_in += c  # standalone token-char branch feeds fc directly
         branches["char_tok"] = br
 
-    if "fc.weight" in sd:
-        fc_in = sd["fc.weight"].shape[1]
+    if not branches:
+        raise RuntimeError("Checkpoint contains no URLNet branches.")
+    if "fc.weight" in sd and sd["fc.weight"].shape[1] != fc_in:
+        raise RuntimeError(f"fc expects {sd['fc.weight'].shape[1]} features but the branches produce {fc_in}.")
 
     model = URLNetDynamic(branches, fc_in)
-    model.load_state_dict(sd, strict=False)
+    # Extra checkpoint keys (optimizer leftovers etc.) are tolerated; missing ones are not
+    missing = model.load_state_dict(sd, strict=False).missing_keys
+    if missing:
+        raise RuntimeError(f"Checkpoint is missing weights for: {', '.join(missing)}")
     model.eval()
     return model
 
+
+def random_urlnet_state_dict(char_vocab: int, word_vocab: int, tok_vocab: int, *,
+                             emb_dim: int = 32, tok_dim: int = 16, channels: int = 32,
+                             kernels=(3, 4, 5), seed: int = 0, char_only: bool = False) -> dict:
+    """Randomly initialised checkpoint laid out like the notebook export.
+
+    Three branches by default, or just ``char_url`` + ``fc`` with ``char_only``. Loads
+    through ``build_urlnet_from_state_dict``; used by tests, benchmarks and as the starting
+    point of distilled students.
+    """
+    g = torch.Generator().manual_seed(seed)
+
+    def rand(*shape):
+        return torch.randn(*shape, generator=g) * 0.1
+
+    def emb(rows, dim):
+        w = rand(rows, dim)
+        w[0] = 0.0  # padding row
+        return w
+
+    sd = {"char_url.emb.weight": emb(char_vocab, emb_dim)}
+    for i, k in enumerate(kernels):
+        sd[f"char_url.convs.{i}.weight"] = rand(channels, emb_dim, k)
+        sd[f"char_url.convs.{i}.bias"] = rand(channels)
+    if char_only:
+        sd["fc.weight"] = rand(1, channels * len(kernels))
+        sd["fc.bias"] = rand(1)
+        return sd
+
+    sd.update({"word_cnn.word_emb.weight": emb(word_vocab, emb_dim),
+               "word_cnn.proj.weight": rand(emb_dim, emb_dim + tok_dim),
+               "word_cnn.proj.bias": rand(emb_dim),
+               "char_tok.emb.weight": emb(tok_vocab, tok_dim)})
+    for i, k in enumerate(kernels):
+        sd[f"word_cnn.convs.{i}.weight"] = rand(channels, emb_dim, k)
+        sd[f"word_cnn.convs.{i}.bias"] = rand(channels)
+    sd["char_tok.convs.0.weight"] = rand(channels, tok_dim, 3)
+    sd["char_tok.convs.0.bias"] = rand(channels)
+    sd["fc.weight"] = rand(1, 2 * channels * len(kernels))
+    sd["fc.bias"] = rand(1)
+    return sd
@@ -0,0 +1,125 @@
+# vocab_array.py
+"""Array-backed, read-only str -> id vocabularies.
+
+``ArrayVocab`` replaces a ``dict`` of str -> int with a sorted ``uint64`` array of stable
+64-bit key hashes (BLAKE2b) plus an aligned id array; lookups hash the key and binary-search
+with ``np.searchsorted`` (vectorised over a whole batch in ``lookup_many``). The keys
+themselves are only kept as the vocab bundle's UTF-8 blob, for iteration.
+
+A dict costs ~100 bytes per entry in every worker; the lookup arrays cost 12 bytes per entry
+(plus the key bytes, touched only when iterating), and when they come from a vocab bundle opened with
+``np.load(mmap_mode="r")`` they live in the page cache once per node instead of once per
+worker. The build refuses vocabularies with colliding hashes; an out-of-vocabulary key
+can only be mistaken for a known one on a 64-bit hash collision (~n / 2**64).
+"""
+import hashlib
+import sys
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+
+
+def key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=8).digest(), "little")
+
+
+def hash_keys(keys: Iterable[str], count: int = -1) -> np.ndarray:
+    return np.fromiter((key_hash(k) for k in keys), np.uint64, count)
+
+
+def build_hash_index(vocab: Dict[str, int]) -> tuple:
+    """(sorted hashes, ids in hash order) for ``vocab``; ValueError if two keys share a hash."""
+    hashes = hash_keys(vocab.keys(), len(vocab))
+    ids = np.fromiter(vocab.values(), np.int64, len(vocab))
+    order = np.argsort(hashes, kind="stable")
+    hashes, ids = hashes[order], ids[order]
+    if ids.shape[0] and 0 <= ids.min() and ids.max() < 2 ** 31:
+        ids = ids.astype(np.int32)
+    if hashes.shape[0] > 1 and (hashes[1:] == hashes[:-1]).any():
+        raise ValueError("Vocabulary has colliding 64-bit key hashes; keep it as a dict")
+    return hashes, ids
+
+
+def dict_memory_bytes(vocab: Dict[str, int]) -> int:
+    """Approximate heap size of a str -> int dict (the table plus its key and value objects)."""
+    # Small ints are cached by the interpreter, so only larger ids are counted
+    return sys.getsizeof(vocab) + sum(sys.getsizeof(k) + (sys.getsizeof(v) if v > 256 else 0)
+                                      for k, v in vocab.items())
+
+
+class ArrayVocab(Mapping):
+    def __init__(self, hashes: np.ndarray, hash_ids: np.ndarray, keys_blob: Optional[np.ndarray] = None,
+                 key_offsets: Optional[np.ndarray] = None, key_ids: Optional[np.ndarray] = None,
+                 separator: Optional[str] = None):
+        self.hashes = hashes
+        self.hash_ids = hash_ids
+        self._keys = (keys_blob, key_offsets, key_ids, separator)
+        self._max_id = int(hash_ids.max()) if hash_ids.shape[0] else 0
+
+    @classmethod
+    def from_dict(cls, vocab: Dict[str, int]) -> "ArrayVocab":
+        from AI_model.vocab_bundle import _pick_separator, pack_vocab
+
+        sep = _pick_separator(vocab)
+        blob, offsets, ids = pack_vocab(vocab, sep)
+        return cls(*build_hash_index(vocab), blob, offsets, ids, sep)
+
+    def _find(self, h: int) -> int:
+        i = int(np.searchsorted(self.hashes, np.uint64(h)))
+        return i if i < self.hashes.shape[0] and int(self.hashes[i]) == h else -1
+
+    def get(self, key, default=None):
+        i = self._find(key_hash(key)) if isinstance(key, str) else -1
+        return int(self.hash_ids[i]) if i >= 0 else default
+
+    def __getitem__(self, key):
+        i = self._find(key_hash(key)) if isinstance(key, str) else -1
+        if i < 0:
+            raise KeyError(key)
+        return int(self.hash_ids[i])
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self._find(key_hash(key)) >= 0
+
+    def lookup_many(self, keys: Sequence[str], default: int) -> np.ndarray:
+        """Ids of ``keys`` (``default`` for unknown ones) as an int64 array, one searchsorted for all."""
+        if not len(self):
+            return np.full(len(keys), default, np.int64)
+        h = hash_keys(keys, len(keys))
+        pos = np.minimum(np.searchsorted(self.hashes, h), len(self) - 1)
+        return np.where(self.hashes[pos] == h, self.hash_ids[pos], default).astype(np.int64)
+
+    def __len__(self) -> int:
+        return int(self.hashes.shape[0])
+
+    def _key_list(self) -> list:
+        from AI_model.vocab_bundle import unpack_keys
+
+        blob, offsets, _, sep = self._keys
+        if blob is None:
+            raise TypeError("This ArrayVocab was built without its keys and cannot be iterated")
+        return unpack_keys(blob, offsets, sep)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._key_list())
+
+    def items(self):
+        return zip(self._key_list(), self._keys[2].tolist())
+
+    def values(self):
+        return self.hash_ids.tolist()
+
+    @property
+    def max_id(self) -> int:
+        return self._max_id
+
+    @property
+    def shared(self) -> bool:
+        """True when the lookup arrays are memory-mapped (shared through the page cache)."""
+        return isinstance(self.hashes, np.memmap) or isinstance(getattr(self.hashes, "base", None), np.memmap)
+
+    @property
+    def memory_bytes(self) -> int:
+        arrays = (self.hashes, self.hash_ids) + tuple(a for a in self._keys[:3] if a is not None)
+        return int(sum(a.nbytes for a in arrays))
@@ -0,0 +1,172 @@
+# vocab_bundle.py
+"""Precompiled binary form of meta.json for fast model startup.
+
+``build_bundle`` turns the CHAR2ID / WORD2ID / TOKCHAR2ID dicts into sorted key arrays
+plus id arrays, stored as plain .npy files so they can be opened with
+``np.load(mmap_mode="r")`` instead of parsing ~570 KB of JSON in every worker:
+
+    vocab_bundle/
+        bundle.json             # MAX_* limits, vocab sizes, sha256 of the source meta.json
+        <name>_keys.npy         # uint8: UTF-8 bytes of the sorted keys, each followed by a separator
+                                # character none of them contains (recorded in bundle.json)
+        <name>_offsets.npy      # int64 [n + 1]: code-point start of each key in the decoded keys
+        <name>_ids.npy          # int64 [n]: id of each sorted key
+        <name>_hashes.npy       # uint64 [n]: sorted 64-bit key hashes (see AI_model/vocab_array.py)
+        <name>_hash_ids.npy     # int64 [n]: id of each hash
+
+``load_meta(..., arrays=True)`` serves the vocabularies straight from the memory-mapped
+arrays as ``ArrayVocab`` mappings instead of rebuilding dicts.
+
+Build it next to meta.json (``URLScorer`` picks it up automatically when its source
+checksum matches the JSON):
+
+    python -m AI_model.vocab_bundle AI_model/meta.json
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from AI_model.vocab_array import ArrayVocab, build_hash_index
+
+BUNDLE_DIR = "vocab_bundle"
+BUNDLE_FORMAT = 2
+VOCABS = ("CHAR2ID", "WORD2ID", "TOKCHAR2ID")
+LIMITS = {"MAX_LEN": 256, "MAX_WORDS": 64, "MAX_TOK_CHAR": 16}
+
+
+def _sha256(path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def bundle_path_for(meta_path) -> Path:
+    return Path(meta_path).parent / BUNDLE_DIR
+
+
+def pack_vocab(vocab: Dict[str, int], separator: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(keys_utf8, offsets, ids) for ``vocab`` with keys in sorted order.
+
+    Keys are joined with ``separator`` (if given). ``offsets[i]`` is the code-point start of
+    key ``i``, which ends at ``offsets[i + 1] - len(separator)``.
+    """
+    keys = sorted(vocab)
+    step = len(separator) if separator else 0
+    lengths = np.fromiter((len(k) + step for k in keys), np.int64, len(keys))
+    offsets = np.zeros(len(keys) + 1, np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    text = "".join(k + (separator or "") for k in keys)
+    blob = np.frombuffer(text.encode("utf-8"), np.uint8)
+    ids = np.fromiter((vocab[k] for k in keys), np.int64, len(keys))
+    return blob, offsets, ids
+
+
+def _pick_separator(keys) -> Optional[str]:
+    """A character no key contains, so the keys can be split back in one C-level call."""
+    for sep in ("\n", "\x00", "\x1f"):
+        if not any(sep in k for k in keys):
+            return sep
+    return None
+
+
+def unpack_keys(blob: np.ndarray, offsets: np.ndarray, separator: Optional[str] = None) -> list:
+    text = bytes(blob).decode("utf-8")
+    if separator:
+        # One C-level split instead of a Python slice per key
+        return text.split(separator)[:-1]
+    bounds = offsets.tolist()
+    return [text[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def build_bundle(meta_path, out_dir=None) -> Path:
+    """Compile ``meta_path`` into a vocab bundle directory (written atomically)."""
+    meta_path = Path(meta_path)
+    out_dir = Path(out_dir) if out_dir else bundle_path_for(meta_path)
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    staging = out_dir.with_name(f".{out_dir.name}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    info = {
+        "format": BUNDLE_FORMAT,
+        "source_sha256": _sha256(meta_path),
+        "limits": {k: meta.get(k, v) for k, v in LIMITS.items()},
+        "sizes": {},
+        "separators": {},
+    }
+    for name in VOCABS:
+        sep = _pick_separator(meta[name])
+        blob, offsets, ids = pack_vocab(meta[name], sep)
+        info["separators"][name] = sep
+        np.save(staging / f"{name}_keys.npy", blob)
+        np.save(staging / f"{name}_offsets.npy", offsets)
+        np.save(staging / f"{name}_ids.npy", ids)
+        hashes, hash_ids = build_hash_index(meta[name])
+        np.save(staging / f"{name}_hashes.npy", hashes)
+        np.save(staging / f"{name}_hash_ids.npy", hash_ids)
+        info["sizes"][name] = int(ids.shape[0])
+    (staging / "bundle.json").write_text(json.dumps(info, indent=2), encoding="utf-8")
+
+    # Swap the finished bundle into place so a concurrently starting worker never sees half of it
+    if out_dir.exists():
+        old = out_dir.with_name(f".{out_dir.name}.old")
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(out_dir, old)
+        os.replace(staging, out_dir)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.replace(staging, out_dir)
+    return out_dir
+
+
+BUNDLE_PARTS = ("keys", "offsets", "ids", "hashes", "hash_ids")
+
+
+def load_bundle_arrays(bundle_dir, mmap: bool = True) -> Tuple[dict, Dict[str, Tuple[np.ndarray, ...]]]:
+    """(bundle.json info, {vocab name: (keys_utf8, offsets, ids, hashes, hash_ids)}) with arrays memory-mapped."""
+    bundle_dir = Path(bundle_dir)
+    info = json.loads((bundle_dir / "bundle.json").read_text(encoding="utf-8"))
+    if info.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported vocab bundle format: {info.get('format')}")
+    mode = "r" if mmap else None
+    arrays = {
+        name: tuple(np.load(bundle_dir / f"{name}_{part}.npy", mmap_mode=mode) for part in BUNDLE_PARTS)
+        for name in VOCABS
+    }
+    return info, arrays
+
+
+def load_meta(meta_path, verify: bool = True, arrays: bool = False) -> Optional[dict]:
+    """meta.json contents rebuilt from its bundle, or None if there is no (up-to-date) bundle.
+
+    With ``arrays`` the vocabularies are memory-mapped ``ArrayVocab`` mappings instead of dicts.
+    """
+    bundle_dir = bundle_path_for(meta_path)
+    if not (bundle_dir / "bundle.json").exists():
+        return None
+    info, vocabs = load_bundle_arrays(bundle_dir)
+    if verify and Path(meta_path).exists() and info.get("source_sha256") != _sha256(meta_path):
+        return None  # stale bundle: meta.json changed since it was built
+    meta = dict(info["limits"])
+    for name, (blob, offsets, ids, hashes, hash_ids) in vocabs.items():
+        sep = info.get("separators", {}).get(name)
+        if arrays:
+            meta[name] = ArrayVocab(hashes, hash_ids, blob, offsets, ids, sep)
+        else:
+            meta[name] = dict(zip(unpack_keys(blob, offsets, sep), ids.tolist()))
+    return meta
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile meta.json into a binary vocab bundle.")
+    parser.add_argument("meta_path")
+    parser.add_argument("--out", default=None, help="Output directory (default: vocab_bundle/ next to meta.json)")
+    args = parser.parse_args()
+    print(build_bundle(args.meta_path, args.out))
@@ -6,9 +6,9 @@ from pydantic import BaseModel
 
 # Richard: Converted helper functions, scorer, and llm call to LLMRiskService; injected dependencies
 from app.api.deps import get_llm_service
+from app.core.parsed_url import ParsedUrl
 from app.services.llm_service import LLMRiskService
 from app.schemas.llm import ScoreRequest, ScoreResponse, RecommendRequest, RecommendResponse, Recommendation
-from app.infrastructure.ml_model import URLScorer
 from app.schemas import ApiResponse
 
 router = APIRouter()
@@ -22,15 +22,16 @@ def _dump(model: BaseModel) -> dict:
 @router.get("/llm/healthz", response_model=ApiResponse, summary="Return the LLM Service's current state")
 def healthz(svc: LLMRiskService = Depends(get_llm_service)):
     # Richard: Changed model from global const to svc prop
-    return ApiResponse(success=True, data={"status": "ok", "provider": "gemini", "model": svc.session.model})
+    return ApiResponse(success=True, data={"status": "ok", "provider": "gemini", "model": svc.session.model,
+                                           "url_model": svc.session.scorer_state()})
 
 @router.post("/llm/score", response_model=ApiResponse, summary="Calculate the risk score of a URL")
 def score(req: ScoreRequest, svc: LLMRiskService = Depends(get_llm_service)):
     try:
-        safe = svc.ascii_safe_url(req.url)
-        s = svc.session.scorer.score(req.url)
+        parsed = ParsedUrl(req.url)
+        s = svc.session.scorer.score(parsed)
         b = svc.risk_band(s)
-        payload = ScoreResponse(url=req.url, ascii_safe_url=safe, score=s, risk_band=b)
+        payload = ScoreResponse(url=req.url, ascii_safe_url=parsed.ascii_safe, score=s, risk_band=b)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     return ApiResponse(success=True, data=_dump(payload))
@@ -38,10 +39,10 @@ def score(req: ScoreRequest, svc: LLMRiskService = Depends(get_llm_service)):
 @router.post("/llm/recommend", response_model=ApiResponse, summary="Generate an AI rationale and recommendation on the URL risk score")
 def recommend(req: RecommendRequest, svc: LLMRiskService = Depends(get_llm_service)):
     try:
-        safe = svc.ascii_safe_url(req.url)
-        s = svc.session.scorer.score(req.url)
+        parsed = ParsedUrl(req.url)
+        s = svc.session.scorer.score(parsed)
         b = svc.risk_band(s)
-        user_prompt = svc.build_user_prompt(url_raw=req.url, score=s, band=b, safe_url=safe)
+        user_prompt = svc.build_user_prompt(url_raw=parsed, score=s, band=b)
         out = svc.call_gemini_json(user_prompt)
         
         normalized = {
@@ -53,7 +54,7 @@ def recommend(req: RecommendRequest, svc: LLMRiskService = Depends(get_llm_servi
             "user_safe_message": out.get("user_safe_message",""),
             "notes_for_analyst": out.get("notes_for_analyst",""),
         }
-        payload = RecommendResponse(url=req.url, ascii_safe_url=safe, score=s, risk_band=b, llm=Recommendation(**normalized))
+        payload = RecommendResponse(url=req.url, ascii_safe_url=parsed.ascii_safe, score=s, risk_band=b, llm=Recommendation(**normalized))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     
@@ -62,8 +63,9 @@ def recommend(req: RecommendRequest, svc: LLMRiskService = Depends(get_llm_servi
 @router.get("/llm/__diag", summary="Diagnose the LLM session's current state")
 def diag(sample: str = Query("http://secure-login.paypaI.com.verify-accounts.xyz/login"), svc: LLMRiskService = Depends(get_llm_service)):
     try:
-        safe = svc.ascii_safe_url(sample)
-        s = svc.session.scorer.score(sample)
+        parsed = ParsedUrl(sample)
+        safe = parsed.ascii_safe
+        s = svc.session.scorer.score(parsed)
         b = svc.risk_band(s)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -71,10 +73,15 @@ def diag(sample: str = Query("http://secure-login.paypaI.com.verify-accounts.xyz
     return ApiResponse(success=True, data={"ok": True, "sample": sample, "ascii": safe, "score": s, "band": b})
 
 @router.post("/llm/__reload", response_model=ApiResponse, summary="Reload the current LLM risk service's URL scoring model")
-def hot_reload(svc: LLMRiskService = Depends(get_llm_service)):
+def hot_reload(version: str | None = Query(None, description="Model version to load; the registry's current version if omitted"),
+               wait: bool = Query(False, description="Block until the new model is serving"),
+               svc: LLMRiskService = Depends(get_llm_service)):
+    # Loads in the background and swaps atomically; in-flight requests keep using the old model
     try:
-        svc.session.scorer = URLScorer(svc.session.META_PATH, svc.session.WEIGHT_PATH)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"reload failed: {e}")
-    
-    return ApiResponse(success=True, data={"ok": True, "reloaded": True})
+        state = svc.session.reload_scorer(version=version, wait=wait)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if state["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"reload failed: {state['error']}")
+
+    return ApiResponse(success=True, data={"ok": True, "reloaded": state["status"] == "done", **state})
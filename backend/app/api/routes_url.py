@@ -10,7 +10,9 @@ from app.schemas.url import (
     UrlSetNotesRequest,
     UrlSetRiskLevelRequest,
     UrlBatchImportRequest,
+    UrlSimilarRequest,
 )
+from app.core.parsed_url import ParsedUrl
 from app.services.url_service import UrlRiskService
 from app.services.llm_service import LLMRiskService
 from app.schemas.llm import GenerateResponseInput
@@ -21,7 +23,7 @@ router = APIRouter()
 @router.post("/url/check", summary="Check or report URL risk")
 def check_url(payload: UrlCheckRequest, svc: UrlRiskService = Depends(get_url_service)):
     try:
-        entity = svc.check_or_create(url=payload.url)
+        entity = svc.check_or_create(url=ParsedUrl(payload.url))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -32,6 +34,8 @@ def check_url(payload: UrlCheckRequest, svc: UrlRiskService = Depends(get_url_se
         "report_count": entity.report_count,
         "source": entity.source,
         "notes": entity.notes,
+        "ml_score": entity.ml_score,
+        "ml_model_version": entity.ml_model_version,
     })
 
 
@@ -40,14 +44,11 @@ def evaluate_url(payload: UrlCheckRequest,
                  db_svc: UrlRiskService = Depends(get_url_service),
                  llm_svc: LLMRiskService = Depends(get_llm_service)):
     try:
-        entity = db_svc.check_or_create(url=payload.url)
+        # Parsed once; the service, the scorer and the prompt share its derived forms
+        parsed = ParsedUrl(payload.url)
+        entity = db_svc.check_or_create(url=parsed)
         risk_band = llm_svc.risk_level_to_risk_band(entity.risk_level)
-        prompt = (
-            f"ORIGINAL_URL: {payload.url}\n"
-            f"ASCII_SAFE_URL: {entity.full_url}\n"
-            f"NOTES: {entity.notes}\n"
-            f"RISK_BAND: {risk_band}\n"
-        )
+        prompt = llm_svc.build_evaluate_prompt(parsed, entity.notes, entity.ml_score, risk_band)
         out = llm_svc.call_gemini_json(prompt)
         normalized_out = {
             "risk_band": risk_band,
@@ -70,14 +71,25 @@ def evaluate_url(payload: UrlCheckRequest,
         "notes": entity.notes,
         "llm": normalized_out,
     })
-    
+
+
+@router.post("/url/similar", summary="Score a URL and list the most similar known-bad URLs")
+def similar_urls(payload: UrlSimilarRequest, svc: UrlRiskService = Depends(get_url_service)):
+    try:
+        result = svc.similar(url=ParsedUrl(payload.url), k=payload.k)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ApiResponse(success=True, data=result)
+
+
 @router.post("/url/scamcheck", summary="Perform ScamCheck evaluation on URL and return an intelligent response.")
 def scamcheck_url(payload: UrlCheckRequest, 
                   db_svc: UrlRiskService = Depends(get_url_service),
                   llm_svc: LLMRiskService = Depends(get_llm_service)):
     try:
+        parsed = ParsedUrl(payload.url)
         # Get can return either UrlRisk or None
-        entity = db_svc.get(url=payload.url)
+        entity = db_svc.get(url=parsed)
         
         # When entity not in database or not memoized, then generate LLM response and update database
         # When notes are present, then it means there's a previously generated AI response we can query
@@ -96,12 +108,12 @@ def scamcheck_url(payload: UrlCheckRequest,
             # Persist AI evaluation directly into DB notes/risk_level
             # Only update risk level when it's previously unknown
             entity = db_svc.upsert(
-                url=payload.url, 
+                url=parsed, 
                 risk_level=max(risk_level_llm, risk_level_db), # Get the maximum risk level assessment between database and LLM
                 notes=notes_llm)
             # Additionally record this AI evaluation as a report entry for persistence/analytics
             entity, _ = db_svc.report(
-                url=payload.url,
+                url=parsed,
                 source="ai_model",
                 notes=notes_llm,
                 risk_level=max(risk_level_llm, risk_level_db) # Get the maximum risk level assessment between database and LLM
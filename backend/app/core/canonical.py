@@ -0,0 +1,97 @@
+"""Tracking-parameter-aware canonical form of a normalized URL.
+
+``normalize_url`` keeps the query string verbatim, so ``?utm_source=x`` / ``?fbclid=...``
+variants of one link get separate ``url_sha256`` rows, and each is scored and sent to the
+LLM on its own. ``canonicalize_url`` maps such variants to one form, per ``CanonicalRules``:
+
+- drop tracking parameters (exact names, case-insensitive, or name prefixes such as ``utm_``)
+- sort the remaining parameters by name (stable, so repeated names keep their order)
+- percent-encoding: decode escapes of unreserved characters, upper-case the other escapes
+- strip the trailing slash of a non-root path
+
+Its SHA-256 (``canonical_sha256``) is a secondary key: ``risk_url`` rows keep the URL as
+first seen in ``full_url`` / ``url_sha256`` and are also found by ``canonical_sha256``.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import FrozenSet, Tuple
+from urllib.parse import unquote, urlsplit, urlunsplit
+
+# Click ids and campaign tags that never change what a link points to
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "gclsrc", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid", "ttclid",
+    "li_fat_id", "igshid", "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi", "__hssc", "__hstc",
+    "__hsfp", "hsctatracking", "mkt_tok", "vero_id", "vero_conv", "oly_anon_id", "oly_enc_id",
+    "rb_clickid", "s_cid", "wickedid", "spm", "scm",
+})
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_")
+
+_ESCAPE = re.compile(r"%[0-9a-fA-F]{2}")
+_UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+
+@dataclass(frozen=True)
+class CanonicalRules:
+    drop_params: FrozenSet[str] = TRACKING_PARAMS
+    drop_prefixes: Tuple[str, ...] = TRACKING_PREFIXES
+    sort_params: bool = True
+    normalize_percent: bool = True
+    strip_trailing_slash: bool = True
+
+    def drops(self, name: str) -> bool:
+        name = unquote(name).lower()
+        return name in self.drop_params or name.startswith(self.drop_prefixes)
+
+
+def _normalize_escapes(s: str) -> str:
+    def fix(m):
+        ch = chr(int(m.group(0)[1:], 16))
+        return ch if ch in _UNRESERVED else m.group(0).upper()
+
+    return _ESCAPE.sub(fix, s) if "%" in s else s
+
+
+def canonicalize_url(normalized: str, rules: CanonicalRules) -> str:
+    """Canonical form of a ``normalize_url`` result under ``rules``."""
+    scheme, netloc, path, query, _ = urlsplit(normalized)
+    if rules.normalize_percent:
+        path = _normalize_escapes(path)
+    if rules.strip_trailing_slash and len(path) > 1:
+        path = path.rstrip("/") or "/"
+    pairs = [p for p in query.split("&") if p and not rules.drops(p.partition("=")[0])]
+    if rules.normalize_percent:
+        pairs = [_normalize_escapes(p) for p in pairs]
+    if rules.sort_params:
+        pairs.sort(key=lambda p: unquote(p.partition("=")[0]))
+    return urlunsplit((scheme, netloc, path, "&".join(pairs), ""))
+
+
+def canonical_sha256(normalized: str, rules: CanonicalRules) -> str:
+    return hashlib.sha256(canonicalize_url(normalized, rules).encode("utf-8")).hexdigest()
+
+
+def _split_list(raw: str) -> FrozenSet[str]:
+    return frozenset(p.strip().lower() for p in (raw or "").split(",") if p.strip())
+
+
+@lru_cache(maxsize=1)
+def get_canonical_rules() -> CanonicalRules | None:
+    """The rule set configured in settings, or None when canonicalization is disabled."""
+    from app.core.config import settings
+
+    if not settings.url_canonical:
+        return None
+    drop = (TRACKING_PARAMS | _split_list(settings.url_canonical_drop_params)) - \
+        _split_list(settings.url_canonical_keep_params)
+    prefixes = tuple(p for p in TRACKING_PREFIXES if p not in _split_list(settings.url_canonical_keep_params))
+    return CanonicalRules(
+        drop_params=drop,
+        drop_prefixes=prefixes,
+        sort_params=settings.url_canonical_sort_params,
+        normalize_percent=settings.url_canonical_normalize_percent,
+        strip_trailing_slash=settings.url_canonical_strip_trailing_slash,
+    )
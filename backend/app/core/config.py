@@ -1,7 +1,9 @@
-from typing import List
+from functools import lru_cache
+from typing import List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import model_validator
 from pathlib import Path
+import tempfile
 
 class Settings(BaseSettings):
     app_name: str = "TrustLens API"
@@ -16,6 +18,22 @@ class Settings(BaseSettings):
     # Use a simple string to avoid pydantic-settings trying to JSON-decode complex types from .env
     allow_origins: str = "*"
 
+    # LRU entries per kind (phone / email / url) for app.core.normalization; 0 disables the caches
+    normalize_cache_size: int = 8192
+    # Batch imports normalise in this many spawned processes (0/1 = in-process) once a batch has
+    # at least normalize_pool_min_items distinct inputs
+    normalize_pool_workers: int = 0
+    normalize_pool_min_items: int = 5000
+
+    # Tracking-parameter-aware URL canonicalization (app/core/canonical.py): variants that only differ
+    # in tracking params, parameter order, percent-escapes or a trailing slash share one risk_url row
+    url_canonical: bool = False
+    url_canonical_drop_params: str = ""  # comma-separated, added to the built-in tracking params
+    url_canonical_keep_params: str = ""  # comma-separated built-in params / prefixes (e.g. "spm,utm_") to keep
+    url_canonical_sort_params: bool = True
+    url_canonical_normalize_percent: bool = True
+    url_canonical_strip_trailing_slash: bool = True
+
     model_config = SettingsConfigDict(env_prefix="", env_file=".env", extra="ignore")
 
     @property
@@ -29,6 +47,18 @@ class Settings(BaseSettings):
 settings = Settings()
 
 # ======== Config for LLM ========
+# Torch execution profiles applied by app/infrastructure/ml_runtime.py
+ML_EXEC_PROFILES = ("latency", "throughput", "shared-node")
+
+
+def check_exec_profile(name: Optional[str]) -> str:
+    """Normalised ML_EXEC_PROFILE ("" for none); ValueError for an unknown profile."""
+    name = (name or "").strip().lower()
+    if name and name not in ML_EXEC_PROFILES:
+        raise ValueError(f"Unknown ML_EXEC_PROFILE '{name}' (expected one of {list(ML_EXEC_PROFILES)})")
+    return name
+
+
 class LLMSettings(BaseSettings):
     # Required (no default) -> will raise ValidationError if missing
     gemini_api_key: str
@@ -41,7 +71,67 @@ class LLMSettings(BaseSettings):
     th_med: float = 0.5
     th_low: float = 0.1
     thinking_budget: int = 0 # Allows the model to think & generate better responses; 0 if off
-    
+
+    # URLNet micro-batching: concurrent score() calls are coalesced into one forward pass
+    ml_batching: bool = True
+    ml_batch_max_size: int = 32
+    ml_batch_max_wait_ms: float = 2.0
+    # Where batches run: "thread" (in the API process) or "process" (worker pool sharing the model weights)
+    ml_executor: str = "thread"
+    ml_pool_workers: int = 0  # 0 = one worker per CPU
+    ml_pool_threads_per_worker: int = 0  # 0 = the execution profile's share (1 without a profile)
+    # Torch execution profile per process: latency | throughput | shared-node (see app/infrastructure/ml_runtime.py);
+    # empty keeps torch's defaults. The overrides below take precedence over the profile when set,
+    # and also apply on their own without a profile.
+    ml_exec_profile: str = ""
+    ml_web_workers: int = 0  # processes sharing the node's CPUs; 0 = WEB_CONCURRENCY or 1
+    ml_intra_op_threads: int = 0
+    ml_inter_op_threads: int = 0
+    ml_cpu_affinity: str = ""  # restrict to these CPUs, e.g. "0-7" or "0,2,4"
+    ml_flush_denormal: Optional[bool] = None
+    # URLNet inference backend: eager | torchscript | onnx | compile
+    ml_backend: str = "eager"
+    ml_onnx_path: str = ""  # optional cache for the exported ONNX graph; a temp file is used if empty
+    # Group batches by URL length and trim each to its longest member instead of MAX_LEN / MAX_WORDS
+    ml_length_buckets: bool = True
+    # Token-char pooling: bag (fused EmbeddingBag, same scores) | dense (notebook path) | bag_exclude_padding
+    ml_tok_pooling: str = "bag"
+    # Two-stage cascade: a cheap first stage (some branches + distilled head) scores every URL; the
+    # full model runs only within ml_cascade_band of TH_LOW/TH_MED/TH_HIGH
+    ml_cascade: bool = False
+    ml_cascade_stage1: str = "char_url"  # comma-separated branches: char_url, word_cnn
+    ml_cascade_band: float = 0.05
+    ml_cascade_calibration: int = 1024  # distinct URLs scored by the full model before the head is fitted
+    ml_cascade_holdout: float = 0.2  # share of the calibration URLs kept out of the fit to measure agreement
+    ml_cascade_min_agreement: float = 0.99  # held-out risk-band agreement required before URLs exit early
+    ml_cascade_audit_rate: float = 0.02  # share of early exits re-scored by the full model for agreement stats
+    # Opt-in INT8 dynamic quantization of the Linear layers (and embedding tables) of URLNet
+    ml_quantize: bool = False
+    ml_quantize_embeddings: bool = True
+    # Load and warm URLNet in the FastAPI lifespan hook, before the worker accepts traffic
+    ml_warmup: bool = True
+    ml_warmup_batches: int = 3
+    # Model artifact registry: <ml_model_dir>/versions/<version>/{meta.json, urlnet_model.bin, manifest.json}
+    ml_model_dir: str = ""  # defaults to /app/AI_model in Docker, backend/AI_model locally
+    ml_model_version: str = ""  # pin a version; otherwise versions/CURRENT, the newest version, or the flat files
+    ml_vocab_bundle: bool = True  # load vocabularies from vocab_bundle/ (see AI_model/vocab_bundle.py) when present
+    ml_vocab_arrays: bool = True  # array-backed vocabularies (AI_model/vocab_array.py), mmap-shared with a bundle
+    # Background rescoring of risk_url rows whose ml_score came from an older model version. Enable it in
+    # one process only (or run `python -m app.services.url_service rescore`): workers serving different
+    # versions during a reload or rolling deploy would otherwise rewrite the same rows back and forth
+    ml_rescore: bool = False
+    ml_rescore_batch_size: int = 128
+    ml_rescore_interval_s: float = 1.0  # pause between batches while stale rows remain
+    ml_rescore_idle_s: float = 60.0  # poll interval once everything is current
+    # In-memory nearest-neighbour index over URLNet embeddings of flagged risk_url rows (/url/similar)
+    ml_neighbors: bool = False
+    ml_neighbors_min_risk_level: int = 3
+    ml_neighbors_nlist: int = 0  # IVF lists; 0 = brute force below 20k rows, else ~4*sqrt(rows)
+    ml_neighbors_nprobe: int = 8
+    ml_neighbors_refresh_s: float = 300.0  # embed rows flagged since the last update
+    ml_neighbors_rebuild_s: float = 0.0  # full re-embed interval; 0 = only when the model version changes
+    ml_neighbors_dir: str = ""  # saved index shared by the node's workers; defaults to <tmp>/trustlens-neighbors
+
     model_config = SettingsConfigDict(env_prefix="", env_file=".env", extra="ignore")
     
     @model_validator(mode="after")
@@ -52,6 +142,11 @@ class LLMSettings(BaseSettings):
             self.gemini_api_key = "dummy_key_for_startup"
         return self
     
+    @model_validator(mode="after")
+    def _validate_exec_profile(self):
+        self.ml_exec_profile = check_exec_profile(self.ml_exec_profile)
+        return self
+
     @model_validator(mode="after")
     def _validate_thinking_budget(self):
         # Skip validation if using dummy key
@@ -66,38 +161,45 @@ class LLMSettings(BaseSettings):
             self.gemini_model = "gemini-2.5-flash"
         return self
     
+    @property
+    def model_dir(self) -> str:
+        # Resolved once per process; see _resolve_model_dir
+        return _resolve_model_dir(self.ml_model_dir)
+
     @property
     def meta_path(self) -> str:
-        # In Docker container, files are in /app/AI_model/
-        meta_file = Path("/app/AI_model/meta.json")
-        if meta_file.exists():
-            return str(meta_file)
-        
-        # Fallback for local development
-        for parent in Path(__file__).parents:
-            res = list(parent.rglob("**/meta.json"))
-            if res:
-                return str(res[0])
-        
-        # Default fallback
-        return "AI_model/meta.json"
-    
+        return str(Path(self.model_dir) / "meta.json")
+
     @property
     def weight_path(self) -> str:
-        # In Docker container, files are in /app/AI_model/
-        weight_file = Path("/app/AI_model/urlnet_model.bin")
-        if weight_file.exists():
-            return str(weight_file)
-        
-        # Fallback for local development
-        for parent in Path(__file__).parents:
-            res = list(parent.rglob("**/urlnet_model.bin"))
-            if res:
-                return str(res[0])
-        
-        # Default fallback
-        return "AI_model/urlnet_model.bin"
-        
+        return str(Path(self.model_dir) / "urlnet_model.bin")
+
+    @property
+    def neighbors_dir(self) -> str:
+        return self.ml_neighbors_dir or str(Path(tempfile.gettempdir()) / "trustlens-neighbors")
+
+
+@lru_cache(maxsize=None)
+def _resolve_model_dir(configured: str = "") -> str:
+    """Locate the model artifact directory (flat meta.json/urlnet_model.bin and/or versions/)."""
+    candidates = [Path(configured)] if configured else []
+    # In Docker container, files are in /app/AI_model/
+    candidates.append(Path("/app/AI_model"))
+    # Local development: backend/AI_model next to the app package
+    candidates.append(Path(__file__).resolve().parents[2] / "AI_model")
+    for c in candidates:
+        if (c / "meta.json").exists() or (c / "versions").is_dir():
+            return str(c)
+
+    # Last resort, done once: search the parents of this file
+    for parent in Path(__file__).parents:
+        res = list(parent.rglob("**/meta.json"))
+        if res:
+            return str(res[0].parent)
+
+    # Default fallback
+    return "AI_model"
+
 llm_settings = LLMSettings()
 
 # ======== Config for OpenAI GPT (SMS/Email Content Analysis) ========
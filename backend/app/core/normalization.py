@@ -1,15 +1,122 @@
 from __future__ import annotations
 
+import functools
 import hashlib
-from typing import Tuple, Optional
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Sequence, Tuple, Optional
 from urllib.parse import urlparse, urlunparse
 
 import phonenumbers
 from email_validator import validate_email, EmailNotValidError
-import tldextract
 import re
 
+from app.core.config import settings
+from app.core.public_suffix import get_suffix_list
 
+# Compiled from the bundled snapshot at import, i.e. at startup; never touches the network
+_SUFFIXES = get_suffix_list()
+
+
+class NormalizationCache:
+    """Bounded LRU of normalisation outcomes, results and ``ValueError`` messages alike.
+
+    Inputs longer than ``max_key_len`` characters are not cached, which bounds the memory of
+    a full cache; ``maxsize`` 0 disables caching.
+    """
+
+    def __init__(self, maxsize: int, max_key_len: int = 1024):
+        self.maxsize = max(0, int(maxsize))
+        self.max_key_len = max_key_len
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.error_hits = self.evictions = 0
+
+    def cacheable(self, values: tuple) -> bool:
+        """Only str / None inputs are cached, and only up to ``max_key_len`` characters in total."""
+        return self.maxsize > 0 and all(v is None or isinstance(v, str) for v in values) and \
+            sum(len(v) for v in values if v) <= self.max_key_len
+
+    def get(self, key: tuple):
+        """(True, (ok, value)) on a hit, (False, None) on a miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            self.error_hits += not entry[0]
+            return True, entry
+
+    def put(self, key: tuple, ok: bool, value):
+        with self._lock:
+            self._data[key] = (ok, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.error_hits = self.evictions = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "error_hits": self.error_hits, "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None}
+
+
+_caches: Dict[str, NormalizationCache] = {}
+
+
+def _memoized(kind: str) -> Callable:
+    """Serve repeated calls of a normaliser from a per-kind ``NormalizationCache``.
+
+    A cached ``ValueError`` is re-raised as a fresh ``ValueError`` with the same message;
+    other exceptions are not cached. The uncached function stays available as ``__wrapped__``.
+    """
+    cache = _caches[kind] = NormalizationCache(settings.normalize_cache_size)
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not cache.cacheable(args + tuple(kwargs.values())):
+                return fn(*args, **kwargs)
+            key = args + tuple(sorted(kwargs.items()))
+            found, entry = cache.get(key)
+            if found:
+                if entry[0]:
+                    return entry[1]
+                raise ValueError(entry[1])
+            try:
+                result = fn(*args, **kwargs)
+            except ValueError as e:
+                cache.put(key, False, str(e))
+                raise
+            cache.put(key, True, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorate
+
+
+def normalization_cache_stats() -> Dict[str, dict]:
+    return {kind: cache.stats() for kind, cache in _caches.items()}
+
+
+def clear_normalization_caches():
+    for cache in _caches.values():
+        cache.clear()
+
+
+@_memoized("phone")
 def normalize_phone(*, e164: Optional[str] = None, country_code: Optional[str] = None, national_number: Optional[str] = None) -> Tuple[str, str, str]:
     """Return (e164, country_code, national_number). Raises ValueError if invalid."""
     try:
@@ -34,6 +141,7 @@ def normalize_phone(*, e164: Optional[str] = None, country_code: Optional[str] =
         raise ValueError(str(e))
 
 
+@_memoized("email")
 def normalize_email(address: str) -> Tuple[str, str, str]:
     """Return (local_part, domain, normalized_address). Raises ValueError if invalid."""
     try:
@@ -58,6 +166,7 @@ def normalize_email(address: str) -> Tuple[str, str, str]:
         raise ValueError(str(e))
 
 
+@_memoized("url")
 def normalize_url(url: str) -> Tuple[str, str, str, Optional[str], str]:
     """Return (normalized_url, scheme, host, registrable_domain, sha256). Raises ValueError if invalid.
 
@@ -108,8 +217,79 @@ def normalize_url(url: str) -> Tuple[str, str, str, Optional[str], str]:
     
     normalized = urlunparse((scheme, netloc, parsed.path or "/", "", parsed.query, ""))
 
-    ext = tldextract.extract(host)
-    registrable = f"{ext.domain}.{ext.suffix}" if ext.suffix else ext.domain
+    registrable = _SUFFIXES.extract(host).registrable_domain
 
     sha256 = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
     return normalized, scheme, host, registrable, sha256
+
+
+# Batch variants for imports. Each returns (results, errors) aligned with the input: exactly
+# one of results[i] / errors[i] is None. Batches bypass the LRU caches (imports would only
+# evict the hot entries) and normalise each distinct input once.
+
+def _normalize_one(kind: str, value):
+    if kind == "phone":
+        return normalize_phone.__wrapped__(e164=value)
+    if kind == "email":
+        return normalize_email.__wrapped__(value)
+    return normalize_url.__wrapped__(value)
+
+
+def _normalize_chunk(kind: str, values: Sequence) -> Tuple[list, list]:
+    results, errors = [], []
+    for value in values:
+        try:
+            results.append(_normalize_one(kind, value))
+            errors.append(None)
+        except Exception as e:
+            results.append(None)
+            errors.append(str(e) or type(e).__name__)
+    return results, errors
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool kept across batches, so only the first large import pays the worker startup."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn, not fork: the API process runs torch and DB pool threads
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _normalize_many(kind: str, values: Sequence, workers: Optional[int]) -> Tuple[list, list]:
+    unique = list(dict.fromkeys(values))
+    workers = settings.normalize_pool_workers if workers is None else workers
+    if workers > 1 and len(unique) >= settings.normalize_pool_min_items:
+        size = -(-len(unique) // (workers * 4))
+        chunks = [unique[i:i + size] for i in range(0, len(unique), size)]
+        parts = list(_get_pool(workers).map(_normalize_chunk, [kind] * len(chunks), chunks))
+        results = [r for part in parts for r in part[0]]
+        errors = [e for part in parts for e in part[1]]
+    else:
+        results, errors = _normalize_chunk(kind, unique)
+    index = {value: i for i, value in enumerate(unique)}
+    return [results[index[v]] for v in values], [errors[index[v]] for v in values]
+
+
+def normalize_phone_many(e164s: Sequence[Optional[str]], *, workers: Optional[int] = None) -> Tuple[List[Optional[Tuple[str, str, str]]], List[Optional[str]]]:
+    """``normalize_phone(e164=...)`` over a batch; ``workers`` > 1 uses a process pool for large batches."""
+    return _normalize_many("phone", e164s, workers)
+
+
+def normalize_email_many(addresses: Sequence[Optional[str]], *, workers: Optional[int] = None) -> Tuple[List[Optional[Tuple[str, str, str]]], List[Optional[str]]]:
+    """``normalize_email`` over a batch; ``workers`` > 1 uses a process pool for large batches."""
+    return _normalize_many("email", addresses, workers)
+
+
+def normalize_url_many(urls: Sequence[Optional[str]], *, workers: Optional[int] = None) -> Tuple[List[Optional[Tuple[str, str, str, Optional[str], str]]], List[Optional[str]]]:
+    """``normalize_url`` over a batch; ``workers`` > 1 uses a process pool for large batches."""
+    return _normalize_many("url", urls, workers)
@@ -0,0 +1,109 @@
+"""``ParsedUrl``: one URL, parsed once per request and shared by every consumer.
+
+A request used to re-derive the same URL several times: ``normalize_url`` for the DB key,
+``ascii_safe_url`` for the prompt, the encoder's lowercase + tokenise for the model (again
+for embeddings). A ``ParsedUrl`` computes each form on first use and keeps it:
+
+- ``normalized`` / ``scheme`` / ``host`` / ``registrable_domain`` / ``sha256``: one
+  (memoized) ``normalize_url`` call, made when the object is created so invalid URLs
+  fail early with ``ValueError``
+- ``ascii_safe``: IDNA host and percent-encoded path/query of the original input
+- ``canonical`` / ``canonical_sha256``: the tracking-param-free form (app/core/canonical.py),
+  None when canonicalization is disabled
+- ``tokens``: the URLNet tokenisation of ``normalized``, used by ``URLScorer`` in place of
+  re-tokenising; ``encoding()`` caches the encoded arrays per encoder and width
+
+Services, the scorer and the prompt builders accept a ``ParsedUrl`` wherever they take a
+URL string; ``str(parsed)`` is the normalized URL, which is what the model scores.
+"""
+from __future__ import annotations
+
+import hashlib
+import urllib.parse as up
+from functools import cached_property
+from typing import List, Optional, Tuple, Union
+
+from app.core.canonical import canonicalize_url, get_canonical_rules
+from app.core.normalization import normalize_url
+
+
+def ascii_safe_url(u: str) -> str:
+    """``u`` with an IDNA (punycode) host and percent-encoded userinfo, path, query and fragment."""
+    p = up.urlsplit((u or "").strip())
+    host = p.hostname.encode("idna").decode("ascii") if p.hostname else ""
+    userinfo = ""
+    if p.username:
+        userinfo = up.quote(p.username, safe="")
+        if p.password:
+            userinfo += ":" + up.quote(p.password, safe="")
+        userinfo += "@"
+    netloc = f"{userinfo}{host}" + (f":{p.port}" if p.port else "")
+    path  = up.quote(p.path or "", safe="/")
+    query = up.quote_plus(p.query or "", safe="=&")
+    frag  = up.quote(p.fragment or "", safe="")
+    return up.urlunsplit((p.scheme or "http", netloc, path, query, frag))
+
+
+class ParsedUrl:
+    def __init__(self, raw: str):
+        self.raw = raw
+        self.normalized, self.scheme, self.host, self.registrable_domain, self.sha256 = normalize_url(raw)
+        self._encodings: dict = {}
+
+    @classmethod
+    def of(cls, url: Union[str, "ParsedUrl"]) -> "ParsedUrl":
+        """``url`` itself if it is already parsed, else a new ``ParsedUrl``."""
+        return url if isinstance(url, ParsedUrl) else cls(url)
+
+    def as_tuple(self) -> Tuple[str, str, str, Optional[str], str]:
+        """The ``normalize_url`` result: (normalized, scheme, host, registrable_domain, sha256)."""
+        return self.normalized, self.scheme, self.host, self.registrable_domain, self.sha256
+
+    @cached_property
+    def ascii_safe(self) -> str:
+        return ascii_safe_url(self.raw)
+
+    @cached_property
+    def canonical(self) -> Optional[str]:
+        rules = get_canonical_rules()
+        return canonicalize_url(self.normalized, rules) if rules is not None else None
+
+    @cached_property
+    def canonical_sha256(self) -> Optional[str]:
+        if self.canonical is None:
+            return None
+        return self.sha256 if self.canonical == self.normalized else \
+            hashlib.sha256(self.canonical.encode("utf-8")).hexdigest()
+
+    @cached_property
+    def tokens(self) -> Tuple[str, List[str]]:
+        """(lowercased URL, word tokens) as ``UrlEncoder.tokenize`` returns them for ``normalized``."""
+        from AI_model.encoder_engine import UrlEncoder
+
+        return UrlEncoder.tokenize(self.normalized)
+
+    def encoding(self, encoder, max_len: Optional[int] = None, max_words: Optional[int] = None):
+        """``encoder.encode_tokenized([self.tokens], ...)``, computed once per encoder and widths."""
+        key = (id(encoder), max_len, max_words)
+        hit = self._encodings.get(key)
+        if hit is None or hit[0] is not encoder:
+            hit = self._encodings[key] = (encoder, encoder.encode_tokenized([self.tokens], max_len, max_words))
+        return hit[1]
+
+    def __getstate__(self):
+        # Encoders stay in their process; tokens and the parsed fields travel to pool workers
+        state = dict(self.__dict__)
+        state["_encodings"] = {}
+        return state
+
+    def __str__(self) -> str:
+        return self.normalized
+
+    def __repr__(self) -> str:
+        return f"ParsedUrl({self.raw!r})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ParsedUrl) and other.normalized == self.normalized
+
+    def __hash__(self) -> int:
+        return hash(self.normalized)
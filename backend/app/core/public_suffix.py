@@ -0,0 +1,163 @@
+"""Offline public-suffix matching for registrable-domain extraction.
+
+The Public Suffix List snapshot bundled as ``public_suffix_list.dat`` (publicsuffix.org,
+MPL-2.0; its ``VERSION`` line is exposed as ``PublicSuffixList.version``) is compiled once
+per process into a trie keyed by reversed host labels. Nothing is fetched or cached on
+disk, so results only change when the snapshot file in the repo is replaced.
+
+Matching follows ``tldextract.extract`` with its defaults (ICANN section only, punycode
+labels matched in their Unicode form, IPv4 hosts returned whole) so stored
+``registrable_domain`` values stay the same; IPv6 literals are also returned whole.
+"""
+from __future__ import annotations
+
+import ipaddress
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import idna
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), "public_suffix_list.dat")
+
+_IPV4_RE = re.compile(
+    r"^(?:(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\.)"
+    r"{3}(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])$",
+    re.ASCII,
+)
+_END = ""  # trie key marking the end of a rule; real labels are never empty
+
+
+class ExtractResult(NamedTuple):
+    subdomain: str
+    domain: str
+    suffix: str
+
+    @property
+    def registrable_domain(self) -> str:
+        """``domain.suffix``, or just the domain when no public suffix matched."""
+        return f"{self.domain}.{self.suffix}" if self.suffix else self.domain
+
+
+def parse_rules(text: str) -> Tuple[Optional[str], List[str], List[str]]:
+    """(snapshot version, ICANN rules, private rules) from Public Suffix List text."""
+    version, icann, private = None, [], []
+    section = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("//"):
+            if "===BEGIN ICANN DOMAINS===" in line:
+                section = icann
+            elif "===BEGIN PRIVATE DOMAINS===" in line:
+                section = private
+            elif "===END" in line:
+                section = None
+            elif line.startswith("// VERSION:") and version is None:
+                version = line.split(":", 1)[1].strip()
+            continue
+        if line and section is not None:
+            section.append(line.split()[0].lower())
+    return version, icann, private
+
+
+def _decode_label(label: str) -> str:
+    if label.startswith("xn--"):
+        try:
+            return idna.decode(label)
+        except (UnicodeError, IndexError):
+            pass
+    return label
+
+
+class PublicSuffixList:
+    def __init__(self, rules: Iterable[str], version: Optional[str] = None):
+        self.version = version
+        self.root: Dict[str, dict] = {}
+        self.rules = 0
+        for rule in rules:
+            node = self.root
+            for label in reversed(rule.split(".")):
+                node = node.setdefault(label, {})
+            node[_END] = True
+            self.rules += 1
+
+    @classmethod
+    def from_file(cls, path: str = SNAPSHOT_PATH, include_private: bool = False) -> "PublicSuffixList":
+        with open(path, "r", encoding="utf-8") as f:
+            version, icann, private = parse_rules(f.read())
+        return cls(icann + private if include_private else icann, version)
+
+    def _suffix_start(self, labels: List[str]) -> int:
+        """Index of the first suffix label in ``labels`` (``len(labels)`` when nothing matched)."""
+        node = self.root
+        start = i = len(labels)
+        while i > 0:
+            label = labels[i - 1]
+            child = node.get(label)
+            if child is None and label.startswith("xn--"):
+                child = node.get(_decode_label(label))
+            if child is not None:
+                i -= 1
+                node = child
+                if _END in node:
+                    start = i
+                continue
+            if "*" in node:
+                # Wildcard rules claim this label too, unless an exception rule names it
+                return i if "!" + _decode_label(label) in node else i - 1
+            break
+        return start
+
+    def extract(self, host: str) -> ExtractResult:
+        """Split a lowercase hostname (no port or userinfo) into subdomain, domain and suffix."""
+        host = host.replace("。", ".").replace("．", ".").replace("｡", ".").rstrip(".")
+        if ":" in host:
+            try:
+                ipaddress.IPv6Address(host.strip("[]"))
+                return ExtractResult("", host, "")
+            except ValueError:
+                pass
+        labels = host.split(".")
+        start = self._suffix_start(labels)
+        if start == len(labels):
+            if len(labels) == 4 and host[:1].isdecimal() and _IPV4_RE.match(host):
+                return ExtractResult("", host, "")
+            return ExtractResult(".".join(labels[:-1]), labels[-1], "")
+        suffix = ".".join(labels[start:])
+        if start == 0:
+            return ExtractResult("", "", suffix)
+        return ExtractResult(".".join(labels[:start - 1]), labels[start - 1], suffix)
+
+    def extract_many(self, hosts: Iterable[str]) -> List[ExtractResult]:
+        """``extract`` for each host, in order; repeated hosts are matched once."""
+        seen: Dict[str, ExtractResult] = {}
+        out = []
+        for host in hosts:
+            res = seen.get(host)
+            if res is None:
+                res = seen[host] = self.extract(host)
+            out.append(res)
+        return out
+
+
+_default: Optional[PublicSuffixList] = None
+_lock = threading.Lock()
+
+
+def get_suffix_list() -> PublicSuffixList:
+    """The process-wide list compiled from the bundled snapshot."""
+    global _default
+    if _default is None:
+        with _lock:
+            if _default is None:
+                _default = PublicSuffixList.from_file()
+    return _default
+
+
+def extract(host: str) -> ExtractResult:
+    return get_suffix_list().extract(host)
+
+
+def extract_many(hosts: Iterable[str]) -> List[ExtractResult]:
+    return get_suffix_list().extract_many(hosts)
@@ -46,6 +46,9 @@ class UrlRisk:
     report_count: int
     last_reported_at: datetime | None
     notes: str | None
+    ml_score: float | None = None
+    ml_model_version: str | None = None
+    canonical_sha256: str | None = None
 
 
 @dataclass
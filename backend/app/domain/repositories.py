@@ -15,6 +15,9 @@ class MobileRiskRepository(Protocol):
     def upsert_report(self, *, e164: str, country_code: str, national_number: str, source: Optional[str], notes: Optional[str], risk_level: Optional[int]) -> MobileRisk:
         ...
 
+    def bulk_upsert_report(self, rows: list[dict]) -> int:
+        ...
+
 
 class EmailRiskRepository(Protocol):
     def get_by_address(self, address: str) -> Optional[EmailRisk]:
@@ -23,12 +26,33 @@ class EmailRiskRepository(Protocol):
     def upsert_report(self, *, address: str, local_part: str, domain: str, source: Optional[str], notes: Optional[str], risk_level: Optional[int], mx_valid: Optional[int], disposable: Optional[int]) -> EmailRisk:
         ...
 
+    def bulk_create_or_update(self, rows: list[dict]) -> int:
+        ...
+
 
 class UrlRiskRepository(Protocol):
     def get_by_sha256(self, url_sha256: str) -> Optional[UrlRisk]:
         ...
 
-    def upsert_report(self, *, full_url: str, url_sha256: str, scheme: str, host: str, registrable_domain: Optional[str], source: Optional[str], notes: Optional[str], risk_level: Optional[int], phishing_flag: Optional[int]) -> UrlRisk:
+    def get_by_canonical_sha256(self, canonical_sha256: str) -> Optional[UrlRisk]:
+        ...
+
+    def upsert_report(self, *, full_url: str, url_sha256: str, scheme: str, host: str, registrable_domain: Optional[str], source: Optional[str], notes: Optional[str], risk_level: Optional[int], phishing_flag: Optional[int], canonical_sha256: Optional[str] = None) -> UrlRisk:
+        ...
+
+    def set_ml_result_by_sha(self, *, url_sha256: str, ml_score: float, ml_model_version: str, risk_level: Optional[int] = None) -> bool:
+        ...
+
+    def list_ml_stale(self, *, ml_model_version: str, limit: int) -> list[UrlRisk]:
+        ...
+
+    def list_flagged(self, *, min_risk_level: int, after_id: int = 0, limit: int = 4096) -> list[UrlRisk]:
+        ...
+
+    def count_flagged(self, *, min_risk_level: int, after_id: int = 0) -> int:
+        ...
+
+    def bulk_create_or_update(self, rows: list[dict]) -> int:
         ...
 
 
@@ -1,6 +1,6 @@
 from collections.abc import Generator
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session
 
 from app.core.config import settings
@@ -15,3 +15,16 @@ def get_session() -> Generator[Session, None, None]:
         yield session
     finally:
         session.close()
+
+
+def check_database() -> dict:
+    """Readiness of the connection pool: runs SELECT 1 and reports pool usage."""
+    state = {"ok": False, "pool": engine.pool.status(), "error": None}
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        state["ok"] = True
+    except Exception as e:
+        state["error"] = str(e)
+    state["pool"] = engine.pool.status()
+    return state
@@ -1,3 +1,5 @@
+import threading
+
 from google import genai
 from app.core.config import llm_settings
 
@@ -20,20 +22,181 @@ class LLMSession:
             
         self.model = llm_settings.gemini_model
         self._scorer = None  # Lazy load the scorer
-    
+        self._scorer_lock = threading.Lock()  # one load even when the first requests race
+        self.scorer_error = None  # Last URLScorer load failure, surfaced by /ready
+        self.scorer_warmed_up = False
+        self._reload_lock = threading.Lock()
+        self.reload_state = {"status": "idle", "version": None, "error": None}
+
     @property
     def scorer(self):
         """Lazy load URLScorer to avoid startup crashes"""
         if self._scorer is None:
-            try:
-                from app.infrastructure.ml_model import URLScorer
-                self._scorer = URLScorer()
-            except Exception as e:
-                print(f"Warning: Could not initialize URLScorer: {e}")
-                self._scorer = None
+            with self._scorer_lock:
+                if self._scorer is None:
+                    self.load_scorer()
+        return self._scorer
+
+    def load_scorer(self):
+        """Build the URLScorer (wrapped in the micro-batcher if enabled); returns None on failure."""
+        try:
+            from app.infrastructure.ml_runtime import apply_execution_profile
+            apply_execution_profile()  # once per process, before torch starts its thread pools
+            self._scorer = self._wrap(self._new_scorer())
+            self.scorer_error = None
+        except Exception as e:
+            print(f"Warning: Could not initialize URLScorer: {e}")
+            self._scorer = None
+            self.scorer_error = str(e)
         return self._scorer
-        
-        
+
+    @staticmethod
+    def _new_scorer(artifact=None):
+        from app.infrastructure.ml_model import URLScorer
+        if llm_settings.ml_executor == "process":
+            # The pool shares these float weights; workers apply the backend/quantization themselves
+            if llm_settings.ml_cascade:
+                print("Warning: ML_CASCADE is not supported with ML_EXECUTOR=process; scoring with the full model")
+            return URLScorer(artifact=artifact, backend="eager", quantize=False)
+        scorer = URLScorer(artifact=artifact)
+        if llm_settings.ml_cascade:
+            from app.infrastructure.ml_cascade import CascadeScorer
+            scorer = CascadeScorer(scorer,
+                                   stage1=[b.strip() for b in llm_settings.ml_cascade_stage1.split(",") if b.strip()],
+                                   band=llm_settings.ml_cascade_band,
+                                   calibration_size=llm_settings.ml_cascade_calibration,
+                                   holdout=llm_settings.ml_cascade_holdout,
+                                   min_agreement=llm_settings.ml_cascade_min_agreement,
+                                   audit_rate=llm_settings.ml_cascade_audit_rate)
+        return scorer
+
+    @staticmethod
+    def _wrap(scorer):
+        from app.infrastructure.ml_model import MicroBatcher
+        if llm_settings.ml_executor == "process":
+            from app.infrastructure.ml_pool import ProcessScorerPool
+            return ProcessScorerPool(scorer,
+                                     workers=llm_settings.ml_pool_workers,
+                                     max_batch_size=llm_settings.ml_batch_max_size,
+                                     max_wait_ms=llm_settings.ml_batch_max_wait_ms,
+                                     threads_per_worker=llm_settings.ml_pool_threads_per_worker,
+                                     backend=llm_settings.ml_backend,
+                                     quantize=llm_settings.ml_quantize)
+        if not llm_settings.ml_batching:
+            return scorer
+        return MicroBatcher(scorer,
+                            max_batch_size=llm_settings.ml_batch_max_size,
+                            max_wait_ms=llm_settings.ml_batch_max_wait_ms)
+
+    def reload_scorer(self, version: str | None = None, wait: bool = False) -> dict:
+        """Load a model version in the background and hot-swap it into the serving scorer.
+
+        Requests keep being served by the current model while the new one loads and warms up;
+        a batch already running when the swap happens finishes on the old model. An invalid
+        ``version`` name raises ValueError before anything is loaded.
+        """
+        if version:
+            from app.infrastructure.model_registry import get_registry
+            get_registry().check_version(version)
+        with self._reload_lock:
+            if self.reload_state["status"] == "loading":
+                return dict(self.reload_state)
+            self.reload_state = {"status": "loading", "version": version, "error": None}
+        worker = threading.Thread(target=self._reload, args=(version,), name="urlnet-reload", daemon=True)
+        worker.start()
+        if wait:
+            worker.join()
+        return dict(self.reload_state)
+
+    def _reload(self, version: str | None):
+        from app.infrastructure.ml_model import MicroBatcher, get_model_artifact
+        from app.infrastructure.model_registry import get_registry
+
+        try:
+            get_registry().refresh()  # pick up versions published since startup
+            new_scorer = self._new_scorer(get_model_artifact(version))
+            new_scorer.score_many(WARMUP_URLS)  # warm before it takes traffic
+            with self._scorer_lock:
+                # Same lock as the lazy first load, so neither can overwrite the other's scorer
+                current = self._scorer
+                if isinstance(current, MicroBatcher):
+                    old = current.swap(new_scorer)
+                else:
+                    old, self._scorer = current, self._wrap(new_scorer)
+            if isinstance(current, MicroBatcher):
+                current.drain()
+            self._retire(old)
+            self.scorer_error = None
+            self.scorer_warmed_up = True
+            state = {"status": "done", "version": new_scorer.version, "error": None}
+        except Exception as e:
+            print(f"Warning: URLScorer reload failed: {e}")
+            state = {"status": "failed", "version": version, "error": str(e)}
+        with self._reload_lock:
+            self.reload_state = state
+
+    @staticmethod
+    def _retire(scorer):
+        """Release a scorer that no longer takes traffic (its batcher thread or worker pool)."""
+        close = getattr(scorer, "close", None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception as e:
+            print(f"Warning: Could not close the previous URLScorer: {e}")
+
+    def warm_up(self, batches: int = 3) -> bool:
+        """Load the scorer and run a few dummy batches so the first real request is not a cold start."""
+        scorer = self.scorer
+        if scorer is None:
+            return False
+        try:
+            for i in range(max(1, batches)):
+                # Cover a single-URL call and a full micro-batch so both shapes are exercised
+                # (a MicroBatcher forwards score_many to its scorer; a process pool to its workers)
+                size = 1 if i == 0 else llm_settings.ml_batch_max_size
+                scorer.score_many((WARMUP_URLS * size)[:size])
+            scorer.score(WARMUP_URLS[0])
+        except Exception as e:
+            print(f"Warning: URLScorer warm-up failed: {e}")
+            self.scorer_error = f"warm-up failed: {e}"
+            return False
+        self.scorer_warmed_up = True
+        return True
+
+    def scorer_state(self) -> dict:
+        """Model readiness without triggering a load."""
+        from app.infrastructure.ml_runtime import execution_state
+        scorer = self._scorer
+        return {
+            "loaded": scorer is not None,
+            "warmed_up": self.scorer_warmed_up,
+            "version": getattr(scorer, "version", None),
+            "backend": getattr(scorer, "backend", None),
+            "quantized": getattr(scorer, "quantized", None),
+            "batching": getattr(scorer, "stats", None),
+            "padding": getattr(scorer, "padding_stats", None),
+            "vocab": getattr(scorer, "vocab_stats", None),
+            "cascade": getattr(scorer, "cascade_stats", None),
+            "execution": execution_state(),
+            "error": self.scorer_error,
+            "reload": dict(self.reload_state),
+        }
+
+    def close(self):
+        close = getattr(self._scorer, "close", None)
+        if close is not None:
+            close()
+
+
+WARMUP_URLS = [
+    "https://www.example.com/",
+    "http://secure-login.example-bank.com.verify-account.xyz/login?session=123",
+    "https://accounts.example.org/reset-password?token=abcdef0123456789",
+]
+
+
 # Global session instance (lazy loaded)
 _llm_session = None
 
@@ -0,0 +1,161 @@
+"""Inference backends for URLNet.
+
+``compile_model`` turns the eager ``URLNetDynamic`` built from the checkpoint into a
+callable with the same signature and output dict ({"logit", "prob"}), served from:
+
+- ``eager``: the nn.Module as-is
+- ``torchscript``: a traced, frozen TorchScript graph (no Python dispatch per call)
+- ``onnx``: an ONNX export run through ONNX Runtime (needs ``onnxruntime``)
+- ``compile``: ``torch.compile`` (needs a C/C++ toolchain; compiles on first call)
+
+Run ``python -m app.infrastructure.ml_backends`` for a latency comparison of the
+backends on the configured checkpoint.
+"""
+from __future__ import annotations
+
+import inspect
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import torch
+
+BACKENDS = ("eager", "torchscript", "onnx", "compile")
+
+Inputs = Tuple[torch.Tensor, torch.Tensor, torch.Tensor]
+
+
+class _TupleOutput(torch.nn.Module):
+    """Expose (logit, prob) as a tuple; tracing and ONNX export do not take dict outputs."""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x_char, x_word, x_tokc):
+        out = self.model(x_char, x_word, x_tokc)
+        return out["logit"], out["prob"]
+
+
+class _TorchScriptRunner:
+    def __init__(self, model: torch.nn.Module, example_inputs: Inputs):
+        with torch.no_grad():
+            traced = torch.jit.trace(_TupleOutput(model).eval(), example_inputs, check_trace=False)
+            self.graph = torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+
+    def __call__(self, x_char, x_word, x_tokc):
+        logit, prob = self.graph(x_char, x_word, x_tokc)
+        return {"logit": logit, "prob": prob}
+
+
+class _OnnxRunner:
+    def __init__(self, model: torch.nn.Module, example_inputs: Inputs, onnx_path: Optional[str] = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("The 'onnx' backend requires the onnxruntime package.") from e
+
+        if onnx_path is None:
+            fd, onnx_path = tempfile.mkstemp(suffix=".onnx", prefix="urlnet_")
+            os.close(fd)
+        if not os.path.exists(onnx_path) or os.path.getsize(onnx_path) == 0:
+            export_onnx(model, example_inputs, onnx_path)
+        self.onnx_path = onnx_path
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, opts, providers=["CPUExecutionProvider"])
+
+    def __call__(self, x_char, x_word, x_tokc):
+        logit, prob = self.session.run(["logit", "prob"], {
+            "x_char": x_char.numpy(),
+            "x_word": x_word.numpy(),
+            "x_tokc": x_tokc.numpy(),
+        })
+        return {"logit": torch.from_numpy(logit), "prob": torch.from_numpy(prob)}
+
+
+def export_onnx(model: torch.nn.Module, example_inputs: Inputs, onnx_path: str) -> str:
+    """Export URLNet to ONNX with dynamic batch and sequence dimensions (for length-trimmed batches)."""
+    batch = {0: "batch"}
+    chars, words = {0: "batch", 1: "chars"}, {0: "batch", 1: "words"}
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False  # the TorchScript exporter handles our dynamic shapes without onnxscript
+    with torch.no_grad():
+        torch.onnx.export(
+            _TupleOutput(model).eval(), example_inputs, onnx_path,
+            input_names=["x_char", "x_word", "x_tokc"],
+            output_names=["logit", "prob"],
+            dynamic_axes={"x_char": chars, "x_word": words, "x_tokc": words, "logit": batch, "prob": batch},
+            opset_version=17,
+            **kwargs,
+        )
+    return onnx_path
+
+
+def compile_model(model: torch.nn.Module, backend: str, example_inputs: Inputs,
+                  onnx_path: Optional[str] = None) -> Callable[..., Dict[str, torch.Tensor]]:
+    """Return a callable (x_char, x_word, x_tokc) -> {"logit", "prob"} for ``backend``."""
+    backend = (backend or "eager").lower()
+    model.eval()
+    if backend == "eager":
+        return model
+    if backend == "torchscript":
+        return _TorchScriptRunner(model, example_inputs)
+    if backend == "onnx":
+        return _OnnxRunner(model, example_inputs, onnx_path)
+    if backend == "compile":
+        return torch.compile(model, dynamic=True)
+    raise ValueError(f"Unknown inference backend '{backend}'. Choose one of {', '.join(BACKENDS)}.")
+
+
+def benchmark_backends(model: torch.nn.Module, example_inputs: Inputs,
+                       backends: Iterable[str] = BACKENDS, runs: int = 50, warmup: int = 5) -> dict:
+    """Per-backend forward latency (ms) and max |prob| difference against eager."""
+    with torch.no_grad():
+        reference = model(*example_inputs)["prob"]
+    report = {}
+    for name in backends:
+        try:
+            runner = compile_model(model, name, example_inputs)
+        except Exception as e:
+            report[name] = {"error": str(e)}
+            continue
+        with torch.no_grad():
+            for _ in range(warmup):
+                out = runner(*example_inputs)
+            timings = []
+            for _ in range(runs):
+                t0 = time.perf_counter()
+                out = runner(*example_inputs)
+                timings.append((time.perf_counter() - t0) * 1000.0)
+        timings.sort()
+        report[name] = {
+            "mean_ms": statistics.fmean(timings),
+            "p50_ms": timings[len(timings) // 2],
+            "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            "max_abs_diff": float((out["prob"] - reference).abs().max()),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.infrastructure.ml_model import URLScorer
+
+    parser = argparse.ArgumentParser(description="Compare URLNet inference backends.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    args = parser.parse_args()
+
+    scorer = URLScorer(backend="eager")
+    sample = ["http://secure-login.paypai.com.verify-accounts.xyz/login"] * args.batch_size
+    result = benchmark_backends(scorer.model, scorer.encode_many(sample),
+                                backends=args.backends.split(","), runs=args.runs)
+    print(json.dumps({"batch_size": args.batch_size, "backends": result}, indent=2))
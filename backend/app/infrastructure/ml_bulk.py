@@ -0,0 +1,164 @@
+"""Offline bulk scoring of URL datasets with URLNet.
+
+Streams record batches from a Parquet/CSV file or directory with ``pyarrow.dataset``,
+normalises each URL with ``normalize_url`` (uncached, through ``normalize_url_many``: a feed of
+mostly unique URLs would only churn the LRU) and scores the normalised URLs (as
+``UrlRiskService`` does) on a ``ProcessScorerPool``. Results go to a directory of Parquet
+parts, one per input record batch::
+
+    <out>/part-000000.parquet ...   # input columns + normalized_url, ml_score, risk_band,
+                                    # ml_model_version, error
+    <out>/_checkpoint.json          # input fingerprint, batch size, model version
+
+Each part is written to a temp file and renamed, so an interrupted run resumes by
+skipping the parts that already exist:
+
+    python -m app.infrastructure.ml_bulk feed.parquet scored/ --url-column url
+    python -m app.infrastructure.ml_bulk feed.parquet scored/ --url-column url   # resumes
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from app.core.normalization import normalize_url_many
+from app.infrastructure.ml_model import URLScorer, risk_band
+
+CHECKPOINT_FILE = "_checkpoint.json"
+RESULT_COLUMNS = ("normalized_url", "ml_score", "risk_band", "ml_model_version", "error")
+
+
+def _normalize_and_score(urls: List[Optional[str]], scorer: Optional[URLScorer] = None):
+    """(normalized, scores, errors) for ``urls``; invalid URLs get a null score and an error."""
+    if scorer is None:
+        from app.infrastructure.ml_pool import worker_scorer
+        scorer = worker_scorer()
+    # workers=1: this already runs in a pool worker, so never start a nested pool
+    results, errors = normalize_url_many(urls, workers=1)
+    normalized: List[Optional[str]] = [r[0] if r is not None else None for r in results]
+    valid = [n for n in normalized if n is not None]
+    probs = iter(scorer.score_many(valid))
+    scores = [next(probs) if n is not None else None for n in normalized]
+    return normalized, scores, errors
+
+
+def _fingerprint(dataset: ds.FileSystemDataset) -> List[Tuple[str, int]]:
+    files = sorted(dataset.files)
+    return [(f, os.path.getsize(f)) for f in files]
+
+
+def _load_checkpoint(out_dir: Path, expected: dict) -> None:
+    path = out_dir / CHECKPOINT_FILE
+    if path.exists():
+        saved = json.loads(path.read_text(encoding="utf-8"))
+        for key in ("input", "url_column", "batch_rows"):
+            if saved.get(key) != expected[key]:
+                raise RuntimeError(f"{out_dir} holds a run with a different {key}; use a new output directory.")
+        if saved.get("ml_model_version") != expected["ml_model_version"]:
+            print(f"Warning: resuming a run started with model {saved.get('ml_model_version')} "
+                  f"using model {expected['ml_model_version']}")
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(expected, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def score_dataset(source: str, out_dir: str, *, url_column: str = "url", fmt: Optional[str] = None,
+                  batch_rows: int = 100_000, chunk_rows: int = 2048, workers: int = 0,
+                  scorer: Optional[URLScorer] = None, columns: Optional[List[str]] = None) -> dict:
+    """Score every row of ``source`` into Parquet parts under ``out_dir``; returns run counters.
+
+    ``workers`` > 0 scores on a process pool of that many workers sharing one copy of the
+    weights; 0 scores in this process. ``columns`` limits the input columns carried over.
+    """
+    fmt = fmt or ("csv" if str(source).endswith(".csv") else "parquet")
+    dataset = ds.dataset(source, format=fmt)
+    if url_column not in dataset.schema.names:
+        raise ValueError(f"Column '{url_column}' not found in {source} (columns: {dataset.schema.names})")
+    keep = list(columns) if columns is not None else [c for c in dataset.schema.names if c not in RESULT_COLUMNS]
+    if url_column not in keep:
+        keep.append(url_column)
+
+    if scorer is None:
+        scorer = URLScorer(backend="eager", quantize=False) if workers > 0 else URLScorer()
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    _load_checkpoint(out, {
+        "input": [list(f) for f in _fingerprint(dataset)],
+        "url_column": url_column,
+        "batch_rows": int(batch_rows),
+        "ml_model_version": scorer.version,
+    })
+
+    pool = None
+    if workers > 0:
+        from app.infrastructure.ml_pool import ProcessScorerPool
+        pool = ProcessScorerPool(scorer, workers=workers)
+
+    stats = {"parts": 0, "parts_skipped": 0, "rows": 0, "errors": 0, "seconds": 0.0}
+    t_start = time.perf_counter()
+    try:
+        batches = dataset.to_batches(columns=keep, batch_size=int(batch_rows))
+        for i, batch in enumerate(batches):
+            part = out / f"part-{i:06d}.parquet"
+            if part.exists():
+                stats["parts_skipped"] += 1
+                continue
+            urls = batch.column(url_column).cast(pa.string()).to_pylist()
+            chunks = [urls[j:j + chunk_rows] for j in range(0, len(urls), chunk_rows)]
+            if pool is not None:
+                results = [f.result() for f in [pool.submit(_normalize_and_score, c) for c in chunks]]
+            else:
+                results = [_normalize_and_score(c, scorer) for c in chunks]
+            normalized = [n for r in results for n in r[0]]
+            scores = [s for r in results for s in r[1]]
+            errors = [e for r in results for e in r[2]]
+
+            table = pa.Table.from_batches([batch])
+            table = table.append_column("normalized_url", pa.array(normalized, pa.string()))
+            table = table.append_column("ml_score", pa.array(scores, pa.float32()))
+            table = table.append_column("risk_band", pa.array(
+                [risk_band(s) if s is not None else None for s in scores], pa.string()))
+            table = table.append_column("ml_model_version", pa.array([scorer.version] * len(urls), pa.string()))
+            table = table.append_column("error", pa.array(errors, pa.string()))
+
+            tmp = part.with_suffix(".parquet.tmp")
+            pq.write_table(table, tmp)
+            os.replace(tmp, part)
+            stats["parts"] += 1
+            stats["rows"] += len(urls)
+            stats["errors"] += sum(e is not None for e in errors)
+            elapsed = time.perf_counter() - t_start
+            print(f"{part.name}: {len(urls)} rows, {stats['rows'] / max(elapsed, 1e-9):,.0f} rows/s")
+    finally:
+        if pool is not None:
+            pool.close()
+    stats["seconds"] = round(time.perf_counter() - t_start, 3)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score a Parquet/CSV URL dataset with URLNet.")
+    parser.add_argument("source", help="Parquet/CSV file or directory")
+    parser.add_argument("out_dir", help="Output directory for scored Parquet parts (reused to resume)")
+    parser.add_argument("--url-column", default="url")
+    parser.add_argument("--format", dest="fmt", choices=("parquet", "csv"), default=None)
+    parser.add_argument("--batch-rows", type=int, default=100_000, help="Rows per record batch / output part")
+    parser.add_argument("--chunk-rows", type=int, default=2048, help="Rows per task sent to a worker")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Scoring processes (0 = score in this process)")
+    parser.add_argument("--columns", nargs="*", default=None, help="Input columns to carry over (default: all)")
+    args = parser.parse_args()
+
+    result = score_dataset(args.source, args.out_dir, url_column=args.url_column, fmt=args.fmt,
+                           batch_rows=args.batch_rows, chunk_rows=args.chunk_rows,
+                           workers=args.workers, columns=args.columns)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,248 @@
+"""Two-stage cascade scoring for URLNet.
+
+A first stage computes only some branches of the checkpoint (``char_url`` by default) and
+scores them with a small linear head distilled from the full model. The full
+three-branch model runs only for URLs whose first-stage score lies within ``band`` of
+TH_LOW, TH_MED or TH_HIGH, i.e. where the cheap score could put the URL in a different
+risk band. Everything else exits early with the first-stage score. Routed URLs reuse their
+first-stage features: only the remaining branches run before ``fc``, so no branch runs
+twice for a URL.
+
+``word_cnn`` is much cheaper but, with the notebook tokenizer, sees a single word token
+(UNK for an unseen URL) and its first MAX_TOK_CHAR characters, too little to tell a
+phishing URL from a safe one; ``char_url`` reads the whole URL.
+
+The head is fitted (ridge least squares on the full model's logits) from the first
+``calibration_size`` distinct URLs scored, which all go through the full model, or
+explicitly with ``calibrate``. A ``holdout`` share of those URLs is kept out of the fit and
+used to measure how often the head's risk band matches the full model's; early exit is
+enabled only when that agreement reaches ``min_agreement``, otherwise the full model keeps
+scoring everything. A small ``audit_rate`` of early exits is also scored by the full model
+to keep measuring the agreement in production.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import torch
+import torch.nn as nn
+
+from app.core.config import llm_settings
+from app.infrastructure.ml_model import PADDING_COUNTERS, URLScorer
+
+_COUNTERS = ("urls", "calibration_urls", "full_only", "early_exit", "routed", "audited",
+             "audit_band_agree", "routed_band_agree")
+
+
+class CascadeScorer:
+    def __init__(self, scorer: URLScorer, stage1: Sequence[str] = ("char_url",), band: float = 0.05,
+                 calibration_size: int = 1024, audit_rate: float = 0.02, holdout: float = 0.2,
+                 min_agreement: float = 0.99, ridge: float = 1e-3, seed: int = 0):
+        model = scorer.model
+        # fc input groups, in fc column order (see URLNetDynamic.branch_features)
+        words = "word_cnn" if hasattr(model, "word_cnn") else "char_tok"
+        self._groups = tuple(name for name in ("char_url", words) if hasattr(model, name))
+        missing = [name for name in stage1 if name not in self._groups]
+        if not stage1 or missing:
+            raise ValueError(f"Cascade first stage {list(stage1)} is not a set of branches of this model "
+                             f"(missing: {missing}).")
+        self.scorer = scorer
+        self.stage1 = tuple(stage1)
+        self._rest = tuple(name for name in self._groups if name not in self.stage1)
+        self.band = float(band)
+        self.thresholds = (llm_settings.th_low, llm_settings.th_med, llm_settings.th_high)
+        self.calibration_size = max(1, int(calibration_size))
+        self.audit_rate = float(audit_rate)
+        self.holdout = min(max(float(holdout), 0.0), 0.5)
+        self.min_agreement = float(min_agreement)
+        self.ridge = float(ridge)
+        self.head: Optional[nn.Linear] = None  # set only once it passed the holdout check
+        self.calibrated = False
+        self.holdout_agreement: Optional[float] = None
+
+        self._lock = threading.Lock()
+        self._gen = torch.Generator().manual_seed(seed)
+        self._calib: List[Tuple[torch.Tensor, torch.Tensor]] = []
+        self._calib_seen: set = set()
+        self._stats = dict.fromkeys(_COUNTERS, 0)
+
+    def __getattr__(self, name):
+        # Behave like the wrapped URLScorer (version, backend, vocabularies, padding_stats, ...)
+        if name == "scorer":
+            raise AttributeError(name)
+        return getattr(self.scorer, name)
+
+    @staticmethod
+    def _cat(feats: dict, names: Sequence[str]) -> torch.Tensor:
+        parts = [feats[name] for name in names]
+        return parts[0] if len(parts) == 1 else torch.cat(parts, dim=1)
+
+    def _fc(self, feats: dict) -> torch.Tensor:
+        return torch.sigmoid(self.scorer.model.fc(self._cat(feats, self._groups))).reshape(-1)
+
+    def _full_with_stage1(self, x) -> Tuple[torch.Tensor, torch.Tensor]:
+        """(stage-1 features, full-model probabilities) from one pass over every branch."""
+        feats = self.scorer.model.branch_features(*x)
+        return self._cat(feats, self.stage1), self._fc(feats)
+
+    def _complete(self, x, stage1: dict, rows: torch.Tensor) -> torch.Tensor:
+        """Full-model probabilities of ``rows``, running only the branches stage 1 did not."""
+        feats = {name: f.index_select(0, rows) for name, f in stage1.items()}
+        if self._rest:
+            feats.update(self.scorer.model.branch_features(*(t.index_select(0, rows) for t in x), only=self._rest))
+        return self._fc(feats)
+
+    def _bands(self, p: torch.Tensor) -> torch.Tensor:
+        return sum((p >= th).long() for th in self.thresholds)
+
+    def _uncertain(self, p1: torch.Tensor) -> torch.Tensor:
+        mask = torch.zeros_like(p1, dtype=torch.bool)
+        for th in self.thresholds:
+            mask |= (p1 - th).abs() < self.band
+        return mask
+
+    def _collect(self, urls: List[str], idx: List[int], feats: torch.Tensor, probs: torch.Tensor):
+        """Keep (features, full logit) of URLs not seen before; fit the head once there are enough."""
+        logits = torch.logit(probs.clamp(1e-6, 1 - 1e-6))
+        with self._lock:
+            if self.calibrated:
+                return
+            keep = []
+            for row, i in enumerate(idx):
+                key = str(urls[i])  # the normalized URL for a ParsedUrl; keeps no parsed state alive
+                if key not in self._calib_seen:
+                    self._calib_seen.add(key)
+                    keep.append(row)
+            if keep:
+                rows = torch.tensor(keep)
+                self._calib.append((feats.index_select(0, rows), logits.index_select(0, rows)))
+            if len(self._calib_seen) >= self.calibration_size:
+                self._fit_locked()
+
+    def _fit_locked(self):
+        x = torch.cat([f for f, _ in self._calib]).double()
+        z = torch.cat([t for _, t in self._calib]).double()
+        order = torch.randperm(x.shape[0], generator=self._gen)
+        n_hold = int(x.shape[0] * self.holdout)
+        hold, train = order[:n_hold], order[n_hold:]
+        head = self._ridge(x.index_select(0, train), z.index_select(0, train))
+        if n_hold:
+            with torch.no_grad():
+                cheap = torch.sigmoid(head(x.index_select(0, hold).float()).squeeze(1))
+            full = torch.sigmoid(z.index_select(0, hold).float())
+            self.holdout_agreement = round(float((self._bands(cheap) == self._bands(full)).double().mean()), 4)
+        else:
+            self.holdout_agreement = None
+        self.calibrated = True
+        self._calib, self._calib_seen = [], set()
+        if self.holdout_agreement is not None and self.holdout_agreement >= self.min_agreement:
+            self.head = head
+        else:
+            self.head = None
+            print(f"Warning: cascade first stage {list(self.stage1)} agrees with the full model on "
+                  f"{self.holdout_agreement} of held-out risk bands (need {self.min_agreement}); "
+                  f"scoring every URL with the full model")
+
+    def _ridge(self, x: torch.Tensor, z: torch.Tensor) -> nn.Linear:
+        x1 = torch.cat([x, torch.ones(x.shape[0], 1, dtype=x.dtype)], dim=1)
+        reg = self.ridge * torch.eye(x1.shape[1], dtype=x.dtype)
+        reg[-1, -1] = 0.0  # do not shrink the bias
+        w = torch.linalg.solve(x1.T @ x1 + reg, x1.T @ z)
+        head = nn.Linear(x.shape[1], 1)
+        with torch.no_grad():
+            head.weight.copy_(w[:-1].float().unsqueeze(0))
+            head.bias.copy_(w[-1:].float())
+        return head.eval()
+
+    def calibrate(self, urls: Iterable[str], batch_size: int = 256):
+        """Fit the first-stage head on ``urls`` now (replacing any previous head)."""
+        urls = list(urls)
+        with self._lock:
+            self.head, self.calibrated, self.holdout_agreement = None, False, None
+            self._calib, self._calib_seen = [], set()
+        with torch.no_grad():
+            for idx, x in self.scorer.iter_batches(urls, batch_size):
+                self._collect(urls, idx, *self._full_with_stage1(x))
+        with self._lock:
+            if not self.calibrated and self._calib:
+                self._fit_locked()
+
+    def score_many_with_stats(self, urls: List[str], batch_size: int = 256) -> Tuple[List[float], dict]:
+        urls = list(urls)
+        probs: List[float] = [0.0] * len(urls)
+        counts = dict.fromkeys(PADDING_COUNTERS, 0)
+        delta = dict.fromkeys(_COUNTERS, 0)
+        with torch.no_grad():
+            for idx, x in self.scorer.iter_batches(urls, batch_size, counts):
+                head, calibrated = self.head, self.calibrated
+                delta["urls"] += len(idx)
+                if head is None and calibrated:
+                    # The head failed its holdout check: the full model scores everything
+                    out = self.scorer._forward(*x)
+                    delta["full_only"] += len(idx)
+                elif head is None:
+                    # Still calibrating: one full pass also yields the stage-1 features to fit on
+                    feats, out = self._full_with_stage1(x)
+                    self._collect(urls, idx, feats, out)
+                    delta["calibration_urls"] += len(idx)
+                else:
+                    stage1 = self.scorer.model.branch_features(*x, only=self.stage1)
+                    out = torch.sigmoid(head(self._cat(stage1, self.stage1)).squeeze(1))
+                    route = self._uncertain(out)
+                    with self._lock:
+                        audit = ~route & (torch.rand(out.shape[0], generator=self._gen) < self.audit_rate)
+                    need = (route | audit).nonzero().squeeze(1)
+                    if need.numel():
+                        full = self._complete(x, stage1, need)
+                        same_band = (self._bands(out.index_select(0, need)) == self._bands(full)).tolist()
+                        for same, routed in zip(same_band, route.index_select(0, need).tolist()):
+                            if routed:
+                                delta["routed_band_agree"] += same
+                            else:
+                                delta["audit_band_agree"] += same
+                        routed_rows = need[route.index_select(0, need)]
+                        out = out.clone()
+                        out[routed_rows] = full[route.index_select(0, need)]
+                    n_routed = int(route.sum())
+                    delta["routed"] += n_routed
+                    delta["audited"] += int(audit.sum())
+                    delta["early_exit"] += len(idx) - n_routed
+                for i, p in zip(idx, out.tolist()):
+                    probs[i] = p
+        self.scorer.record_padding(counts)
+        with self._lock:
+            for k, v in delta.items():
+                self._stats[k] += v
+        return probs, counts
+
+    def score_many(self, urls: List[str], batch_size: int = 256) -> List[float]:
+        return self.score_many_with_stats(urls, batch_size)[0]
+
+    def score(self, url: str) -> float:
+        return self.score_many([url])[0]
+
+    @property
+    def cascade_stats(self) -> dict:
+        """Routing rate (share of post-calibration URLs sent to the full model) and band agreement."""
+        with self._lock:
+            s = dict(self._stats)
+            calibrated, early_exit = self.calibrated, self.head is not None
+            pending = len(self._calib_seen)
+        decided = s["urls"] - s["calibration_urls"]
+        s.update({
+            "stage1": list(self.stage1),
+            "band": self.band,
+            "calibrated": calibrated,
+            "calibration_pending": 0 if calibrated else pending,
+            # Band agreement of the fitted head on calibration URLs kept out of the fit
+            "holdout_band_agreement": self.holdout_agreement,
+            "min_agreement": self.min_agreement,
+            "early_exit_enabled": early_exit,
+            "routing_rate": round((s["routed"] + s["full_only"]) / decided, 4) if decided else None,
+            # Early exits whose band matches the full model's, measured on the audit sample
+            "early_exit_band_agreement": round(s["audit_band_agree"] / s["audited"], 4) if s["audited"] else None,
+            # Routed URLs where the cheap score already had the right band
+            "routed_band_agreement": round(s["routed_band_agree"] / s["routed"], 4) if s["routed"] else None,
+        })
+        return s
@@ -1,65 +1,401 @@
 import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import numpy as np
 import torch
 from app.core.config import llm_settings
+from app.core.parsed_url import ParsedUrl
 
 # ======== Encoders & Dynamic URLNet builder ========
 # Import these only when needed to avoid startup failures
 # from AI_model.encoders_from_notebook import enc_char_url, enc_words, enc_token_chars
 # from AI_model.modeldef_from_notebook import build_urlnet_from_state_dict
 
+def get_model_artifact(version: Optional[str] = None):
+    """Resolve the (checksum-verified) artifact to serve from the model registry."""
+    from app.infrastructure.model_registry import get_registry
+    return get_registry().resolve(version)
+
 def get_model_paths():
     """Get model paths with error handling"""
     try:
-        return llm_settings.meta_path, llm_settings.weight_path
+        artifact = get_model_artifact()
+        return artifact.meta_path, artifact.weights_path
     except Exception as e:
         print(f"Warning: Could not get model paths: {e}")
         return "AI_model/meta.json", "AI_model/urlnet_model.bin"
 
+def risk_band(score: float) -> str:
+    """Band for a URLNet score, with the same cut-offs as LLMRiskService.risk_band."""
+    if score >= llm_settings.th_high:
+        return "UNSAFE"
+    if score >= llm_settings.th_med:
+        return "MEDIUM RISK"
+    if score >= llm_settings.th_low:
+        return "LOW RISK"
+    return "SAFE"
+
 # ======== URLNet Wrapper ========
+# Length buckets: trimmed widths are rounded up to multiples of these
+CHAR_BUCKET = 16
+WORD_BUCKET = 4
+PADDING_COUNTERS = ("batches", "urls", "char_real", "char_cells", "char_cells_untrimmed",
+                    "word_real", "word_cells", "word_cells_untrimmed")
+
+
 class URLScorer:
-    def __init__(self, meta_path: str = None, weights_path: str = None):
+    def __init__(self, meta_path: str = None, weights_path: str = None, backend: str = None,
+                 quantize: bool = None, artifact=None, model: Optional[torch.nn.Module] = None):
+        # ``model``: a prebuilt float URLNet (e.g. one whose weights live in shared memory) to serve
+        # instead of loading ``weights_path``; the vocabularies still come from ``meta_path``
         # Import here to avoid startup issues
         from AI_model.encoders_from_notebook import enc_char_url, enc_words, enc_token_chars
+        from AI_model.encoder_engine import UrlEncoder
         from AI_model.modeldef_from_notebook import build_urlnet_from_state_dict
-        
-        if meta_path is None or weights_path is None:
-            meta_path, weights_path = get_model_paths()
-        with open(meta_path, "r", encoding="utf-8") as f:
-            meta = json.load(f)
+        from AI_model.vocab_array import ArrayVocab
+        from AI_model.vocab_bundle import load_meta
+
+        if artifact is None and (meta_path is None or (weights_path is None and model is None)):
+            artifact = get_model_artifact()
+        if artifact is not None:
+            meta_path, weights_path = artifact.meta_path, artifact.weights_path
+        self.version = artifact.version if artifact is not None else "unversioned"
+        # Prefer the precompiled vocab bundle next to meta.json; fall back to parsing the JSON
+        meta = None
+        if llm_settings.ml_vocab_bundle:
+            try:
+                meta = load_meta(meta_path, arrays=llm_settings.ml_vocab_arrays)
+            except Exception as e:
+                print(f"Warning: Could not load vocab bundle, parsing {meta_path}: {e}")
+        self.vocab_source = "bundle" if meta is not None else "json"
+        if meta is None:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if llm_settings.ml_vocab_arrays:
+                # Not shared without a bundle, but still far smaller than the dicts
+                meta.update({name: ArrayVocab.from_dict(meta[name]) for name in ("CHAR2ID", "WORD2ID", "TOKCHAR2ID")})
         self.CHAR2ID = meta["CHAR2ID"]
         self.WORD2ID = meta["WORD2ID"]
         self.TOKCHAR2ID = meta["TOKCHAR2ID"]
+        self.vocab_stats = self._vocab_stats()
         self.MAX_LEN = meta.get("MAX_LEN", 256)
         self.MAX_WORDS = meta.get("MAX_WORDS", 64)
         self.MAX_TOK_CHAR = meta.get("MAX_TOK_CHAR", 16)
 
-        sd = torch.load(weights_path, map_location="cpu")
-        if not isinstance(sd, dict) or any(not isinstance(k, str) for k in sd.keys()):
-            sd = sd.state_dict()
+        self.meta_path = meta_path
+        if model is None:
+            sd = torch.load(weights_path, map_location="cpu")
+            if not isinstance(sd, dict) or any(not isinstance(k, str) for k in sd.keys()):
+                sd = sd.state_dict()
 
-        if any(k.startswith("module.") for k in sd.keys()):
-            sd = {k[7:]: v for k, v in sd.items()}
+            if any(k.startswith("module.") for k in sd.keys()):
+                sd = {k[7:]: v for k, v in sd.items()}
 
-        self.model = build_urlnet_from_state_dict(self.CHAR2ID, self.WORD2ID, self.TOKCHAR2ID, sd)
+            model = build_urlnet_from_state_dict(self.CHAR2ID, self.WORD2ID, self.TOKCHAR2ID, sd,
+                                                 tok_pooling=llm_settings.ml_tok_pooling)
+        self.model = model
         self.model.eval()
-        
+
+        self.quantized = llm_settings.ml_quantize if quantize is None else bool(quantize)
+        if self.quantized:
+            from app.infrastructure.ml_quantization import quantize_model
+            self.model = quantize_model(self.model, embeddings=llm_settings.ml_quantize_embeddings)
+
         # Store encoder functions for use in score method
         self.enc_char_url = enc_char_url
         self.enc_words = enc_words
         self.enc_token_chars = enc_token_chars
+        # Table-driven encoder used on the scoring path (same ids as the functions above)
+        self.encoder = UrlEncoder(self.CHAR2ID, self.WORD2ID, self.TOKCHAR2ID,
+                                  max_len=self.MAX_LEN, max_words=self.MAX_WORDS, max_tok_char=self.MAX_TOK_CHAR)
 
-    def score(self, url: str) -> float:
-        x_char = torch.tensor([self.enc_char_url(url, self.CHAR2ID, max_len=self.MAX_LEN)], dtype=torch.long)
-        x_word = torch.tensor([self.enc_words(url, self.WORD2ID, max_words=self.MAX_WORDS)], dtype=torch.long)
-        x_tokc = torch.tensor([self.enc_token_chars(url, self.TOKCHAR2ID,
-                                               max_words=self.MAX_WORDS, max_tok_char=self.MAX_TOK_CHAR)],
-                              dtype=torch.long)
+        # Length bucketing: each batch is trimmed to its longest member plus one widest-kernel margin
+        # of padding, so every conv window value of the full-width batch still occurs and the global
+        # max-pool sees the same maxima. Widths are rounded up to buckets to keep shapes few.
+        self.length_buckets = llm_settings.ml_length_buckets
+        self._pad_margin = max((m.kernel_size[0] for m in self.model.modules()
+                                if isinstance(m, torch.nn.Conv1d)), default=1)
+        self._padding_lock = threading.Lock()
+        self._padding = dict.fromkeys(PADDING_COUNTERS, 0)
+
+        # Serve from a compiled artifact when configured; fall back to the eager model
+        self.backend = "eager"
+        self._runner = self.model
+        self.set_backend(backend if backend is not None else llm_settings.ml_backend)
+
+    def _vocab_stats(self) -> dict:
+        from AI_model.vocab_array import ArrayVocab, dict_memory_bytes
+
+        vocabs = {"CHAR2ID": self.CHAR2ID, "WORD2ID": self.WORD2ID, "TOKCHAR2ID": self.TOKCHAR2ID}
+        arrays = all(isinstance(v, ArrayVocab) for v in vocabs.values())
+        return {
+            "source": self.vocab_source,
+            "kind": "array" if arrays else "dict",
+            "shared": arrays and all(v.shared for v in vocabs.values()),
+            "bytes": {name: v.memory_bytes if isinstance(v, ArrayVocab) else dict_memory_bytes(v)
+                      for name, v in vocabs.items()},
+        }
+
+    def set_backend(self, backend: str):
+        from app.infrastructure.ml_backends import compile_model
+
+        backend = (backend or "eager").lower()
+        if backend == self.backend:
+            return
+        try:
+            example = self.encode_many(["http://example.com/login", "https://www.google.com/"])
+            runner = compile_model(self.model, backend, example, onnx_path=llm_settings.ml_onnx_path or None)
+        except Exception as e:
+            print(f"Warning: Could not initialise '{backend}' backend, using eager model: {e}")
+            return
+        self._runner, self.backend = runner, backend
+
+    def _forward(self, x_char: torch.Tensor, x_word: torch.Tensor, x_tokc: torch.Tensor) -> torch.Tensor:
+        """Run one forward pass and return probabilities of shape [B]."""
         with torch.no_grad():
-            out = self.model(x_char, x_word, x_tokc)
+            out = self._runner(x_char, x_word, x_tokc)
             prob = out.get("prob", None)
             if prob is None:
                 logit = out.get("logit", None)
                 if logit is None:
                     raise RuntimeError("Model output missing both 'prob' and 'logit'.")
                 prob = torch.sigmoid(logit)
-            return float(prob.squeeze().item())
\ No newline at end of file
+            return prob.reshape(-1)
+
+    def encode_many(self, urls: List[str]):
+        """Encode URLs into (x_char, x_word, x_tokc) int64 tensors."""
+        arrays = self.encoder.encode_batch(urls)
+        return tuple(torch.from_numpy(a) for a in arrays)
+
+    def _bucket(self, longest: int, cap: int, step: int) -> int:
+        width = -(-(longest + self._pad_margin) // step) * step
+        return min(cap, width)
+
+    def score_many(self, urls: List[str], batch_size: int = 256) -> List[float]:
+        """Score a list of URLs, running one forward pass per ``batch_size`` chunk."""
+        return self.score_many_with_stats(urls, batch_size)[0]
+
+    def score_many_with_stats(self, urls: List[str], batch_size: int = 256) -> Tuple[List[float], dict]:
+        """``score_many`` plus the padding counters of this call (also added to ``padding_stats``)."""
+        probs: List[float] = [0.0] * len(urls)
+        counts = dict.fromkeys(PADDING_COUNTERS, 0)
+        for idx, x in self.iter_batches(urls, batch_size, counts):
+            for i, p in zip(idx, self._forward(*x).tolist()):
+                probs[i] = p
+        self.record_padding(counts)
+        return probs, counts
+
+    def embed_many(self, urls: List[str], batch_size: int = 256) -> np.ndarray:
+        """Penultimate URLNet features (the input of ``fc``) as a float32 array [N, D].
+
+        Always runs the eager (possibly quantized) module, whatever the serving backend.
+        """
+        return self.embed_and_score_many(urls, batch_size)[0]
+
+    def embed_and_score_many(self, urls: List[str], batch_size: int = 256) -> Tuple[np.ndarray, List[float]]:
+        """``embed_many`` plus the scores ``fc`` gives those features, from the same forward pass."""
+        emb = np.empty((len(urls), self.embedding_dim), dtype=np.float32)
+        probs: List[float] = [0.0] * len(urls)
+        with torch.no_grad():
+            for idx, x in self.iter_batches(urls, batch_size):
+                h = self.model.embed(*x)
+                emb[idx] = h.numpy()
+                for i, p in zip(idx, torch.sigmoid(self.model.fc(h)).reshape(-1).tolist()):
+                    probs[i] = p
+        return emb, probs
+
+    @property
+    def embedding_dim(self) -> int:
+        return self.model.fc.in_features
+
+    def iter_batches(self, urls: List[str], batch_size: int = 256, counts: Optional[dict] = None):
+        """Yield (positions in ``urls``, (x_char, x_word, x_tokc)) per encoded batch.
+
+        With length bucketing, batches hold URLs of similar length trimmed to their longest
+        member; padding counters are added to ``counts`` if given.
+        """
+        # A ParsedUrl (app/core/parsed_url.py) brings its tokens, and for a batch of one its encoding
+        items = [u.tokens if isinstance(u, ParsedUrl) else self.encoder.tokenize(u) for u in urls]
+        batch_size = max(1, int(batch_size))
+        order = list(range(len(items)))
+        if self.length_buckets:
+            # Similar lengths share a chunk, so trimming to the longest member removes most padding
+            order.sort(key=lambda i: len(items[i][0]))
+
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            chunk = [items[i] for i in idx]
+            char_lens = [min(len(s), self.MAX_LEN) for s, _ in chunk]
+            word_lens = [min(len(t), self.MAX_WORDS) for _, t in chunk]
+            if self.length_buckets:
+                width = self._bucket(max(char_lens), self.MAX_LEN, CHAR_BUCKET)
+                words = self._bucket(max(word_lens), self.MAX_WORDS, WORD_BUCKET)
+            else:
+                width, words = self.MAX_LEN, self.MAX_WORDS
+            if len(idx) == 1 and isinstance(urls[idx[0]], ParsedUrl):
+                arrays = urls[idx[0]].encoding(self.encoder, width, words)
+            else:
+                arrays = self.encoder.encode_tokenized(chunk, max_len=width, max_words=words)
+
+            if counts is not None:
+                counts["batches"] += 1
+                counts["urls"] += len(chunk)
+                counts["char_real"] += sum(char_lens)
+                counts["char_cells"] += len(chunk) * width
+                counts["char_cells_untrimmed"] += len(chunk) * self.MAX_LEN
+                counts["word_real"] += sum(word_lens)
+                counts["word_cells"] += len(chunk) * words
+                counts["word_cells_untrimmed"] += len(chunk) * self.MAX_WORDS
+            yield idx, tuple(torch.from_numpy(a) for a in arrays)
+
+    def record_padding(self, counts: dict):
+        with self._padding_lock:
+            for k in PADDING_COUNTERS:
+                self._padding[k] += counts.get(k, 0)
+
+    @property
+    def padding_stats(self) -> dict:
+        """Padding-waste counters: share of encoded positions that were padding, with and without trimming."""
+        with self._padding_lock:
+            s = dict(self._padding)
+
+        def waste(real, cells):
+            return round(1.0 - real / cells, 4) if cells else 0.0
+
+        s["char_waste"] = waste(s["char_real"], s["char_cells"])
+        s["char_waste_untrimmed"] = waste(s["char_real"], s["char_cells_untrimmed"])
+        s["word_waste"] = waste(s["word_real"], s["word_cells"])
+        s["word_waste_untrimmed"] = waste(s["word_real"], s["word_cells_untrimmed"])
+        return s
+
+    def score(self, url: str) -> float:
+        return self.score_many([url])[0]
+
+
+# ======== Micro-batching front end ========
+class MicroBatcher:
+    """Coalesce concurrent ``score`` calls into batched forwards on one worker thread.
+
+    Callers block on a future while the worker collects up to ``max_batch_size`` URLs,
+    waiting at most ``max_wait_ms`` after the first one arrives before running the batch.
+    """
+
+    def __init__(self, scorer: URLScorer, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.scorer = scorer
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "items": 0, "max_batch": 0}
+        self._closed = False
+        self._running = threading.Lock()  # held while a batch is dispatched
+        self._worker = threading.Thread(target=self._run, name="urlnet-batcher", daemon=True)
+        self._worker.start()
+
+    def __getattr__(self, name):
+        # Expose the wrapped scorer's attributes (vocabularies, MAX_* limits, model, ...)
+        if name == "scorer":
+            raise AttributeError(name)
+        return getattr(self.scorer, name)
+
+    def score(self, url: str, timeout: Optional[float] = None) -> float:
+        fut: Future = Future()
+        with self._lock:
+            # Checked under the lock close() takes, so nothing is queued behind the stop sentinel
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed.")
+            self._queue.put((url, fut))
+        return fut.result(timeout)
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+        s["avg_batch"] = (s["items"] / s["batches"]) if s["batches"] else 0.0
+        s["queue_depth"] = self._queue.qsize()
+        return s
+
+    def swap(self, scorer: URLScorer) -> URLScorer:
+        """Atomically replace the wrapped scorer; a batch already running finishes on the old one."""
+        with self._lock:
+            old, self.scorer = self.scorer, scorer
+        return old
+
+    def drain(self):
+        """Wait for the batch being dispatched right now, e.g. on a scorer just swapped out."""
+        with self._running:
+            pass
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop the worker after it finishes the requests already queued.
+
+        Requests the worker did not get to (it died, or ``timeout`` expired) fail with RuntimeError.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join(timeout)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("MicroBatcher is closed."))
+
+    def _collect(self, first: tuple) -> tuple[list, bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect(first)
+            # Skip callers that gave up (cancelled futures) before we spend compute on them
+            batch = [(u, f) for u, f in batch if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            with self._running:
+                with self._lock:
+                    scorer = self.scorer
+                self._dispatch(scorer, batch)
+
+    def _dispatch(self, scorer: URLScorer, batch: list):
+        """Score one collected batch on the worker thread and resolve its futures."""
+        try:
+            probs = scorer.score_many([u for u, _ in batch])
+        except Exception as e:
+            self._resolve(batch, error=e)
+        else:
+            self._resolve(batch, probs)
+
+    def _resolve(self, batch: list, probs: Optional[List[float]] = None, error: Optional[BaseException] = None):
+        if error is not None:
+            for _, f in batch:
+                f.set_exception(error)
+        else:
+            for (_, f), p in zip(batch, probs):
+                f.set_result(p)
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["items"] += len(batch)
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
@@ -0,0 +1,531 @@
+"""Nearest-neighbour lookups over URLNet embeddings of known-bad URLs.
+
+``NeighborIndex`` keeps the penultimate URLNet features (``URLScorer.embed_many``) of the
+flagged ``risk_url`` rows in RAM and answers cosine top-k queries, so a scored URL can come
+with "looks like these known campaigns" context without an LLM round trip.
+
+Rows are L2-normalised and stored as int8 codes with one float scale each (D + 4 bytes per
+URL plus its id and UTF-8 bytes in one ``UrlTable`` blob). Small indexes are searched brute force, a BLAS product over
+chunks of rows. Large ones are partitioned IVF-style: spherical k-means centroids are
+trained on a sample, rows are stored grouped by nearest centroid (CSR offsets, as in the
+vocab bundle), and a query scans only the ``nprobe`` closest lists.
+
+A build embeds the rows page by page straight into preallocated int8 arrays, so no float
+copy of the whole index is ever held. One process per node builds (whichever holds
+``builder.lock`` in the index directory) and saves every version there as ``.npy`` files;
+the other API workers memory-map the latest one, so the codes sit in the page cache once per
+node. The builder only embeds flagged rows past the highest id already indexed every
+``refresh_s``; it re-embeds everything and retrains the centroids only when the serving model
+version changes (or every ``rebuild_s``, if set, which also drops rows no longer flagged and
+picks up older rows flagged since they were created). Embeddings are model-specific: an
+index records the model version it was built with.
+"""
+from __future__ import annotations
+
+import json
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Below this many rows brute force is both exact and fast enough
+IVF_MIN_ROWS = 20_000
+_SEARCH_CHUNK = 32_768
+_ARRAYS = ("codes", "scales", "ids", "risk_levels", "centroids", "offsets", "url_blob", "url_offsets")
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def quantize_rows(x: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 codes and scales: ``x[i] ~= codes[i] * scales[i]``."""
+    peak = np.abs(x).max(axis=1)
+    scales = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(x / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def train_centroids(x: np.ndarray, nlist: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit rows ``x``; returns unit centroids [nlist, D]."""
+    rng = np.random.default_rng(seed)
+    nlist = max(1, min(nlist, len(x)))
+    centroids = x[rng.choice(len(x), nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = ~sums.any(axis=1)
+        if empty.any():
+            # Re-seed empty lists from random rows so every list stays usable
+            sums[empty] = x[rng.choice(len(x), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _assign(codes: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # Row scales are positive, so a code row's nearest centroid is that of the row it encodes
+    return np.concatenate([np.argmax(codes[i:i + _SEARCH_CHUNK].astype(np.float32) @ centroids.T, axis=1)
+                           for i in range(0, len(codes), _SEARCH_CHUNK)]) if len(codes) else np.empty(0, np.int64)
+
+
+class UrlTable:
+    """Read-only sequence of URLs stored as one UTF-8 blob plus offsets (memory-mappable)."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_list(cls, urls: Sequence[str]) -> "UrlTable":
+        data = [u.encode("utf-8") for u in urls]
+        offsets = np.zeros(len(data) + 1, np.int64)
+        np.cumsum([len(d) for d in data], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(data), np.uint8), offsets)
+
+    @classmethod
+    def concat(cls, tables: Sequence["UrlTable"]) -> "UrlTable":
+        if not tables:
+            return cls.from_list([])
+        offsets, base = [np.zeros(1, np.int64)], 0
+        for t in tables:
+            offsets.append(np.asarray(t.offsets[1:], np.int64) + base)
+            base += int(t.offsets[-1])
+        return cls(np.concatenate([t.blob for t in tables]), np.concatenate(offsets))
+
+    def take(self, order: np.ndarray) -> "UrlTable":
+        """The URLs at positions ``order``, copied byte-wise (no per-URL Python objects)."""
+        starts = np.asarray(self.offsets[:-1])[order]
+        lens = np.asarray(self.offsets[1:])[order] - starts
+        offsets = np.zeros(len(order) + 1, np.int64)
+        np.cumsum(lens, out=offsets[1:])
+        blob = np.empty(int(offsets[-1]), np.uint8)
+        for a in range(0, len(order), _SEARCH_CHUNK):
+            b = min(len(order), a + _SEARCH_CHUNK)
+            src = np.repeat(starts[a:b] - offsets[a:b], lens[a:b]) + np.arange(offsets[a], offsets[b])
+            blob[offsets[a]:offsets[b]] = self.blob[src]
+        return UrlTable(blob, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.blob.nbytes + self.offsets.nbytes)
+
+
+class NeighborIndex:
+    def __init__(self, codes: np.ndarray, scales: np.ndarray, ids: np.ndarray, urls: Sequence[str] | UrlTable,
+                 risk_levels: np.ndarray, model_version: Optional[str] = None,
+                 centroids: Optional[np.ndarray] = None, offsets: Optional[np.ndarray] = None,
+                 built_at: Optional[float] = None):
+        self.codes = codes
+        self.scales = scales
+        self.ids = ids
+        self.urls = urls if isinstance(urls, UrlTable) else UrlTable.from_list(urls)
+        self.risk_levels = risk_levels
+        self.model_version = model_version
+        self.centroids = centroids
+        self.offsets = offsets
+        self.built_at = time.time() if built_at is None else built_at  # last full build
+        self.updated_at = time.time()
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, ids: Sequence[int], urls: Sequence[str],
+              risk_levels: Optional[Sequence[int]] = None, *, model_version: Optional[str] = None,
+              nlist: int = 0, train_size: int = 65_536, iters: int = 10, seed: int = 0) -> "NeighborIndex":
+        """Index ``embeddings`` [N, D]; ``nlist`` 0 picks brute force below IVF_MIN_ROWS, else ~4*sqrt(N) lists."""
+        x = _normalize(embeddings)
+        n = len(x)
+        codes, scales = quantize_rows(x) if n else (np.empty((0, x.shape[1] if x.ndim == 2 else 0), np.int8),
+                                                    np.empty(0, np.float32))
+        risk = np.asarray(risk_levels if risk_levels is not None else np.zeros(n), dtype=np.int8)
+        return cls.from_codes(codes, scales, ids, urls, risk, model_version=model_version, nlist=nlist,
+                              train_size=train_size, iters=iters, seed=seed)
+
+    @classmethod
+    def from_codes(cls, codes: np.ndarray, scales: np.ndarray, ids: Sequence[int], urls: Sequence[str],
+                   risk_levels: np.ndarray, *, model_version: Optional[str] = None, nlist: int = 0,
+                   train_size: int = 65_536, iters: int = 10, seed: int = 0) -> "NeighborIndex":
+        """Index already quantized unit rows (see ``quantize_rows``), grouping them into IVF lists if large."""
+        n = len(codes)
+        ids = np.asarray(ids, dtype=np.int64)
+        risk = np.asarray(risk_levels, dtype=np.int8)
+        if nlist == 0:
+            nlist = int(4 * np.sqrt(n)) if n >= IVF_MIN_ROWS else 1
+        centroids = offsets = None
+        urls = urls if isinstance(urls, UrlTable) else UrlTable.from_list(urls)
+        if nlist > 1 and n > nlist:
+            rng = np.random.default_rng(seed)
+            pick = np.sort(rng.choice(n, min(n, train_size), replace=False))
+            sample = _normalize(codes[pick].astype(np.float32) * scales[pick, None])
+            centroids = train_centroids(sample, nlist, iters, seed)
+            assign = _assign(codes, centroids)
+            order = np.argsort(assign, kind="stable")
+            codes, scales, ids, risk = codes[order], scales[order], ids[order], risk[order]
+            urls = urls.take(order)
+            offsets = np.searchsorted(assign[order], np.arange(len(centroids) + 1)).astype(np.int64)
+        return cls(codes, scales, ids, urls, risk, model_version, centroids, offsets)
+
+    def append(self, codes: np.ndarray, scales: np.ndarray, ids: Sequence[int], urls: Sequence[str],
+               risk_levels: np.ndarray) -> "NeighborIndex":
+        """A new index with these quantized rows added to the existing lists (centroids are kept)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        risk = np.asarray(risk_levels, dtype=np.int8)
+        all_codes = np.concatenate([self.codes, codes]) if len(self.codes) else codes
+        all_scales = np.concatenate([self.scales, scales])
+        all_ids = np.concatenate([self.ids, ids])
+        all_risk = np.concatenate([self.risk_levels, risk])
+        all_urls = UrlTable.concat([self.urls, urls if isinstance(urls, UrlTable) else UrlTable.from_list(urls)])
+        offsets = None
+        if self.centroids is not None:
+            lists = np.concatenate([np.repeat(np.arange(len(self.centroids)), np.diff(self.offsets)),
+                                    _assign(codes, self.centroids)])
+            order = np.argsort(lists, kind="stable")
+            all_codes, all_scales = all_codes[order], all_scales[order]
+            all_ids, all_risk = all_ids[order], all_risk[order]
+            all_urls = all_urls.take(order)
+            offsets = np.searchsorted(lists[order], np.arange(len(self.centroids) + 1)).astype(np.int64)
+        return NeighborIndex(all_codes, all_scales, all_ids, all_urls, all_risk, self.model_version,
+                             self.centroids, offsets, built_at=self.built_at)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.codes.shape[1]
+
+    @property
+    def last_id(self) -> int:
+        """Highest risk_url id indexed; later rows are added by ``append``."""
+        return int(self.ids.max()) if len(self.ids) else 0
+
+    @property
+    def shared(self) -> bool:
+        """True when the arrays are memory-mapped from a saved index (shared through the page cache)."""
+        return isinstance(self.codes, np.memmap)
+
+    @property
+    def memory_bytes(self) -> int:
+        arrays = [self.codes, self.scales, self.ids, self.risk_levels, self.centroids, self.offsets]
+        return int(sum(a.nbytes for a in arrays if a is not None) + self.urls.nbytes)
+
+    @property
+    def stats(self) -> dict:
+        return {"rows": len(self), "dim": self.dim, "model_version": self.model_version,
+                "nlist": len(self.centroids) if self.centroids is not None else 0,
+                "memory_bytes": self.memory_bytes, "shared": self.shared,
+                "built_at": self.built_at, "updated_at": self.updated_at}
+
+    def save(self, root: str | Path) -> Path:
+        """Write the index as a new snapshot under ``root`` and point ``root/CURRENT`` at it."""
+        root = Path(root)
+        target = root / f"index-{time.time_ns()}"
+        staging = root / f".{target.name}.tmp"
+        staging.mkdir(parents=True)
+        table = self.urls
+        arrays = {"codes": self.codes, "scales": self.scales, "ids": self.ids, "risk_levels": self.risk_levels,
+                  "centroids": self.centroids, "offsets": self.offsets,
+                  "url_blob": table.blob, "url_offsets": table.offsets}
+        for name, arr in arrays.items():
+            if arr is not None:
+                np.save(staging / f"{name}.npy", np.ascontiguousarray(arr))
+        meta = {"model_version": self.model_version, "built_at": self.built_at, "dim": int(self.codes.shape[1])}
+        (staging / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        staging.rename(target)
+        marker = root / ".CURRENT.tmp"
+        marker.write_text(target.name, encoding="utf-8")
+        marker.replace(root / "CURRENT")
+        # Keep the previous snapshot for workers still switching; mapped files survive unlinking
+        for old in sorted(p for p in root.glob("index-*") if p.name != target.name)[:-1]:
+            shutil.rmtree(old, ignore_errors=True)
+        return target
+
+    @classmethod
+    def load(cls, path: str | Path) -> "NeighborIndex":
+        """Memory-map a snapshot written by ``save``."""
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") if (path / f"{name}.npy").exists() else None
+                  for name in _ARRAYS}
+        codes = arrays["codes"]
+        if codes.shape[0] == 0:
+            codes = np.empty((0, meta["dim"]), np.int8)  # np.load cannot map an empty file
+        return cls(codes, arrays["scales"], arrays["ids"], UrlTable(arrays["url_blob"], arrays["url_offsets"]),
+                   arrays["risk_levels"], meta["model_version"], arrays["centroids"], arrays["offsets"],
+                   built_at=meta["built_at"])
+
+    def _scan(self, q: np.ndarray, start: int, stop: int, k: int):
+        """Top ``k`` (similarities, rows) of rows [start, stop) for unit query rows ``q`` [M, D]."""
+        best_s = np.full((len(q), 0), -np.inf, np.float32)
+        best_i = np.empty((len(q), 0), np.int64)
+        for a in range(start, stop, _SEARCH_CHUNK):
+            b = min(stop, a + _SEARCH_CHUNK)
+            sims = (q @ self.codes[a:b].astype(np.float32).T) * self.scales[a:b]
+            best_s = np.concatenate([best_s, sims], axis=1)
+            best_i = np.concatenate([best_i, np.broadcast_to(np.arange(a, b), sims.shape)], axis=1)
+            if best_s.shape[1] > k:
+                keep = np.argpartition(-best_s, k - 1, axis=1)[:, :k]
+                best_s = np.take_along_axis(best_s, keep, axis=1)
+                best_i = np.take_along_axis(best_i, keep, axis=1)
+        return best_s, best_i
+
+    def search(self, queries: np.ndarray, k: int = 5, nprobe: int = 8,
+               exclude_ids: Optional[Sequence[Optional[int]]] = None) -> List[List[Dict]]:
+        """Top ``k`` neighbours of each query embedding, most similar first.
+
+        ``exclude_ids[j]`` (e.g. the query URL's own risk_url id) is left out of query j's results.
+        """
+        q = _normalize(np.atleast_2d(queries))
+        k = max(1, int(k))
+        results: List[List[Dict]] = []
+        if not len(self):
+            return [[] for _ in range(len(q))]
+        for j in range(len(q)):
+            skip = exclude_ids[j] if exclude_ids is not None else None
+            want = k + (skip is not None)
+            if self.centroids is None:
+                ranges = [(0, len(self))]
+            else:
+                lists = np.argsort(-(self.centroids @ q[j]))[:max(1, nprobe)]
+                ranges = [(int(self.offsets[c]), int(self.offsets[c + 1])) for c in lists]
+            sims, rows = [], []
+            for a, b in ranges:
+                if b > a:
+                    s, i = self._scan(q[j:j + 1], a, b, want)
+                    sims.append(s[0])
+                    rows.append(i[0])
+            if not sims:
+                results.append([])
+                continue
+            sims, rows = np.concatenate(sims), np.concatenate(rows)
+            order = np.argsort(-sims, kind="stable")
+            hits = []
+            for r in order:
+                row_id = int(self.ids[rows[r]])
+                if row_id == skip:
+                    continue
+                hits.append({"id": row_id, "url": self.urls[rows[r]],
+                             "similarity": round(float(sims[r]), 4), "risk_level": int(self.risk_levels[rows[r]])})
+                if len(hits) == k:
+                    break
+            results.append(hits)
+        return results
+
+
+def embed_flagged(session_factory, scorer, *, min_risk_level: int = 3, after_id: int = 0,
+                  page_rows: int = 4096) -> tuple:
+    """(codes, scales, ids, urls, risk_levels) of the flagged rows after ``after_id``.
+
+    Pages are embedded and quantized straight into arrays sized by a count query, so only one
+    page of float embeddings (or of URL strings; ``urls`` is a ``UrlTable``) exists at a time. Rows flagged after the count are left for the
+    next call (they are past the returned ids).
+    """
+    from app.infrastructure.repositories import SqlAlchemyUrlRiskRepository
+
+    session = session_factory()
+    try:
+        total = SqlAlchemyUrlRiskRepository(session).count_flagged(min_risk_level=min_risk_level, after_id=after_id)
+    finally:
+        session.close()
+    dim = scorer.embedding_dim
+    codes = np.empty((total, dim), np.int8)
+    scales = np.empty(total, np.float32)
+    ids = np.empty(total, np.int64)
+    risk = np.empty(total, np.int8)
+    pages: List[UrlTable] = []
+    n = 0
+    while n < total:
+        session = session_factory()
+        try:
+            rows = SqlAlchemyUrlRiskRepository(session).list_flagged(
+                min_risk_level=min_risk_level, after_id=after_id, limit=min(page_rows, total - n))
+        finally:
+            session.close()
+        if not rows:
+            break  # rows deleted or unflagged since the count
+        m = len(rows)
+        codes[n:n + m], scales[n:n + m] = quantize_rows(_normalize(scorer.embed_many([r.full_url for r in rows])))
+        ids[n:n + m] = [r.id for r in rows]
+        risk[n:n + m] = [r.risk_level for r in rows]
+        pages.append(UrlTable.from_list([r.full_url for r in rows]))
+        n += m
+        after_id = rows[-1].id
+    return codes[:n], scales[:n], ids[:n], UrlTable.concat(pages), risk[:n]
+
+
+def build_index_from_db(session_factory, scorer, *, min_risk_level: int = 3, nlist: int = 0,
+                        page_rows: int = 4096) -> NeighborIndex:
+    """Embed every flagged risk_url row (risk_level >= ``min_risk_level`` or phishing_flag) with ``scorer``."""
+    codes, scales, ids, urls, risk = embed_flagged(session_factory, scorer, min_risk_level=min_risk_level,
+                                                   page_rows=page_rows)
+    return NeighborIndex.from_codes(codes, scales, ids, urls, risk, model_version=scorer.version, nlist=nlist)
+
+
+def append_from_db(index: NeighborIndex, session_factory, scorer, *, min_risk_level: int = 3,
+                   page_rows: int = 4096) -> NeighborIndex:
+    """``index`` plus the flagged rows created since it was built (itself if there are none)."""
+    codes, scales, ids, urls, risk = embed_flagged(session_factory, scorer, min_risk_level=min_risk_level,
+                                                   after_id=index.last_id, page_rows=page_rows)
+    return index.append(codes, scales, ids, urls, risk) if len(ids) else index
+
+
+_index: Optional[NeighborIndex] = None
+
+
+def get_neighbor_index() -> Optional[NeighborIndex]:
+    return _index
+
+
+def set_neighbor_index(index: Optional[NeighborIndex]):
+    global _index
+    _index = index
+
+
+class NeighborIndexer:
+    """Background thread that keeps the process-wide index current.
+
+    The process holding ``<index_dir>/builder.lock`` builds: it appends newly flagged rows every
+    ``refresh_s`` seconds, rebuilds from scratch when the serving model version changes (and
+    every ``rebuild_s`` seconds if set), and saves each new index to ``index_dir``. Every other
+    process just maps the latest saved index; if the builder exits, the next poll elects another.
+    """
+
+    def __init__(self, session_factory, llm_session, *, index_dir: str | Path, min_risk_level: int = 3,
+                 nlist: int = 0, refresh_s: float = 300.0, rebuild_s: float = 0.0, poll_s: float = 30.0):
+        self.session_factory = session_factory
+        self.llm_session = llm_session
+        self.index_dir = Path(index_dir)
+        self.min_risk_level = min_risk_level
+        self.nlist = nlist
+        self.refresh_s = float(refresh_s)
+        self.rebuild_s = float(rebuild_s)
+        self.poll_s = float(poll_s)
+        self.error: Optional[str] = None
+        self._lock_file = None
+        self._loaded: Optional[str] = None  # snapshot name this process serves
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_builder(self) -> bool:
+        return self._lock_file is not None
+
+    def _try_lead(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            return True  # no flock: every process builds its own index, unshared
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        f = open(self.index_dir / "builder.lock", "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._lock_file = f
+        return True
+
+    def _current_snapshot(self) -> Optional[str]:
+        try:
+            return (self.index_dir / "CURRENT").read_text(encoding="utf-8").strip() or None
+        except OSError:
+            return None
+
+    def _publish(self, index: NeighborIndex, t0: float, how: str) -> NeighborIndex:
+        try:
+            self._loaded = index.save(self.index_dir).name
+        except OSError as e:
+            print(f"Warning: could not save the URL neighbour index: {e}")
+        set_neighbor_index(index)
+        print(f"URL neighbour index {how}: {len(index)} rows, model {index.model_version}, "
+              f"{index.memory_bytes / 2 ** 20:.1f} MiB, in {time.perf_counter() - t0:.1f}s")
+        return index
+
+    def rebuild(self) -> NeighborIndex:
+        t0 = time.perf_counter()
+        index = build_index_from_db(self.session_factory, self.llm_session.scorer,
+                                    min_risk_level=self.min_risk_level, nlist=self.nlist)
+        return self._publish(index, t0, "built")
+
+    def refresh(self) -> NeighborIndex:
+        """Builder step: rebuild if the model changed (or rebuild_s passed), else append new rows."""
+        index = get_neighbor_index()
+        if index is None or self._needs_rebuild(index):
+            return self.rebuild()
+        t0 = time.perf_counter()
+        grown = append_from_db(index, self.session_factory, self.llm_session.scorer,
+                               min_risk_level=self.min_risk_level)
+        if grown is index:
+            index.updated_at = time.time()
+            return index
+        return self._publish(grown, t0, f"appended {len(grown) - len(index)} rows")
+
+    def _needs_rebuild(self, index: NeighborIndex) -> bool:
+        version = getattr(self.llm_session.scorer, "version", None)
+        return (version is not None and version != index.model_version) or \
+            (self.rebuild_s > 0 and time.time() - index.built_at >= self.rebuild_s)
+
+    def _follow(self):
+        """Map the builder's latest snapshot when it changed (or nothing is served yet)."""
+        name = self._current_snapshot()
+        if name is not None and (name != self._loaded or get_neighbor_index() is None):
+            set_neighbor_index(NeighborIndex.load(self.index_dir / name))
+            self._loaded = name
+
+    def _due(self) -> bool:
+        index = get_neighbor_index()
+        if index is None:
+            return True
+        scorer = self.llm_session._scorer  # do not trigger a model load just to poll
+        version = getattr(scorer, "version", None)
+        return (version is not None and version != index.model_version) or \
+            time.time() - index.updated_at >= self.refresh_s
+
+    def run_once(self):
+        if not self._try_lead():
+            self._follow()
+            return
+        if get_neighbor_index() is None:
+            # A new builder (e.g. after the previous one exited) continues from the saved index
+            self._follow()
+        if self._due():
+            self.refresh()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                self.error = None
+            except Exception as e:
+                if self.error != str(e):
+                    print(f"Warning: URL neighbour index update failed: {e}")
+                self.error = str(e)
+            self._stop.wait(self.poll_s)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="url-neighbors", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
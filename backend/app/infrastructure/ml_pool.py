@@ -0,0 +1,195 @@
+"""Out-of-process URLNet scoring.
+
+``ProcessScorerPool`` serves URLNet from N spawned worker processes. The parent moves the
+float model's parameters into shared memory (``Module.share_memory``) and hands the module
+to every worker through ``torch.multiprocessing``, so the weights are mapped once instead
+of being copied into each worker. Concurrent ``score`` calls are micro-batched like
+``MicroBatcher``, but each collected batch is shipped to an idle worker instead of being
+run on the collector thread, so up to N batches are encoded and scored in parallel without
+holding the API process's GIL.
+
+Only the eager float weights are shared: with ML_QUANTIZE or a compiled ML_BACKEND each
+worker quantizes/compiles its own copy from the shared model.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+import torch
+import torch.multiprocessing as torch_mp
+
+from app.infrastructure.ml_model import MicroBatcher, URLScorer
+
+_WARMUP_URLS = ["https://www.example.com/", "http://login.example-bank.com.verify.xyz/session?id=1"]
+
+# Per-worker-process scorer, built by _init_worker
+_worker_scorer: Optional[URLScorer] = None
+
+
+def _init_worker(model: torch.nn.Module, meta_path: str, backend: str, quantize: bool, threads: int,
+                 workers: int = 1):
+    global _worker_scorer
+    from app.core.config import llm_settings
+    from app.infrastructure.ml_runtime import apply_execution_profile
+    # With a profile, workers split (and pin to) the parent's CPUs among themselves and take the
+    # profile's thread share unless ML_INTRA_OP_THREADS / threads_per_worker set a count
+    if not apply_execution_profile(workers=workers, threads=threads or None)["profile"]:
+        # Without one, torch would start a thread per core in every worker
+        torch.set_num_threads(llm_settings.ml_intra_op_threads or threads or 1)
+    _worker_scorer = URLScorer(meta_path, backend=backend, quantize=quantize, model=model)
+    _worker_scorer.score_many(_WARMUP_URLS)
+
+
+def worker_scorer() -> URLScorer:
+    """The scorer of the current worker process, for functions run through ``ProcessScorerPool.submit``."""
+    if _worker_scorer is None:
+        raise RuntimeError("Not running inside a ProcessScorerPool worker.")
+    return _worker_scorer
+
+
+def _score_batch(urls: List[str]) -> Tuple[List[float], dict]:
+    # Padding counters travel back with the scores so the parent's padding_stats cover the workers
+    return _worker_scorer.score_many_with_stats(urls)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class ProcessScorerPool(MicroBatcher):
+    """``MicroBatcher`` front end whose batches run on a pool of worker processes.
+
+    ``scorer`` must hold an eager, non-quantized model: its weights are the ones shared with
+    the workers, which then apply ``backend`` / ``quantize`` themselves.
+    """
+
+    def __init__(self, scorer: URLScorer, workers: int = 0, max_batch_size: int = 32,
+                 max_wait_ms: float = 2.0, threads_per_worker: int = 0,
+                 backend: str = "eager", quantize: bool = False):
+        self.workers = max(1, int(workers) or os.cpu_count() or 1)
+        self.threads_per_worker = max(0, int(threads_per_worker))  # 0 = from the execution profile
+        self.worker_backend = backend
+        self.worker_quantize = bool(quantize)
+        # One in-flight batch per worker; while all are busy, URLs pile up into bigger batches
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._executor = self._start(scorer)
+        super().__init__(scorer, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+    def _start(self, scorer: URLScorer) -> ProcessPoolExecutor:
+        if scorer.quantized or scorer.backend != "eager":
+            raise ValueError("ProcessScorerPool needs an eager float URLScorer to share its weights.")
+        scorer.model.share_memory()
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            # fork is unsafe once torch has started its own threads
+            mp_context=torch_mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(scorer.model, scorer.meta_path, self.worker_backend,
+                      self.worker_quantize, self.threads_per_worker, self.workers),
+        )
+        # Spawn (and warm) every worker now rather than on the first requests
+        for _ in range(self.workers):
+            executor.submit(_ping)
+        return executor
+
+    @property
+    def stats(self) -> dict:
+        s = super().stats
+        s.update({"executor": "process", "workers": self.workers,
+                  "threads_per_worker": self.threads_per_worker})
+        return s
+
+    def worker_pids(self) -> List[int]:
+        with self._lock:
+            executor = self._executor
+        return sorted({f.result() for f in [executor.submit(_ping) for _ in range(self.workers * 4)]})
+
+    def score_many(self, urls: List[str], batch_size: int = 256) -> List[float]:
+        """Score ``urls`` by spreading ``batch_size`` chunks over all workers."""
+        urls = list(urls)
+        if not urls:
+            return []
+        # Small lists are still split so every worker gets a share
+        size = max(1, min(int(batch_size), -(-len(urls) // self.workers)))
+        futures = [self._call(_score_batch, urls[i:i + size]) for i in range(0, len(urls), size)]
+        probs: List[float] = []
+        for i, f in zip(range(0, len(urls), size), futures):
+            try:
+                chunk, counts = f.result()
+            except BrokenProcessPool:
+                # The pool broke under this chunk; _call restarts it, so retry the chunk once
+                chunk, counts = self._call(_score_batch, urls[i:i + size]).result()
+            probs.extend(chunk)
+            self.scorer.record_padding(counts)
+        return probs
+
+    def submit(self, fn, *args) -> Future:
+        """Run a module-level ``fn(*args)`` on a worker; it can reach the model through ``worker_scorer()``."""
+        return self._call(fn, *args)
+
+    def swap(self, scorer: URLScorer) -> URLScorer:
+        """Start workers for ``scorer`` and switch to them; batches in flight finish on the old pool."""
+        executor = self._start(scorer)
+        with self._lock:
+            old, self.scorer = self.scorer, scorer
+            old_executor, self._executor = self._executor, executor
+        old_executor.shutdown(wait=False)
+        return old
+
+    def close(self, timeout: Optional[float] = None):
+        if self._closed:
+            return
+        super().close(timeout)
+        self._executor.shutdown(wait=True)
+
+    def _call(self, fn, *args) -> Future:
+        """Submit ``fn(*args)``; if a worker died (e.g. OOM-killed), replace the pool once and retry."""
+        with self._lock:
+            executor = self._executor
+        try:
+            return executor.submit(fn, *args)
+        except BrokenProcessPool:
+            return self._restart(executor).submit(fn, *args)
+
+    def _restart(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is not broken:
+                return self._executor  # already replaced (restart or swap)
+            scorer = self.scorer
+        # Spawn outside the lock: stats, swap and worker_pids take it and must not wait for N workers
+        fresh = self._start(scorer)
+        with self._lock:
+            installed = self._executor is broken
+            if installed:
+                self._executor = fresh
+            executor = self._executor
+        if installed:
+            print("Warning: URL scoring worker pool was broken, restarted it")
+        else:
+            fresh.shutdown(wait=False)  # a concurrent caller restarted it first
+        return executor
+
+    def _dispatch(self, scorer: URLScorer, batch: list):
+        self._slots.acquire()
+        try:
+            fut = self._call(_score_batch, [u for u, _ in batch])
+        except Exception as e:
+            self._slots.release()
+            self._resolve(batch, error=e)
+            return
+
+        def _done(f: Future):
+            self._slots.release()
+            error = f.exception()
+            if error is not None:
+                self._resolve(batch, error=error)
+            else:
+                probs, counts = f.result()
+                scorer.record_padding(counts)
+                self._resolve(batch, probs)
+
+        fut.add_done_callback(_done)
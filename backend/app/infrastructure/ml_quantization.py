@@ -0,0 +1,87 @@
+"""INT8 quantized scoring mode for URLNet.
+
+``quantize_model`` applies post-training dynamic quantization to a float ``URLNetDynamic``:
+``fc`` and the ``proj`` Linear layers get INT8 weights with dynamically quantized
+activations, and the embedding (and embedding-bag) tables are stored as per-row 8-bit weights. PyTorch's
+dynamic quantization has no Conv1d kernel, so the conv layers stay in float.
+
+``accuracy_delta_report`` compares a quantized scorer against the float one on a
+held-out URL list:
+
+    python -m app.infrastructure.ml_quantization --urls heldout_urls.txt
+"""
+from __future__ import annotations
+
+import copy
+import io
+import json
+import time
+from typing import Iterable, List
+
+import torch
+import torch.nn as nn
+
+from app.infrastructure.ml_model import risk_band
+
+
+def quantize_model(model: nn.Module, embeddings: bool = True) -> nn.Module:
+    """Return an INT8 dynamically quantized copy of ``model`` (the input is left untouched)."""
+    from torch.ao.quantization import default_dynamic_qconfig, float_qparams_weight_only_qconfig, quantize_dynamic
+
+    spec = {nn.Linear: default_dynamic_qconfig}
+    if embeddings:
+        spec[nn.Embedding] = float_qparams_weight_only_qconfig
+        spec[nn.EmbeddingBag] = float_qparams_weight_only_qconfig
+    quantized = quantize_dynamic(copy.deepcopy(model).eval(), spec, dtype=torch.qint8)
+    return quantized.eval()
+
+
+def model_size_bytes(model: nn.Module) -> int:
+    """Serialized state_dict size, a proxy for the model's resident weight memory."""
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.getbuffer().nbytes
+
+
+def accuracy_delta_report(float_scorer, quant_scorer, urls: Iterable[str], batch_size: int = 256) -> dict:
+    """Score ``urls`` with both scorers and summarise how far the quantized model drifts."""
+    urls = list(urls)
+    t0 = time.perf_counter()
+    ref = float_scorer.score_many(urls, batch_size=batch_size)
+    t_float = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = quant_scorer.score_many(urls, batch_size=batch_size)
+    t_quant = time.perf_counter() - t0
+
+    deltas = sorted(abs(a - b) for a, b in zip(ref, got))
+    n = len(deltas)
+    return {
+        "n": n,
+        "mean_abs_delta": (sum(deltas) / n) if n else 0.0,
+        "p99_abs_delta": deltas[min(n - 1, int(n * 0.99))] if n else 0.0,
+        "max_abs_delta": deltas[-1] if n else 0.0,
+        "band_agreement": (sum(risk_band(a) == risk_band(b) for a, b in zip(ref, got)) / n) if n else 1.0,
+        "float_seconds": t_float,
+        "quantized_seconds": t_quant,
+        "float_model_bytes": model_size_bytes(float_scorer.model),
+        "quantized_model_bytes": model_size_bytes(quant_scorer.model),
+    }
+
+
+def _read_urls(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.infrastructure.ml_model import URLScorer
+
+    parser = argparse.ArgumentParser(description="Accuracy delta of the INT8 URLNet against the float model.")
+    parser.add_argument("--urls", required=True, help="Text file with one held-out URL per line")
+    args = parser.parse_args()
+
+    float_scorer = URLScorer(backend="eager", quantize=False)
+    quant_scorer = URLScorer(backend="eager", quantize=True)
+    print(json.dumps(accuracy_delta_report(float_scorer, quant_scorer, _read_urls(args.urls)), indent=2))
@@ -0,0 +1,194 @@
+"""Torch execution profiles for URLNet inference.
+
+Every uvicorn worker (and every ``ProcessScorerPool`` worker) runs its own torch, and by
+default each one starts an intra-op thread per core, so N workers on a node oversubscribe
+the CPU N times over. ``apply_execution_profile`` sets a process's torch threads, CPU
+affinity and denormal flushing from ``ML_EXEC_PROFILE``:
+
+- ``latency``: the worker's share of the cores as intra-op threads, pinned to that share
+- ``throughput``: one thread per scoring process, pinned to its own core; pair with
+  ``ML_EXECUTOR=process`` so parallel batches run on separate cores
+- ``shared-node``: half the worker's share as threads, no pinning, for nodes shared with
+  other services
+- empty: leave torch's defaults alone (previous behaviour), except for the overrides that are
+  set: ML_CPU_AFFINITY pins the process to those CPUs, ML_INTRA_OP_THREADS /
+  ML_INTER_OP_THREADS / ML_FLUSH_DENORMAL are applied as given
+
+A worker's share is the CPUs it may run on divided by the processes sharing them
+(``ML_WEB_WORKERS``, else ``WEB_CONCURRENCY``, else 1). Workers claim slot numbers through
+lock files keyed by that CPU set, so sibling processes get disjoint cores without knowing
+their index; pool workers inherit the parent's affinity and split it the same way.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from typing import List, Optional
+
+import torch
+
+from app.core.config import check_exec_profile, llm_settings
+
+PROFILES = {
+    # share: fraction of the worker's cores used as intra-op threads (0 = exactly one thread)
+    "latency": {"share": 1.0, "inter_op_threads": 1, "pin": True, "flush_denormal": True},
+    "throughput": {"share": 0.0, "inter_op_threads": 1, "pin": True, "flush_denormal": True},
+    "shared-node": {"share": 0.5, "inter_op_threads": 1, "pin": False, "flush_denormal": True},
+}
+
+_lock = threading.Lock()
+_state: Optional[dict] = None
+_slot_file = None  # held open for the life of the process so the slot stays claimed
+
+
+def available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpu_list(spec: str) -> List[int]:
+    """CPU ids from a Linux-style list such as ``0-3,8,10-11``."""
+    cpus = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        cpus.update(range(int(lo), int(hi or lo) + 1))
+    return sorted(cpus)
+
+
+def _web_workers() -> int:
+    return max(1, llm_settings.ml_web_workers or int(os.environ.get("WEB_CONCURRENCY") or 1))
+
+
+def _claim_slot(cpus: List[int], slots: int) -> Optional[int]:
+    """Lock the first free slot file among ``slots`` for this CPU set; None if locking is unavailable."""
+    global _slot_file
+    try:
+        import fcntl
+    except ImportError:
+        return None
+    key = hashlib.sha1(",".join(map(str, cpus)).encode()).hexdigest()[:12]
+    for slot in range(slots):
+        path = os.path.join(tempfile.gettempdir(), f"trustlens-cpuslot-{key}-{slot}.lock")
+        f = open(path, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            continue
+        if _slot_file is not None:
+            _slot_file.close()
+        _slot_file = f
+        return slot
+    return None
+
+
+def partition(cpus: List[int], slots: int, slot: int) -> List[int]:
+    """The ``slot``-th of ``slots`` contiguous, near-equal slices of ``cpus`` (never empty)."""
+    slots = max(1, min(slots, len(cpus)))
+    slot %= slots
+    size, extra = divmod(len(cpus), slots)
+    start = slot * size + min(slot, extra)
+    return cpus[start:start + size + (slot < extra)]
+
+
+def apply_execution_profile(profile: Optional[str] = None, *, workers: Optional[int] = None,
+                            threads: Optional[int] = None, force: bool = False) -> dict:
+    """Apply a profile to this process once and return what was applied.
+
+    ``workers`` is the number of processes sharing this process's CPUs (default: the web
+    workers). The intra-op thread count is ML_INTRA_OP_THREADS if set, else ``threads``, else
+    the profile's share of this process's cores.
+    """
+    global _state
+    with _lock:
+        if _state is not None and not force:
+            return dict(_state)
+        name = check_exec_profile(llm_settings.ml_exec_profile if profile is None else profile)
+        state = {"profile": name or None, "torch_threads": torch.get_num_threads(),
+                 "interop_threads": torch.get_num_interop_threads(), "cpu_affinity": None,
+                 "flush_denormal": None, "slot": None, "errors": []}
+        if not name:
+            _apply_overrides(state, threads)
+            _state = state
+            return dict(state)
+        spec = PROFILES[name]
+
+        cpus = available_cpus()
+        if llm_settings.ml_cpu_affinity:
+            cpus = [c for c in parse_cpu_list(llm_settings.ml_cpu_affinity) if c in cpus] or cpus
+        sharing = max(1, workers or _web_workers())
+        mine = cpus
+        if sharing > 1:
+            slot = _claim_slot(cpus, sharing)
+            state["slot"] = slot
+            # Without a slot (no fcntl, or more processes than slots) fall back to an even share, unpinned
+            mine = partition(cpus, sharing, slot) if slot is not None else cpus[:max(1, len(cpus) // sharing)]
+            pin = spec["pin"] and slot is not None
+        else:
+            pin = spec["pin"]
+
+        if pin and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, mine)
+                state["cpu_affinity"] = mine
+            except OSError as e:
+                state["errors"].append(f"cpu affinity: {e}")
+
+        intra = llm_settings.ml_intra_op_threads or threads or max(1, int(len(mine) * spec["share"]))
+        torch.set_num_threads(intra)
+        inter = llm_settings.ml_inter_op_threads or spec["inter_op_threads"]
+        try:
+            torch.set_num_interop_threads(inter)
+        except RuntimeError as e:
+            # Only allowed before any inter-op work has run in this process
+            state["errors"].append(f"interop threads: {e}")
+        flush = spec["flush_denormal"] if llm_settings.ml_flush_denormal is None else llm_settings.ml_flush_denormal
+        # Returns False on CPUs without SSE3 / FTZ support
+        state["flush_denormal"] = bool(torch.set_flush_denormal(flush)) and flush
+
+        state.update({"torch_threads": torch.get_num_threads(),
+                      "interop_threads": torch.get_num_interop_threads(),
+                      "cpus_shared_by": sharing, "cpus_available": len(cpus)})
+        for err in state["errors"]:
+            print(f"Warning: execution profile '{name}': {err}")
+        _state = state
+        return dict(state)
+
+
+def _apply_overrides(state: dict, threads: Optional[int]):
+    """Without a profile: apply only the ML_* overrides that are set (and ``threads``)."""
+    if llm_settings.ml_cpu_affinity and hasattr(os, "sched_setaffinity"):
+        cpus = [c for c in parse_cpu_list(llm_settings.ml_cpu_affinity) if c in available_cpus()]
+        try:
+            if not cpus:
+                raise OSError(f"none of {llm_settings.ml_cpu_affinity!r} is available")
+            os.sched_setaffinity(0, cpus)
+            state["cpu_affinity"] = cpus
+        except OSError as e:
+            state["errors"].append(f"cpu affinity: {e}")
+    intra = llm_settings.ml_intra_op_threads or threads
+    if intra:
+        torch.set_num_threads(intra)
+    if llm_settings.ml_inter_op_threads:
+        try:
+            torch.set_num_interop_threads(llm_settings.ml_inter_op_threads)
+        except RuntimeError as e:
+            state["errors"].append(f"interop threads: {e}")
+    if llm_settings.ml_flush_denormal is not None:
+        flush = llm_settings.ml_flush_denormal
+        state["flush_denormal"] = bool(torch.set_flush_denormal(flush)) and flush
+    state.update({"torch_threads": torch.get_num_threads(), "interop_threads": torch.get_num_interop_threads()})
+    for err in state["errors"]:
+        print(f"Warning: execution overrides: {err}")
+
+
+def execution_state() -> Optional[dict]:
+    """What ``apply_execution_profile`` applied in this process, or None if it has not run."""
+    with _lock:
+        return dict(_state) if _state is not None else None
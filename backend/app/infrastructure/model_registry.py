@@ -0,0 +1,215 @@
+"""Versioned URLNet artifact registry.
+
+Layout under ``llm_settings.model_dir``::
+
+    meta.json, urlnet_model.bin          # flat bundled artifact (version "bundled-<weights sha256[:12]>")
+    versions/CURRENT                     # optional: name of the version to serve
+    versions/<version>/meta.json
+    versions/<version>/urlnet_model.bin
+    versions/<version>/manifest.json     # {"version": ..., "files": {name: sha256}}
+
+Artifacts are resolved once and their checksums verified once; ``refresh`` drops the
+cache so a newly published version can be picked up by a reload. Publish a version with
+
+    python -m app.infrastructure.model_registry publish v2 path/to/meta.json path/to/urlnet_model.bin
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import shutil
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from AI_model.vocab_bundle import build_bundle
+from app.core.config import llm_settings
+
+META_FILE = "meta.json"
+WEIGHTS_FILE = "urlnet_model.bin"
+MANIFEST_FILE = "manifest.json"
+BUNDLED_VERSION = "bundled"
+# Version names are single path components: no separators, no leading dot (staging dirs, "..")
+_VERSION_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+
+
+@dataclass(frozen=True)
+class ModelArtifact:
+    version: str
+    meta_path: str
+    weights_path: str
+    checksums: Dict[str, str] = field(default_factory=dict)
+    verified: bool = False
+
+
+def sha256_file(path: str | Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._cache: Dict[str, ModelArtifact] = {}
+
+    @property
+    def versions_dir(self) -> Path:
+        return self.root / "versions"
+
+    def list_versions(self) -> List[str]:
+        """Published versions, oldest first (manifest ``created_at``, else the weights' mtime)."""
+        if not self.versions_dir.is_dir():
+            return []
+        dirs = [p for p in self.versions_dir.iterdir()
+                if _VERSION_NAME.fullmatch(p.name) and (p / WEIGHTS_FILE).exists()]
+        return [p.name for p in sorted(dirs, key=lambda p: (_created_at(p), _natural_key(p.name)))]
+
+    def check_version(self, version: str):
+        """ValueError unless ``version`` is "bundled" or a valid name under versions/."""
+        if version != BUNDLED_VERSION:
+            self._version_dir(version)
+
+    def _version_dir(self, version: str) -> Path:
+        """versions/<version>, refusing names that are not a plain directory name under versions/."""
+        if not _VERSION_NAME.fullmatch(version or "") or version == BUNDLED_VERSION:
+            raise ValueError(f"Invalid model version '{version}'")
+        base = self.versions_dir / version
+        if base.resolve().parent != self.versions_dir.resolve():
+            raise ValueError(f"Invalid model version '{version}'")
+        return base
+
+    def current_version(self) -> str:
+        """Pinned version, then versions/CURRENT, then the newest version, then the flat artifact."""
+        if llm_settings.ml_model_version:
+            return llm_settings.ml_model_version
+        marker = self.versions_dir / "CURRENT"
+        if marker.exists():
+            name = marker.read_text(encoding="utf-8").strip()
+            if name:
+                return name
+        versions = self.list_versions()
+        return versions[-1] if versions else BUNDLED_VERSION
+
+    def resolve(self, version: Optional[str] = None) -> ModelArtifact:
+        """Return the (checksum-verified) artifact for ``version``; cached after the first call."""
+        version = version or self.current_version()
+        with self._lock:
+            artifact = self._cache.get(version)
+            if artifact is None:
+                artifact = self._load(version)
+                self._cache[version] = artifact
+            return artifact
+
+    def refresh(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _load(self, version: str) -> ModelArtifact:
+        base = self.root if version == BUNDLED_VERSION else self._version_dir(version)
+        meta, weights = base / META_FILE, base / WEIGHTS_FILE
+        if not meta.exists() or not weights.exists():
+            raise RuntimeError(f"Model version '{version}' not found under {base}")
+
+        manifest_path = base / MANIFEST_FILE
+        if not manifest_path.exists():
+            # Legacy flat artifact without a manifest: nothing to verify against. Its version still
+            # has to change with the weights, or rows scored by replaced weights would never look stale
+            checksum = sha256_file(weights)
+            if version == BUNDLED_VERSION:
+                version = f"{BUNDLED_VERSION}-{checksum[:12]}"
+            return ModelArtifact(version=version, meta_path=str(meta), weights_path=str(weights),
+                                 checksums={WEIGHTS_FILE: checksum})
+
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        expected = manifest.get("files") or {}
+        actual = {}
+        for name in (META_FILE, WEIGHTS_FILE):
+            if name not in expected:
+                # A manifest without checksums would make verification pass trivially
+                raise RuntimeError(f"Manifest of model version '{version}' has no checksum for {name}")
+            actual[name] = sha256_file(base / name)
+            if expected[name] != actual[name]:
+                raise RuntimeError(f"Checksum mismatch for {name} in model version '{version}'")
+        return ModelArtifact(version=manifest.get("version", version), meta_path=str(meta),
+                             weights_path=str(weights), checksums=actual, verified=True)
+
+    def publish(self, version: str, meta_path: str | Path, weights_path: str | Path,
+                make_current: bool = True) -> ModelArtifact:
+        """Copy an artifact into versions/<version>/ with a manifest, then optionally mark it CURRENT."""
+        target = self._version_dir(version)
+        if target.exists():
+            raise ValueError(f"Model version '{version}' already exists")
+
+        # Stage into a temp dir and rename, so readers never see a half-written version
+        staging = self.versions_dir / f".{version}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        shutil.copyfile(meta_path, staging / META_FILE)
+        shutil.copyfile(weights_path, staging / WEIGHTS_FILE)
+        manifest = {
+            "version": version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "files": {name: sha256_file(staging / name) for name in (META_FILE, WEIGHTS_FILE)},
+        }
+        (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        build_bundle(staging / META_FILE)
+        staging.rename(target)
+
+        if make_current:
+            marker_tmp = self.versions_dir / ".CURRENT.tmp"
+            marker_tmp.write_text(version, encoding="utf-8")
+            marker_tmp.replace(self.versions_dir / "CURRENT")
+        self.refresh()
+        return self.resolve(version)
+
+
+def _created_at(base: Path) -> float:
+    try:
+        manifest = json.loads((base / MANIFEST_FILE).read_text(encoding="utf-8"))
+        return datetime.fromisoformat(manifest["created_at"]).timestamp()
+    except (OSError, ValueError, KeyError, TypeError):
+        return (base / WEIGHTS_FILE).stat().st_mtime
+
+
+def _natural_key(name: str) -> tuple:
+    # "v9" < "v10": digit runs compare as numbers
+    return tuple((0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"(\d+)", name) if part)
+
+
+_registry: Optional[ModelRegistry] = None
+
+
+def get_registry() -> ModelRegistry:
+    """Process-wide registry rooted at the configured model directory."""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry(llm_settings.model_dir)
+    return _registry
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="URLNet model artifact registry.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="List published versions")
+    pub = sub.add_parser("publish", help="Publish a new model version")
+    pub.add_argument("version")
+    pub.add_argument("meta_path")
+    pub.add_argument("weights_path")
+    pub.add_argument("--no-current", action="store_true", help="Do not mark the new version as CURRENT")
+    args = parser.parse_args()
+
+    registry = get_registry()
+    if args.cmd == "list":
+        print(json.dumps({"current": registry.current_version(), "versions": registry.list_versions()}, indent=2))
+    else:
+        artifact = registry.publish(args.version, args.meta_path, args.weights_path, make_current=not args.no_current)
+        print(json.dumps(artifact.__dict__, indent=2))
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from sqlalchemy import String, Integer, BigInteger, DateTime, UniqueConstraint, Index, CHAR
+from sqlalchemy import String, Integer, BigInteger, DateTime, Float, UniqueConstraint, Index, CHAR
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.infrastructure.base import Base
@@ -64,6 +64,8 @@ class RiskUrl(Base):
         Index("idx_host", "host"),
         Index("idx_registrable_domain", "registrable_domain"),
         Index("idx_risk_level", "risk_level"),
+        Index("idx_ml_model_version", "ml_model_version"),
+        Index("idx_canonical_sha256", "canonical_sha256"),
     )
 
     id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
@@ -72,9 +74,12 @@ class RiskUrl(Base):
     registrable_domain: Mapped[str | None] = mapped_column(String(255), nullable=True)
     full_url: Mapped[str] = mapped_column(String(2048), nullable=False)
     url_sha256: Mapped[str] = mapped_column(CHAR(64), nullable=False)
+    canonical_sha256: Mapped[str | None] = mapped_column(CHAR(64), nullable=True)
 
     risk_level: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     phishing_flag: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    ml_score: Mapped[float | None] = mapped_column(Float, nullable=True)
+    ml_model_version: Mapped[str | None] = mapped_column(String(64), nullable=True)
     source: Mapped[str | None] = mapped_column(String(64), nullable=True)
     report_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     last_reported_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
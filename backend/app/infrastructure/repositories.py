@@ -3,13 +3,16 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from app.domain.entities import MobileRisk, EmailRisk, UrlRisk, ArticleEntity
 from app.domain.repositories import MobileRiskRepository, EmailRiskRepository, UrlRiskRepository, ArticleRepository
 from app.infrastructure.models import RiskMobile, RiskEmail, RiskUrl, Article
 
+# Keys per IN (...) lookup in the bulk methods
+BULK_LOOKUP_CHUNK = 1000
+
 
 class SqlAlchemyMobileRiskRepository(MobileRiskRepository):
     def __init__(self, session: Session):
@@ -99,6 +102,43 @@ class SqlAlchemyMobileRiskRepository(MobileRiskRepository):
         )
 
 
+    def bulk_upsert_report(self, rows: list[dict]) -> int:
+        """``upsert_report`` for many rows (dicts of its keyword arguments) with one lookup per
+        chunk and a single flush; rows for the same e164 apply in order. Returns len(rows)."""
+        existing = {}
+        keys = list(dict.fromkeys(r["e164"] for r in rows))
+        for i in range(0, len(keys), BULK_LOOKUP_CHUNK):
+            stmt = select(RiskMobile).where(RiskMobile.e164.in_(keys[i:i + BULK_LOOKUP_CHUNK]))
+            existing.update((row.e164, row) for row in self.session.execute(stmt).scalars())
+        now = datetime.utcnow()
+        for r in rows:
+            row = existing.get(r["e164"])
+            if row is None:
+                row = existing[r["e164"]] = RiskMobile(
+                    country_code=r["country_code"],
+                    national_number=r["national_number"],
+                    e164=r["e164"],
+                    risk_level=r["risk_level"] or 0,
+                    source=r["source"],
+                    report_count=0,
+                    last_reported_at=now,
+                    notes=r["notes"],
+                    is_deleted=0,
+                )
+                self.session.add(row)
+            else:
+                row.report_count = (row.report_count or 0) + 1
+                row.last_reported_at = now
+                if r["risk_level"] is not None:
+                    row.risk_level = r["risk_level"]
+                if r["source"]:
+                    row.source = r["source"]
+                if r["notes"]:
+                    row.notes = r["notes"]
+        self.session.flush()
+        return len(rows)
+
+
 class SqlAlchemyEmailRiskRepository(EmailRiskRepository):
     def __init__(self, session: Session):
         self.session = session
@@ -241,15 +281,51 @@ class SqlAlchemyEmailRiskRepository(EmailRiskRepository):
         )
 
 
+    def bulk_create_or_update(self, rows: list[dict]) -> int:
+        """``create_or_update`` for many rows (dicts of its keyword arguments) with one lookup per
+        chunk and a single flush; rows for the same address apply in order. Returns len(rows)."""
+        existing = {}
+        keys = list(dict.fromkeys(r["address"] for r in rows))
+        for i in range(0, len(keys), BULK_LOOKUP_CHUNK):
+            stmt = select(RiskEmail).where(RiskEmail.address.in_(keys[i:i + BULK_LOOKUP_CHUNK]))
+            existing.update((row.address, row) for row in self.session.execute(stmt).scalars())
+        for r in rows:
+            row = existing.get(r["address"])
+            if row is None:
+                row = existing[r["address"]] = RiskEmail(
+                    local_part=r["local_part"],
+                    domain=r["domain"],
+                    address=r["address"],
+                    risk_level=r["risk_level"] or 0,
+                    mx_valid=r["mx_valid"] or 0,
+                    disposable=r["disposable"] or 0,
+                    report_count=0,
+                    source=r["source"],
+                    notes=r["notes"],
+                    is_deleted=0,
+                )
+                self.session.add(row)
+            else:
+                if r["risk_level"] is not None:
+                    row.risk_level = r["risk_level"]
+                if r["mx_valid"] is not None:
+                    row.mx_valid = r["mx_valid"]
+                if r["disposable"] is not None:
+                    row.disposable = r["disposable"]
+                if r["source"]:
+                    row.source = r["source"]
+                if r["notes"]:
+                    row.notes = r["notes"]
+        self.session.flush()
+        return len(rows)
+
+
 class SqlAlchemyUrlRiskRepository(UrlRiskRepository):
     def __init__(self, session: Session):
         self.session = session
 
-    def get_by_sha256(self, url_sha256: str) -> Optional[UrlRisk]:
-        stmt = select(RiskUrl).where(RiskUrl.url_sha256 == url_sha256, RiskUrl.is_deleted == 0)
-        row = self.session.execute(stmt).scalar_one_or_none()
-        if not row:
-            return None
+    @staticmethod
+    def _to_entity(row: RiskUrl) -> UrlRisk:
         return UrlRisk(
             id=row.id,
             scheme=row.scheme,
@@ -263,8 +339,31 @@ class SqlAlchemyUrlRiskRepository(UrlRiskRepository):
             report_count=row.report_count,
             last_reported_at=row.last_reported_at,
             notes=row.notes,
+            ml_score=row.ml_score,
+            ml_model_version=row.ml_model_version,
+            canonical_sha256=row.canonical_sha256,
         )
+
+    def get_by_sha256(self, url_sha256: str) -> Optional[UrlRisk]:
+        stmt = select(RiskUrl).where(RiskUrl.url_sha256 == url_sha256, RiskUrl.is_deleted == 0)
+        row = self.session.execute(stmt).scalar_one_or_none()
+        if not row:
+            return None
+        return self._to_entity(row)
     
+    def get_by_canonical_sha256(self, canonical_sha256: str) -> Optional[UrlRisk]:
+        """The first-created live row whose canonical URL hashes to ``canonical_sha256``."""
+        stmt = (
+            select(RiskUrl)
+            .where(RiskUrl.canonical_sha256 == canonical_sha256, RiskUrl.is_deleted == 0)
+            .order_by(RiskUrl.id)
+            .limit(1)
+        )
+        row = self.session.execute(stmt).scalar_one_or_none()
+        if not row:
+            return None
+        return self._to_entity(row)
+
     # Richard: Main changes concern implementation below of abstract methods from UrlRiskRepository
     # Richard: Methods should be consistent with calls from url_service.py
     def set_is_deleted_by_sha(self, *, url_sha256: str, is_deleted: int) -> bool:
@@ -294,8 +393,61 @@ class SqlAlchemyUrlRiskRepository(UrlRiskRepository):
         self.session.flush()
         return True
     
+    def set_canonical_sha256_by_sha(self, *, url_sha256: str, canonical_sha256: str | None) -> bool:
+        stmt = select(RiskUrl).where(RiskUrl.url_sha256 == url_sha256)
+        row = self.session.execute(stmt).scalar_one_or_none()
+        if row is None:
+            return False
+        row.canonical_sha256 = canonical_sha256
+        self.session.flush()
+        return True
+
+    def set_ml_result_by_sha(self, *, url_sha256: str, ml_score: float, ml_model_version: str, risk_level: Optional[int] = None) -> bool:
+        stmt = select(RiskUrl).where(RiskUrl.url_sha256 == url_sha256, RiskUrl.is_deleted == 0)
+        row = self.session.execute(stmt).scalar_one_or_none()
+        if row is None:
+            return False
+        row.ml_score = ml_score
+        row.ml_model_version = ml_model_version
+        if risk_level is not None:
+            row.risk_level = risk_level
+        self.session.flush()
+        return True
+
+    def list_ml_stale(self, *, ml_model_version: str, limit: int) -> list[UrlRisk]:
+        """Rows scored by a model version other than ``ml_model_version`` (never-scored rows are skipped)."""
+        stmt = (
+            select(RiskUrl)
+            .where(RiskUrl.is_deleted == 0,
+                   RiskUrl.ml_model_version.is_not(None),
+                   RiskUrl.ml_model_version != ml_model_version)
+            .order_by(RiskUrl.id)
+            .limit(limit)
+        )
+        return [self._to_entity(row) for row in self.session.execute(stmt).scalars()]
+
+    @staticmethod
+    def _flagged(min_risk_level: int, after_id: int) -> tuple:
+        return (RiskUrl.is_deleted == 0,
+                (RiskUrl.risk_level >= min_risk_level) | (RiskUrl.phishing_flag == 1),
+                RiskUrl.id > after_id)
+
+    def list_flagged(self, *, min_risk_level: int, after_id: int = 0, limit: int = 4096) -> list[UrlRisk]:
+        """Known-bad rows (risk_level >= ``min_risk_level`` or phishing_flag set) after ``after_id``, by id."""
+        stmt = (
+            select(RiskUrl)
+            .where(*self._flagged(min_risk_level, after_id))
+            .order_by(RiskUrl.id)
+            .limit(limit)
+        )
+        return [self._to_entity(row) for row in self.session.execute(stmt).scalars()]
+
+    def count_flagged(self, *, min_risk_level: int, after_id: int = 0) -> int:
+        stmt = select(func.count()).select_from(RiskUrl).where(*self._flagged(min_risk_level, after_id))
+        return int(self.session.execute(stmt).scalar_one())
+
     # Richard: Main difference with upsert report is that this doesnt increment report count nor log report time
-    def create_or_update(self, *, full_url: str, url_sha256: str, scheme: str, host: str, registrable_domain: Optional[str], source: Optional[str], notes: Optional[str], risk_level: Optional[int], phishing_flag: Optional[int]) -> UrlRisk:
+    def create_or_update(self, *, full_url: str, url_sha256: str, scheme: str, host: str, registrable_domain: Optional[str], source: Optional[str], notes: Optional[str], risk_level: Optional[int], phishing_flag: Optional[int], ml_score: Optional[float] = None, ml_model_version: Optional[str] = None, canonical_sha256: Optional[str] = None) -> UrlRisk:
         stmt = select(RiskUrl).where(RiskUrl.url_sha256==url_sha256)
         row = self.session.execute(stmt).scalar_one_or_none()
         if row is None:
@@ -305,8 +457,11 @@ class SqlAlchemyUrlRiskRepository(UrlRiskRepository):
                 registrable_domain=registrable_domain,
                 full_url=full_url,
                 url_sha256=url_sha256,
+                canonical_sha256=canonical_sha256,
                 risk_level=risk_level or 0, # 0 for unknown, 1 - safe, 2 - low risk, 3 - medium risk, 4 - unsafe
                 phishing_flag=phishing_flag or 0,
+                ml_score=ml_score,
+                ml_model_version=ml_model_version,
                 source=source,
                 report_count=0,
                 notes=notes,
@@ -318,28 +473,66 @@ class SqlAlchemyUrlRiskRepository(UrlRiskRepository):
                 row.risk_level = risk_level
             if phishing_flag:
                 row.phishing_flag = phishing_flag
+            if ml_score is not None:
+                row.ml_score = ml_score
+                row.ml_model_version = ml_model_version
+            if canonical_sha256:
+                row.canonical_sha256 = canonical_sha256
             if source:
                 row.source = source
             if notes:
                 row.notes = notes
         self.session.flush()
-        return UrlRisk(
-            id=row.id,
-            scheme=row.scheme,
-            host=row.host,
-            registrable_domain=row.registrable_domain,
-            full_url=row.full_url,
-            url_sha256=row.url_sha256,
-            risk_level=row.risk_level,
-            phishing_flag=row.phishing_flag,
-            source=row.source,
-            report_count=row.report_count,
-            last_reported_at=row.last_reported_at,
-            notes=row.notes,
-        )
+        return self._to_entity(row)
     
+    def bulk_create_or_update(self, rows: list[dict]) -> int:
+        """``create_or_update`` for many rows (dicts of its keyword arguments) with one lookup per
+        chunk and a single flush; rows for the same url_sha256 apply in order. Returns len(rows)."""
+        existing = {}
+        keys = list(dict.fromkeys(r["url_sha256"] for r in rows))
+        for i in range(0, len(keys), BULK_LOOKUP_CHUNK):
+            stmt = select(RiskUrl).where(RiskUrl.url_sha256.in_(keys[i:i + BULK_LOOKUP_CHUNK]))
+            existing.update((row.url_sha256, row) for row in self.session.execute(stmt).scalars())
+        for r in rows:
+            row = existing.get(r["url_sha256"])
+            ml_score = r.get("ml_score")
+            if row is None:
+                row = existing[r["url_sha256"]] = RiskUrl(
+                    scheme=r["scheme"],
+                    host=r["host"],
+                    registrable_domain=r["registrable_domain"],
+                    full_url=r["full_url"],
+                    url_sha256=r["url_sha256"],
+                    canonical_sha256=r.get("canonical_sha256"),
+                    risk_level=r["risk_level"] or 0,
+                    phishing_flag=r["phishing_flag"] or 0,
+                    ml_score=ml_score,
+                    ml_model_version=r.get("ml_model_version"),
+                    source=r["source"],
+                    report_count=0,
+                    notes=r["notes"],
+                    is_deleted=0,
+                )
+                self.session.add(row)
+            else:
+                if r["risk_level"]:
+                    row.risk_level = r["risk_level"]
+                if r["phishing_flag"]:
+                    row.phishing_flag = r["phishing_flag"]
+                if ml_score is not None:
+                    row.ml_score = ml_score
+                    row.ml_model_version = r.get("ml_model_version")
+                if r.get("canonical_sha256"):
+                    row.canonical_sha256 = r["canonical_sha256"]
+                if r["source"]:
+                    row.source = r["source"]
+                if r["notes"]:
+                    row.notes = r["notes"]
+        self.session.flush()
+        return len(rows)
+
     # Richard: Only use for reporting
-    def upsert_report(self, *, full_url: str, url_sha256: str, scheme: str, host: str, registrable_domain: Optional[str], source: Optional[str], notes: Optional[str], risk_level: Optional[int], phishing_flag: Optional[int]) -> UrlRisk:
+    def upsert_report(self, *, full_url: str, url_sha256: str, scheme: str, host: str, registrable_domain: Optional[str], source: Optional[str], notes: Optional[str], risk_level: Optional[int], phishing_flag: Optional[int], canonical_sha256: Optional[str] = None) -> UrlRisk:
         # Richard: Used url_sha256 as main identifier rather than full_url
         stmt = select(RiskUrl).where(RiskUrl.url_sha256 == url_sha256)
         row = self.session.execute(stmt).scalar_one_or_none()
@@ -351,6 +544,7 @@ class SqlAlchemyUrlRiskRepository(UrlRiskRepository):
                 registrable_domain=registrable_domain,
                 full_url=full_url,
                 url_sha256=url_sha256,
+                canonical_sha256=canonical_sha256,
                 risk_level=risk_level or 0,
                 phishing_flag=phishing_flag or 0,
                 source=source,
@@ -368,25 +562,14 @@ class SqlAlchemyUrlRiskRepository(UrlRiskRepository):
                 row.risk_level = risk_level
             if phishing_flag:
                 row.phishing_flag = phishing_flag
+            if canonical_sha256:
+                row.canonical_sha256 = canonical_sha256
             if source:
                 row.source = source
             if notes:
                 row.notes = notes
         self.session.flush()
-        return UrlRisk(
-            id=row.id,
-            scheme=row.scheme,
-            host=row.host,
-            registrable_domain=row.registrable_domain,
-            full_url=row.full_url,
-            url_sha256=row.url_sha256,
-            risk_level=row.risk_level,
-            phishing_flag=row.phishing_flag,
-            source=row.source,
-            report_count=row.report_count,
-            last_reported_at=row.last_reported_at,
-            notes=row.notes,
-        )
+        return self._to_entity(row)
         
 
 class SqlAlchemyArticleRepository(ArticleRepository):
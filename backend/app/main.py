@@ -1,9 +1,15 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 import logging
 
-from app.core.config import settings
+from app.core.config import settings, llm_settings
+from app.core.normalization import normalization_cache_stats
+from app.infrastructure.db import check_database
+from app.infrastructure.llm import get_llm_session
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -18,7 +24,50 @@ from app.api.routes_llm import router as llm_router
 # SMS/Email content analysis router
 from app.api.routes_content import router as content_router
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm URLNet before accepting traffic so the first request is not a cold start
+    if llm_settings.ml_warmup:
+        session = get_llm_session()
+        if session is None:
+            logger.error("LLM session unavailable; skipping URLNet warm-up")
+        elif await run_in_threadpool(session.warm_up, llm_settings.ml_warmup_batches):
+            logger.info(f"URLNet warmed up: {session.scorer_state()}")
+        else:
+            logger.error(f"URLNet warm-up failed: {session.scorer_error}")
+    rescore = None
+    if llm_settings.ml_rescore:
+        from app.infrastructure.db import SessionLocal
+        from app.services.url_service import UrlRescoreWorker
+        rescore = UrlRescoreWorker(SessionLocal,
+                                   batch_size=llm_settings.ml_rescore_batch_size,
+                                   interval_s=llm_settings.ml_rescore_interval_s,
+                                   idle_s=llm_settings.ml_rescore_idle_s)
+        rescore.start()
+    app.state.url_rescore = rescore
+    neighbors = None
+    if llm_settings.ml_neighbors and get_llm_session() is not None:
+        from app.infrastructure.db import SessionLocal
+        from app.infrastructure.ml_neighbors import NeighborIndexer
+        neighbors = NeighborIndexer(SessionLocal, get_llm_session(), index_dir=llm_settings.neighbors_dir,
+                                    min_risk_level=llm_settings.ml_neighbors_min_risk_level,
+                                    nlist=llm_settings.ml_neighbors_nlist,
+                                    refresh_s=llm_settings.ml_neighbors_refresh_s,
+                                    rebuild_s=llm_settings.ml_neighbors_rebuild_s)
+        neighbors.start()
+    yield
+    if neighbors is not None:
+        neighbors.stop()
+    if rescore is not None:
+        rescore.stop()
+    session = get_llm_session()
+    if session is not None:
+        session.close()
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.app_name,
     version=settings.app_version,
     docs_url="/docs",
@@ -48,6 +97,20 @@ app.add_middleware(
 async def health_check():
     return {"status": "healthy", "service": settings.app_name, "version": settings.app_version}
 
+# Readiness probe: model and DB pool state, separate from the liveness check above
+@app.get("/ready")
+def readiness_check():
+    session = get_llm_session()
+    model = session.scorer_state() if session is not None else {"loaded": False, "error": "LLM session unavailable"}
+    model_ok = model["loaded"] and (model.get("warmed_up") or not llm_settings.ml_warmup)
+    db = check_database()
+    ready = bool(model_ok and db["ok"])
+    rescore = getattr(app.state, "url_rescore", None)
+    return JSONResponse(status_code=200 if ready else 503,
+                        content={"ready": ready, "model": model, "database": db,
+                                 "rescore": dict(rescore.stats) if rescore is not None else None,
+                                 "normalization_cache": normalization_cache_stats()})
+
 @app.get("/")
 async def root():
     return {"message": f"Welcome to {settings.app_name}", "version": settings.app_version, "docs": "/docs"}
@@ -14,6 +14,13 @@ class UrlRiskResponse(BaseModel):
     report_count: int
     source: str | None = None
     notes: str | None = None
+    ml_score: float | None = None
+    ml_model_version: str | None = None
+
+
+class UrlSimilarRequest(BaseModel):
+    url: str = Field(..., description="Full URL with scheme")
+    k: int = Field(default=5, ge=1, le=50, description="Number of similar known-bad URLs to return")
 
 
 class UrlSetDeletedRequest(BaseModel):
@@ -4,9 +4,10 @@ from typing import Optional, Tuple
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 
-from app.core.normalization import normalize_email
+from app.core.normalization import normalize_email, normalize_email_many
 from app.domain.entities import EmailRisk
 from app.infrastructure.repositories import SqlAlchemyEmailRiskRepository
+from app.services.imports import bulk_write
 
 
 def _same_utc_day(a: datetime | None, b: datetime | None) -> bool:
@@ -128,26 +129,26 @@ class EmailRiskService:
 
     def batch_import(self, items: list[tuple[str, int | None, str | None, int | None, int | None]]) -> dict:
         """Batch import emails: (address, risk_level, notes, mx_valid, disposable)"""
-        summary = {"total": 0, "succeeded": 0, "failed": 0, "errors": []}
-        for address, risk_level, notes, mx_valid, disposable in items:
-            summary["total"] += 1
-            try:
-                local, domain, addr = normalize_email(address)
-                self.repo.create_or_update(
-                    address=addr,
-                    local_part=local,
-                    domain=domain,
-                    source=None,
-                    notes=notes,
-                    risk_level=risk_level,
-                    mx_valid=mx_valid,
-                    disposable=disposable,
-                )
-                summary["succeeded"] += 1
-            except Exception as e:
+        summary = {"total": len(items), "succeeded": 0, "failed": 0, "errors": []}
+        # Normalise the whole batch first, then write it in one bulk step
+        normalized, errors = normalize_email_many([item[0] for item in items])
+        rows = []
+        for (address, risk_level, notes, mx_valid, disposable), norm, error in zip(items, normalized, errors):
+            if error is not None:
                 summary["failed"] += 1
                 if len(summary["errors"]) < 20:
-                    summary["errors"].append({"input": address, "error": str(e)})
+                    summary["errors"].append({"input": address, "error": error})
                 continue
-        self.session.commit()
+            local, domain, addr = norm
+            rows.append({
+                "address": addr,
+                "local_part": local,
+                "domain": domain,
+                "source": None,
+                "notes": notes,
+                "risk_level": risk_level,
+                "mx_valid": mx_valid,
+                "disposable": disposable,
+            })
+        bulk_write(self.session, self.repo.bulk_create_or_update, rows, summary)
         return summary
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import Session
+
+
+def bulk_write(session: Session, write, rows: list[dict], summary: dict):
+    """Persist normalised import ``rows`` with ``write`` in one transaction and count them in ``summary``.
+
+    A failed write rolls back the whole batch and marks every row as failed.
+    """
+    try:
+        write(rows)
+        session.commit()
+        summary["succeeded"] += len(rows)
+    except Exception as e:
+        session.rollback()
+        summary["failed"] += len(rows)
+        if len(summary["errors"]) < 20:
+            summary["errors"].append({"input": None, "error": f"Bulk write of {len(rows)} rows failed: {e}"})
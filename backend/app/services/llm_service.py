@@ -1,11 +1,12 @@
-import json, urllib.parse as up
+import json
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Union
 from fastapi import HTTPException
 from google.genai import types
 from pathlib import Path
 
 # Import LLM session from infra
+from app.core.parsed_url import ParsedUrl, ascii_safe_url
 from app.infrastructure.llm import LLMSession
 from app.schemas.llm import GenerateResponseInput
 
@@ -67,20 +68,8 @@ class LLMRiskService:
         return self.RISKLVL_TO_RISKBAND[int(risk_level)]
     
     @staticmethod
-    def ascii_safe_url(u: str) -> str:
-        p = up.urlsplit((u or "").strip())
-        host = p.hostname.encode("idna").decode("ascii") if p.hostname else ""
-        userinfo = ""
-        if p.username:
-            userinfo = up.quote(p.username, safe="")
-            if p.password:
-                userinfo += ":" + up.quote(p.password, safe="")
-            userinfo += "@"
-        netloc = f"{userinfo}{host}" + (f":{p.port}" if p.port else "")
-        path  = up.quote(p.path or "", safe="/")
-        query = up.quote_plus(p.query or "", safe="=&")
-        frag  = up.quote(p.fragment or "", safe="")
-        return up.urlunsplit((p.scheme or "http", netloc, path, query, frag))
+    def ascii_safe_url(u: Union[str, ParsedUrl]) -> str:
+        return u.ascii_safe if isinstance(u, ParsedUrl) else ascii_safe_url(u)
 
     @staticmethod
     def enforce_action(band: str, action: str) -> str:
@@ -96,7 +85,9 @@ class LLMRiskService:
             return action if action in {"allow","allow_with_warning"} else "allow"
 
     @staticmethod
-    def build_user_prompt(url_raw: str, score: float, band: str, safe_url: str) -> str:
+    def build_user_prompt(url_raw: Union[str, ParsedUrl], score: float, band: str, safe_url: Optional[str] = None) -> str:
+        if isinstance(url_raw, ParsedUrl):
+            url_raw, safe_url = url_raw.raw, safe_url or url_raw.ascii_safe
         return (
             f"ORIGINAL_URL: {url_raw}\n"
             f"ASCII_SAFE_URL: {safe_url}\n"
@@ -104,6 +95,16 @@ class LLMRiskService:
             f"RISK_BAND: {band}\n"
         )
 
+    @staticmethod
+    def build_evaluate_prompt(parsed: ParsedUrl, notes: Optional[str], ml_score: Optional[float], band: str) -> str:
+        return (
+            f"ORIGINAL_URL: {parsed.raw}\n"
+            f"ASCII_SAFE_URL: {parsed.ascii_safe}\n"
+            f"NOTES: {notes}\n"
+            f"ML_SCORE: {ml_score}\n"
+            f"RISK_BAND: {band}\n"
+        )
+
     # @staticmethod
     # def _robust_extract_json(text: str) -> Dict[str, Any]:
     #     if not text:
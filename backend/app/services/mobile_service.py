@@ -3,9 +3,10 @@ from __future__ import annotations
 from typing import Optional
 from sqlalchemy.orm import Session
 
-from app.core.normalization import normalize_phone
+from app.core.normalization import normalize_phone, normalize_phone_many
 from app.domain.entities import MobileRisk
 from app.infrastructure.repositories import SqlAlchemyMobileRiskRepository
+from app.services.imports import bulk_write
 
 
 class MobileRiskService:
@@ -54,17 +55,18 @@ class MobileRiskService:
         items: list of tuples (e164, risk_level, notes)
         returns summary dict
         """
-        summary = {"total": 0, "succeeded": 0, "failed": 0, "errors": []}
-        for e164, risk_level, notes in items:
-            summary["total"] += 1
-            try:
-                e164_norm, cc, nn = normalize_phone(e164=e164, country_code=None, national_number=None)
-                self.repo.upsert_report(e164=e164_norm, country_code=cc, national_number=nn, source=None, notes=notes, risk_level=risk_level)
-                summary["succeeded"] += 1
-            except Exception as e:
+        summary = {"total": len(items), "succeeded": 0, "failed": 0, "errors": []}
+        # Normalise the whole batch first, then write it in one bulk step
+        normalized, errors = normalize_phone_many([item[0] for item in items])
+        rows = []
+        for (e164, risk_level, notes), norm, error in zip(items, normalized, errors):
+            if error is not None:
                 summary["failed"] += 1
                 if len(summary["errors"]) < 20:
-                    summary["errors"].append({"input": e164, "error": str(e)})
+                    summary["errors"].append({"input": e164, "error": error})
                 continue
-        self.session.commit()
-        return summary
\ No newline at end of file
+            e164_norm, cc, nn = norm
+            rows.append({"e164": e164_norm, "country_code": cc, "national_number": nn,
+                         "source": None, "notes": notes, "risk_level": risk_level})
+        bulk_write(self.session, self.repo.bulk_upsert_report, rows, summary)
+        return summary
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import threading
 from typing import Optional, Tuple
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 
-from app.core.normalization import normalize_url
+from app.core.canonical import canonical_sha256, get_canonical_rules
+from app.core.normalization import normalize_url_many
+from app.core.parsed_url import ParsedUrl
 from app.domain.entities import UrlRisk
 from app.infrastructure.repositories import SqlAlchemyUrlRiskRepository
+from app.services.imports import bulk_write
 from app.services.llm_service import LLMRiskService
 from app.infrastructure.llm import get_llm_session
 from app.schemas.llm import GenerateResponseInput
@@ -22,38 +26,114 @@ class UrlRiskService:
         self.llm_svc: LLMRiskService = LLMRiskService(get_llm_session())
         self.client = self.llm_svc.session.client
 
-    def _ml_evaluate(self, url: str):
-        score = self.llm_svc.session.scorer.score(url)
+    def _ml_result(self, score: float, model_version: str | None) -> dict:
         risk_band = self.llm_svc.risk_band(score)
         risk_level = self.RISK_BAND_CONVERSION.get(risk_band.upper(), 1)
-        return {"score": score, "risk_band": risk_band, "risk_level": risk_level}
+        return {"score": score, "risk_band": risk_band, "risk_level": risk_level, "model_version": model_version}
 
-    def check_or_create(self, *, url: str) -> UrlRisk:
-        normalized, scheme, host, registrable, sha = normalize_url(url)
-        entity = self.repo.get_by_sha256(sha)
+    def _ml_evaluate(self, url: str | ParsedUrl):
+        scorer = self.llm_svc.session.scorer
+        return self._ml_result(scorer.score(url), getattr(scorer, "version", None))
+
+    def _lookup(self, parsed: ParsedUrl) -> UrlRisk | None:
+        """The row of ``parsed``, else the row of a variant with the same canonical URL.
+
+        Read-only: a missing or stale canonical hash is (re)written by the next write to the row.
+        """
+        entity = self.repo.get_by_sha256(parsed.sha256)
+        if entity is None:
+            return self.repo.get_by_canonical_sha256(parsed.canonical_sha256) if parsed.canonical_sha256 else None
+        return entity
+
+    @staticmethod
+    def _row_key(parsed: ParsedUrl, entity: UrlRisk | None) -> tuple:
+        """(full_url, scheme, host, registrable_domain, url_sha256) to write: the existing row's
+        (which keeps the URL as first seen), or ``parsed``'s for a new row."""
+        if entity is None:
+            return parsed.as_tuple()
+        return entity.full_url, entity.scheme, entity.host, entity.registrable_domain, entity.url_sha256
+
+    def check_or_create(self, *, url: str | ParsedUrl) -> UrlRisk:
+        parsed = ParsedUrl.of(url)
+        entity = self._lookup(parsed)
         if (entity and entity.risk_level == 0) or entity is None:
-            ml_res = self._ml_evaluate(normalized)
+            version = getattr(self.llm_svc.session.scorer, "version", None)
+            if entity is not None and entity.ml_score is not None and entity.ml_model_version == version:
+                # Already scored by the serving model; only the risk level was reset
+                ml_res = self._ml_result(entity.ml_score, version)
+            else:
+                ml_res = self._ml_evaluate(parsed)
+            normalized, scheme, host, registrable, sha = self._row_key(parsed, entity)
             entity = self.repo.create_or_update(
                 full_url=normalized,
                 url_sha256=sha,
                 scheme=scheme,
                 host=host,
                 registrable_domain=registrable,
+                canonical_sha256=parsed.canonical_sha256,
                 source=None,
-                notes=f"ML Evaluation Results: {str(ml_res)}",
+                notes=None,
                 risk_level=ml_res["risk_level"],
                 phishing_flag=0,
+                ml_score=ml_res["score"],
+                ml_model_version=ml_res["model_version"],
             )
             self.session.commit()
         return entity
-    
-    def get(self, *, url: str):
-        _, _, _, _, sha = normalize_url(url)
-        entity = self.repo.get_by_sha256(sha)
+
+    def rescore_stale(self, limit: int = 128) -> dict:
+        """Rescore up to ``limit`` rows whose ml_score came from another model version.
+
+        The risk level follows the new score only while it still matches the old score's band,
+        i.e. it was set by the model and not by a report, the LLM or an analyst.
+        """
+        scorer = full_model_scorer(self.llm_svc.session.scorer)
+        version = getattr(scorer, "version", None)
+        rows = self.repo.list_ml_stale(ml_model_version=version, limit=limit) if version else []
+        summary = {"model_version": version, "rescored": 0, "risk_level_changed": 0}
+        if not rows:
+            return summary
+        scores = scorer.score_many([r.full_url for r in rows])
+        for row, score in zip(rows, scores):
+            new = self._ml_result(score, version)
+            model_set = row.risk_level == self._ml_result(row.ml_score, None)["risk_level"]
+            update_level = model_set and new["risk_level"] != row.risk_level
+            self.repo.set_ml_result_by_sha(url_sha256=row.url_sha256, ml_score=score, ml_model_version=version,
+                                           risk_level=new["risk_level"] if update_level else None)
+            summary["rescored"] += 1
+            summary["risk_level_changed"] += int(update_level)
+        self.session.commit()
+        return summary
+
+    def similar(self, *, url: str | ParsedUrl, k: int = 5) -> dict:
+        """Score ``url`` and find the ``k`` most similar known-bad URLs in the neighbour index."""
+        from app.core.config import llm_settings
+        from app.infrastructure.ml_neighbors import get_neighbor_index
+
+        parsed = ParsedUrl.of(url)
+        scorer = self.llm_svc.session.scorer
+        emb, probs = scorer.embed_and_score_many([parsed])
+        result = {"url": parsed.normalized, "ml_score": probs[0], "risk_band": self.llm_svc.risk_band(probs[0]),
+                  "ml_model_version": getattr(scorer, "version", None), "neighbors": [], "index": None}
+        index = get_neighbor_index()
+        if index is None:
+            return result
+        result["index"] = index.stats
+        if index.model_version != result["ml_model_version"]:
+            # Embeddings of different models are not comparable; wait for the rebuild
+            return result
+        own = self._lookup(parsed)
+        result["neighbors"] = index.search(emb, k=k, nprobe=llm_settings.ml_neighbors_nprobe,
+                                           exclude_ids=[own.id if own else None])[0]
+        return result
+
+    def get(self, *, url: str | ParsedUrl):
+        entity = self._lookup(ParsedUrl.of(url))
         return entity
     
-    def upsert(self, url: str, **kwargs):
-        normalized, scheme, host, registrable, sha = normalize_url(url)
+    def upsert(self, url: str | ParsedUrl, **kwargs):
+        parsed = ParsedUrl.of(url)
+        normalized, scheme, host, registrable, sha = self._row_key(parsed, self._lookup(parsed))
         # kwargs should override the default values if provided
         payload = {
             "full_url": normalized,
@@ -73,6 +153,7 @@ class UrlRiskService:
             scheme=payload["scheme"],
             host=payload["host"],
             registrable_domain=payload["registrable_domain"],
+            canonical_sha256=parsed.canonical_sha256,
             source=payload["source"],
             notes=payload["notes"],
             risk_level=payload["risk_level"] if payload["risk_level"] in [0,1,2,3,4] else 0,
@@ -84,7 +165,7 @@ class UrlRiskService:
     def report(
         self, 
         *, 
-        url: str, 
+        url: str | ParsedUrl, 
         source: str = "user_report", 
         notes: Optional[str] = None, 
         risk_level: Optional[int] = None
@@ -93,8 +174,9 @@ class UrlRiskService:
         گزارش URL با ایندمپوتنسی روزانه.
         خروجی: (entity, already_reported)
         """
-        normalized, scheme, host, registrable, sha = normalize_url(url)
-        existing = self.repo.get_by_sha256(sha)
+        parsed = ParsedUrl.of(url)
+        existing = self._lookup(parsed)
+        normalized, scheme, host, registrable, sha = self._row_key(parsed, existing)
 
         # اگر قبلاً SAFE شده، ریپورت کاربر نادیده گرفته می‌شود
         if existing and existing.risk_level == 1:
@@ -120,6 +202,7 @@ class UrlRiskService:
             scheme=scheme,
             host=host,
             registrable_domain=registrable,
+            canonical_sha256=parsed.canonical_sha256,
             source=existing.source if existing else source,
             notes=existing.notes if existing else notes, # Keep preexisting notes if available
             risk_level=existing.risk_level if existing else (risk_level if risk_level else 2), # Keep preexisting risk level if available, otherwise use passed risk_level; fallback is 2
@@ -128,49 +211,154 @@ class UrlRiskService:
         self.session.commit()
         return entity, False
 
-    def set_is_deleted(self, *, url: str, is_deleted: int) -> bool:
-        _, _, _, _, sha = normalize_url(url)
-        updated = self.repo.set_is_deleted_by_sha(url_sha256=sha, is_deleted=is_deleted)
+    def _sha_of(self, url: str | ParsedUrl) -> str:
+        """url_sha256 of the row ``url`` resolves to (its own hash when there is none)."""
+        parsed = ParsedUrl.of(url)
+        entity = self._lookup(parsed)
+        if entity is None:
+            return parsed.sha256
+        if parsed.canonical_sha256 and entity.canonical_sha256 != parsed.canonical_sha256:
+            # Committed along with the caller's update
+            self.repo.set_canonical_sha256_by_sha(url_sha256=entity.url_sha256, canonical_sha256=parsed.canonical_sha256)
+        return entity.url_sha256
+
+    def set_is_deleted(self, *, url: str | ParsedUrl, is_deleted: int) -> bool:
+        updated = self.repo.set_is_deleted_by_sha(url_sha256=self._sha_of(url), is_deleted=is_deleted)
         if updated:
             self.session.commit()
         return updated
 
-    def set_notes(self, *, url: str, notes: str | None) -> bool:
-        _, _, _, _, sha = normalize_url(url)
-        updated = self.repo.set_notes_by_sha(url_sha256=sha, notes=notes)
+    def set_notes(self, *, url: str | ParsedUrl, notes: str | None) -> bool:
+        updated = self.repo.set_notes_by_sha(url_sha256=self._sha_of(url), notes=notes)
         if updated:
             self.session.commit()
         return updated
 
-    def set_risk_level(self, *, url: str, risk_level: int) -> bool:
-        _, _, _, _, sha = normalize_url(url)
-        updated = self.repo.set_risk_level_by_sha(url_sha256=sha, risk_level=risk_level)
+    def set_risk_level(self, *, url: str | ParsedUrl, risk_level: int) -> bool:
+        updated = self.repo.set_risk_level_by_sha(url_sha256=self._sha_of(url), risk_level=risk_level)
         if updated:
             self.session.commit()
         return updated
 
     def batch_import(self, items: list[tuple[str, int | None, int | None, str | None]]) -> dict:
-        summary = {"total": 0, "succeeded": 0, "failed": 0, "errors": []}
-        for url, risk_level, phishing_flag, notes in items:
-            summary["total"] += 1
-            try:
-                normalized, scheme, host, registrable, sha = normalize_url(url)
-                self.repo.create_or_update(
-                    full_url=normalized,
-                    url_sha256=sha,
-                    scheme=scheme,
-                    host=host,
-                    registrable_domain=registrable,
-                    source=None,
-                    notes=notes,
-                    risk_level=risk_level,
-                    phishing_flag=phishing_flag,
-                )
-                summary["succeeded"] += 1
-            except Exception as e:
+        summary = {"total": len(items), "succeeded": 0, "failed": 0, "errors": []}
+        # Normalise the whole batch first, then write it in one bulk step
+        normalized, errors = normalize_url_many([item[0] for item in items])
+        rules = get_canonical_rules()
+        rows = []
+        for (url, risk_level, phishing_flag, notes), norm, error in zip(items, normalized, errors):
+            if error is not None:
                 summary["failed"] += 1
                 if len(summary["errors"]) < 20:
-                    summary["errors"].append({"input": url, "error": str(e)})
+                    summary["errors"].append({"input": url, "error": error})
                 continue
-        self.session.commit()
+            full_url, scheme, host, registrable, sha = norm
+            rows.append({
+                "full_url": full_url,
+                "url_sha256": sha,
+                "scheme": scheme,
+                "host": host,
+                "registrable_domain": registrable,
+                "canonical_sha256": canonical_sha256(full_url, rules) if rules is not None else None,
+                "source": None,
+                "notes": notes,
+                "risk_level": risk_level,
+                "phishing_flag": phishing_flag,
+            })
+        bulk_write(self.session, self.repo.bulk_create_or_update, rows, summary)
         return summary
+
+
+def full_model_scorer(scorer):
+    """The full URLNet behind ``scorer``: a cascade's early exits are only approximations of it."""
+    from app.infrastructure.ml_cascade import CascadeScorer
+    from app.infrastructure.ml_model import MicroBatcher
+
+    if type(scorer) is MicroBatcher:  # a ProcessScorerPool already runs the full model
+        scorer = scorer.scorer
+    return scorer.scorer if isinstance(scorer, CascadeScorer) else scorer
+
+
+class UrlRescoreWorker:
+    """Background thread that moves stored ML scores to the serving model version.
+
+    Each tick rescores one batch of stale rows in its own DB session, then sleeps
+    ``interval_s``; with nothing stale it polls every ``idle_s`` (a hot reload is picked up
+    on the next poll). Run exactly one: workers serving different model versions (during a
+    hot reload or a rolling deploy) would keep rewriting the same rows to their own version.
+    """
+
+    def __init__(self, session_factory, batch_size: int = 128, interval_s: float = 1.0, idle_s: float = 60.0):
+        self.session_factory = session_factory
+        self.batch_size = max(1, int(batch_size))
+        self.interval_s = float(interval_s)
+        self.idle_s = float(idle_s)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.stats = {"rescored": 0, "risk_level_changed": 0, "batches": 0, "model_version": None, "error": None}
+
+    def run_once(self) -> int:
+        session = self.session_factory()
+        try:
+            summary = UrlRiskService(session).rescore_stale(self.batch_size)
+        finally:
+            session.close()
+        self.stats["model_version"] = summary["model_version"]
+        if summary["rescored"]:
+            self.stats["batches"] += 1
+            self.stats["rescored"] += summary["rescored"]
+            self.stats["risk_level_changed"] += summary["risk_level_changed"]
+        return summary["rescored"]
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                done = self.run_once()
+                self.stats["error"] = None
+            except Exception as e:
+                if self.stats["error"] != str(e):
+                    print(f"Warning: URL rescoring failed: {e}")
+                self.stats["error"] = str(e)
+                done = 0
+            # A full batch suggests more stale rows: continue after a short pause
+            self._stop.wait(self.interval_s if done >= self.batch_size else self.idle_s)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="url-rescore", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    from app.core.config import llm_settings
+    from app.infrastructure.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rescore risk_url rows scored by an older URLNet version.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rescore = sub.add_parser("rescore", help="Run the rescoring loop as a single job")
+    rescore.add_argument("--batch-size", type=int, default=llm_settings.ml_rescore_batch_size)
+    rescore.add_argument("--interval", type=float, default=llm_settings.ml_rescore_interval_s)
+    rescore.add_argument("--idle", type=float, default=llm_settings.ml_rescore_idle_s)
+    rescore.add_argument("--once", action="store_true", help="Exit once no stale rows remain")
+    args = parser.parse_args()
+
+    worker = UrlRescoreWorker(SessionLocal, batch_size=args.batch_size, interval_s=args.interval, idle_s=args.idle)
+    if args.once:
+        while worker.run_once() >= worker.batch_size:
+            time.sleep(worker.interval_s)
+        print(json.dumps(worker.stats, indent=2))
+    else:
+        worker.start()
+        try:
+            worker._thread.join()
+        except KeyboardInterrupt:
+            worker.stop()
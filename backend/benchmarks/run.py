@@ -0,0 +1,242 @@
+"""Latency/throughput benchmarks for the URL scoring pipeline.
+
+Stages, each timed per call at every batch size:
+
+- ``normalize_url``: app.core.normalization.normalize_url over the batch, uncached (``__wrapped__``)
+- ``normalize_url_cached``: the same through the normalisation cache, warm (every call a hit)
+- ``extract_many``: registrable-domain extraction (app.core.public_suffix) for the batch's hosts
+- ``enc_char_url`` / ``enc_words`` / ``enc_token_chars``: the notebook encoders, one URL at a time
+- ``encode_batch``: the table-driven UrlEncoder used on the scoring path
+- ``forward``: URLNetDynamic on pre-encoded full-width tensors (per torch thread count)
+- ``score``: end-to-end URLScorer (``score`` for a batch of 1, ``score_many`` otherwise; per thread count)
+
+Runs offline: uses the configured ``urlnet_model.bin`` if present, otherwise a randomly
+initialised model of the same layout sized to meta.json. Writes JSON with p50/p95/p99
+latency (ms per call) and throughput (URLs/s); with ``--baseline`` it also fails when a
+stage's p50 regressed by more than ``--tolerance``::
+
+    python -m benchmarks.run --out bench.json
+    python -m benchmarks.run --baseline bench.json --tolerance 0.25
+"""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+import torch
+
+DEFAULT_BATCH_SIZES = (1, 8, 32, 128, 512)
+
+_HOSTS = ["google.com", "paypal.com", "github.com", "bank-of-example.co.uk", "xn--pypal-4ve.com",
+          "192.168.0.1:8080", "bit.ly", "login.microsoftonline.com", "münchen.de", "example.xyz"]
+_WORDS = ["login", "secure", "verify", "account", "update", "session", "reset", "signin", "wp-admin",
+          "index.php", "invoice", "docs", "api", "v1", "static", "img"]
+
+
+def synthetic_urls(n: int, seed: int = 0) -> List[str]:
+    """Deterministic mix of short, long, IDN, IP and query-heavy URLs."""
+    rng = random.Random(seed)
+    urls = []
+    for _ in range(n):
+        host = rng.choice(_HOSTS)
+        if rng.random() < 0.3:
+            host = ".".join(rng.sample(_WORDS[:6], rng.randint(1, 3))) + "." + host
+        path = "/".join(rng.choices(_WORDS, k=rng.randint(0, 6)))
+        query = "&".join(f"{w}={rng.randrange(10 ** 6)}" for w in rng.sample(_WORDS, rng.randint(0, 4)))
+        scheme = rng.choice(["http", "https", "HTTPS", ""])
+        url = f"{scheme}://{host}/{path}" if scheme else f"{host}/{path}"
+        urls.append(url + (f"?{query}" if query else ""))
+    return urls
+
+
+def summarize(samples: Sequence[float], items_per_call: int) -> Dict[str, float]:
+    """p50/p95/p99/mean latency in ms per call and throughput in items/s."""
+    ordered = sorted(samples)
+
+    def pct(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000.0
+
+    mean = statistics.fmean(ordered)
+    return {
+        "p50_ms": round(pct(0.50), 4),
+        "p95_ms": round(pct(0.95), 4),
+        "p99_ms": round(pct(0.99), 4),
+        "mean_ms": round(mean * 1000.0, 4),
+        "throughput_per_s": round(items_per_call / mean, 1) if mean > 0 else 0.0,
+        "calls": len(ordered),
+    }
+
+
+def time_calls(fn: Callable[[], object], repeats: int, warmup: int = 2) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def load_scorer(backend: str = "eager", seed: int = 0):
+    """(URLScorer, model source): the configured checkpoint, else a random one of the same layout."""
+    from AI_model.modeldef_from_notebook import random_urlnet_state_dict
+    from app.core.config import llm_settings
+    from app.infrastructure.ml_model import URLScorer
+
+    if os.path.exists(llm_settings.weight_path):
+        return URLScorer(backend=backend, quantize=False), llm_settings.weight_path
+    with open(llm_settings.meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    sd = random_urlnet_state_dict(*(max(meta[k].values()) + 1 for k in ("CHAR2ID", "WORD2ID", "TOKCHAR2ID")),
+                                  seed=seed)
+    fd, path = tempfile.mkstemp(suffix=".bin", prefix="urlnet_random_")
+    os.close(fd)
+    torch.save(sd, path)
+    try:
+        return URLScorer(llm_settings.meta_path, path, backend=backend, quantize=False), "random"
+    finally:
+        os.unlink(path)
+
+
+def run_benchmarks(batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES, threads: Sequence[int] = (1,),
+                   repeats: int = 20, backend: str = "eager", seed: int = 0, urls: Optional[List[str]] = None,
+                   stages: Optional[Sequence[str]] = None) -> dict:
+    from AI_model.encoders_from_notebook import enc_char_url, enc_token_chars, enc_words
+    from app.core.normalization import normalize_url
+    from app.core.public_suffix import extract_many
+
+    scorer, source = load_scorer(backend, seed)
+    corpus = urls or synthetic_urls(max(batch_sizes), seed)
+    results = []
+
+    def want(stage):
+        return stages is None or stage in stages
+
+    def record(stage, batch_size, n_threads, samples):
+        results.append({"stage": stage, "batch_size": batch_size, "threads": n_threads,
+                        **summarize(samples, batch_size)})
+
+    original_threads = torch.get_num_threads()
+    try:
+        for b in batch_sizes:
+            batch = [corpus[i % len(corpus)] for i in range(b)]
+            # Bigger batches get fewer calls so a full run stays in the minutes range
+            reps = max(3, repeats if b <= 32 else repeats // 4)
+
+            # Python-side stages do not depend on torch's thread count
+            if want("normalize_url"):
+                record("normalize_url", b, None, time_calls(
+                    lambda: [normalize_url.__wrapped__(u) for u in batch], reps))
+            if want("normalize_url_cached"):
+                for u in batch:
+                    normalize_url(u)
+                record("normalize_url_cached", b, None, time_calls(lambda: [normalize_url(u) for u in batch], reps))
+            if want("extract_many"):
+                hosts = [urlsplit(u).hostname or "" for u in batch]
+                record("extract_many", b, None, time_calls(lambda: extract_many(hosts), reps))
+            if want("enc_char_url"):
+                record("enc_char_url", b, None, time_calls(
+                    lambda: [enc_char_url(u, scorer.CHAR2ID, scorer.MAX_LEN) for u in batch], reps))
+            if want("enc_words"):
+                record("enc_words", b, None, time_calls(
+                    lambda: [enc_words(u, scorer.WORD2ID, scorer.MAX_WORDS) for u in batch], reps))
+            if want("enc_token_chars"):
+                record("enc_token_chars", b, None, time_calls(
+                    lambda: [enc_token_chars(u, scorer.TOKCHAR2ID, scorer.MAX_WORDS, scorer.MAX_TOK_CHAR)
+                             for u in batch], reps))
+            if want("encode_batch"):
+                record("encode_batch", b, None, time_calls(lambda: scorer.encoder.encode_batch(batch), reps))
+
+            x = scorer.encode_many(batch)
+            for t in threads:
+                torch.set_num_threads(t)
+                if want("forward"):
+                    record("forward", b, t, time_calls(lambda: scorer._forward(*x), reps))
+                if want("score"):
+                    call = (lambda: scorer.score(batch[0])) if b == 1 else (lambda: scorer.score_many(batch))
+                    record("score", b, t, time_calls(call, reps))
+    finally:
+        torch.set_num_threads(original_threads)
+
+    return {
+        "meta": {
+            "model": source,
+            "model_version": scorer.version,
+            "backend": scorer.backend,
+            "length_buckets": scorer.length_buckets,
+            "torch": torch.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": seed,
+            "repeats": repeats,
+            "corpus_urls": len(corpus),
+        },
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.25) -> List[str]:
+    """Stages whose p50 is more than ``tolerance`` slower than in ``baseline``."""
+    def key(r):
+        return r["stage"], r["batch_size"], r["threads"]
+
+    old = {key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in report["results"]:
+        ref = old.get(key(r))
+        if ref and ref["p50_ms"] > 0 and r["p50_ms"] > ref["p50_ms"] * (1.0 + tolerance):
+            regressions.append(f"{r['stage']} batch={r['batch_size']} threads={r['threads']}: "
+                               f"p50 {ref['p50_ms']:.3f} -> {r['p50_ms']:.3f} ms")
+    return regressions
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the URL scoring pipeline.")
+    parser.add_argument("--batch-sizes", type=_int_list, default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--threads", type=_int_list, default=sorted({1, torch.get_num_threads()}),
+                        help="Comma-separated torch.set_num_threads values")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--backend", default="eager")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--urls", default=None, help="Text file with one URL per line (default: synthetic)")
+    parser.add_argument("--stages", default=None, help="Comma-separated subset of stages to run")
+    parser.add_argument("--out", default=None, help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="Earlier report to check for p50 regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    url_list = None
+    if args.urls:
+        with open(args.urls, "r", encoding="utf-8") as f:
+            url_list = [line.strip() for line in f if line.strip()]
+    report = run_benchmarks(args.batch_sizes, args.threads, args.repeats, args.backend, args.seed, url_list,
+                            args.stages.split(",") if args.stages else None)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -67,8 +67,11 @@ CREATE TABLE `risk_url` (
   `registrable_domain` VARCHAR(255) NULL DEFAULT NULL COMMENT 'eTLD+1 extracted by PSL',
   `full_url` VARCHAR(2048) NOT NULL COMMENT 'Full URL (normalized)',
   `url_sha256` CHAR(64) NOT NULL COMMENT 'SHA-256 of normalized URL',
+  `canonical_sha256` CHAR(64) NULL DEFAULT NULL COMMENT 'SHA-256 of the tracking-param-free canonical URL',
   `risk_level` TINYINT UNSIGNED NOT NULL DEFAULT 0 COMMENT '0-unknown, 1-safe, 2-low risk, 3-medium risk, 4-unsafe',
   `phishing_flag` TINYINT UNSIGNED NOT NULL DEFAULT 0 COMMENT 'Heuristic phishing flag (0/1)',
+  `ml_score` FLOAT NULL DEFAULT NULL COMMENT 'URLNet phishing probability',
+  `ml_model_version` VARCHAR(64) NULL DEFAULT NULL COMMENT 'Model version that produced ml_score',
   `source` VARCHAR(64) NULL DEFAULT NULL COMMENT 'Data source',
   `report_count` INT UNSIGNED NOT NULL DEFAULT 0 COMMENT 'Number of reports',
   `last_reported_at` DATETIME NULL DEFAULT NULL COMMENT 'Last report time',
@@ -80,8 +83,18 @@ CREATE TABLE `risk_url` (
   UNIQUE KEY `uk_url_sha256` (`url_sha256`),
   KEY `idx_host` (`host`),
   KEY `idx_registrable_domain` (`registrable_domain`),
-  KEY `idx_risk_level` (`risk_level`)
+  KEY `idx_risk_level` (`risk_level`),
+  KEY `idx_ml_model_version` (`ml_model_version`),
+  KEY `idx_canonical_sha256` (`canonical_sha256`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='URL risk registry';
+-- Existing databases:
+-- ALTER TABLE `risk_url`
+--   ADD COLUMN `ml_score` FLOAT NULL DEFAULT NULL COMMENT 'URLNet phishing probability' AFTER `phishing_flag`,
+--   ADD COLUMN `ml_model_version` VARCHAR(64) NULL DEFAULT NULL COMMENT 'Model version that produced ml_score' AFTER `ml_score`,
+--   ADD KEY `idx_ml_model_version` (`ml_model_version`);
+-- ALTER TABLE `risk_url`
+--   ADD COLUMN `canonical_sha256` CHAR(64) NULL DEFAULT NULL COMMENT 'SHA-256 of the tracking-param-free canonical URL' AFTER `url_sha256`,
+--   ADD KEY `idx_canonical_sha256` (`canonical_sha256`);
 
 -- Table: articles
 DROP TABLE IF EXISTS `articles`;
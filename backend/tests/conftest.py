@@ -0,0 +1,57 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+# LLMSettings requires an API key at import time; the ML tests never call Gemini
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+META_PATH = Path(__file__).resolve().parents[1] / "AI_model" / "meta.json"
+
+SAMPLE_URLS = [
+    "http://secure-login.paypaI.com.verify-accounts.xyz/login",
+    "https://www.google.com/",
+    "https://github.com/PAtrickpp33/TrustLens",
+    "http://192.168.0.1:8080/admin?user=root&pass=toor",
+    "https://bit.ly/3xYz",
+    "HTTPS://Example.COM/a/b/c?q=1#frag",
+    "http://xn--pypal-4ve.com/signin",
+    "https://münchen.de/straße",
+    "https://accounts.example.co.uk/reset-password?token=" + "a" * 300,
+    "",
+]
+
+
+def make_urlnet_state_dict(char_vocab: int, word_vocab: int, tok_vocab: int, **kwargs) -> dict:
+    """Random three-branch URLNet checkpoint laid out like the notebook export."""
+    from AI_model.modeldef_from_notebook import random_urlnet_state_dict
+
+    return random_urlnet_state_dict(char_vocab, word_vocab, tok_vocab, **kwargs)
+
+
+@pytest.fixture(scope="session")
+def urlnet_meta() -> dict:
+    with open(META_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def urlnet_paths(tmp_path_factory, urlnet_meta):
+    """(meta_path, weights_path) for a random checkpoint sized to the bundled vocabularies."""
+    import torch
+
+    sd = make_urlnet_state_dict(max(urlnet_meta["CHAR2ID"].values()) + 1,
+                                max(urlnet_meta["WORD2ID"].values()) + 1,
+                                max(urlnet_meta["TOKCHAR2ID"].values()) + 1)
+    weights = tmp_path_factory.mktemp("urlnet") / "urlnet_model.bin"
+    torch.save(sd, weights)
+    return str(META_PATH), str(weights)
+
+
+@pytest.fixture(scope="session")
+def scorer(urlnet_paths):
+    from app.infrastructure.ml_model import URLScorer
+
+    return URLScorer(*urlnet_paths)
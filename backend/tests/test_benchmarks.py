@@ -0,0 +1,27 @@
+from app.core.normalization import clear_normalization_caches, normalize_url
+from benchmarks.run import compare, run_benchmarks, summarize, synthetic_urls
+
+
+def test_summarize_percentiles():
+    s = summarize([0.001 * i for i in range(1, 101)], items_per_call=10)
+    assert s["p50_ms"] == 51.0 and s["p95_ms"] == 95.0 and s["p99_ms"] == 99.0
+    assert s["calls"] == 100 and s["throughput_per_s"] > 0
+
+
+def test_run_benchmarks_smoke():
+    report = run_benchmarks(batch_sizes=(1, 4), threads=(1,), repeats=2, urls=synthetic_urls(4))
+    stages = {(r["stage"], r["batch_size"]) for r in report["results"]}
+    for stage in ("normalize_url", "normalize_url_cached", "enc_char_url", "enc_words", "enc_token_chars", "forward", "score"):
+        assert (stage, 1) in stages and (stage, 4) in stages
+    assert report["meta"]["model"] in ("random",) or report["meta"]["model"].endswith(".bin")
+
+    slower = {"results": [dict(r, p50_ms=r["p50_ms"] * 10) for r in report["results"]]}
+    assert compare(report, slower) == []
+    assert compare(slower, report, tolerance=0.5)
+
+
+def test_normalize_url_stage_bypasses_the_cache():
+    clear_normalization_caches()
+    run_benchmarks(batch_sizes=(4,), threads=(1,), repeats=3, urls=synthetic_urls(4), stages=["normalize_url"])
+    stats = normalize_url.cache.stats()
+    assert stats["hits"] == 0 and stats["misses"] == 0
@@ -0,0 +1,19 @@
+from app.core.canonical import CanonicalRules, canonical_sha256, canonicalize_url
+from app.core.normalization import normalize_url
+
+
+def test_canonicalize_drops_tracking_and_orders_params():
+    rules = CanonicalRules()
+    url = normalize_url("https://shop.example.com/items/%7euser/?utm_source=mail&b=2&fbclid=x&a=%2f&a=1")[0]
+    assert canonicalize_url(url, rules) == "https://shop.example.com/items/~user?a=%2F&a=1&b=2"
+    assert canonical_sha256(url, rules) == canonical_sha256(
+        normalize_url("https://shop.example.com/items/~user?a=%2F&a=1&b=2&UTM_Campaign=z")[0], rules)
+    # A query made only of tracking parameters disappears; the root path keeps its slash
+    assert canonicalize_url(normalize_url("https://example.com/?gclid=1")[0], rules) == "https://example.com/"
+
+
+def test_canonicalize_rules_can_be_relaxed():
+    rules = CanonicalRules(drop_params=frozenset(), drop_prefixes=(), sort_params=False,
+                           normalize_percent=False, strip_trailing_slash=False)
+    url = normalize_url("https://example.com/a/?utm_source=x&b=%7e")[0]
+    assert canonicalize_url(url, rules) == url
@@ -0,0 +1,58 @@
+import random
+
+import numpy as np
+import pytest
+
+from AI_model.encoder_engine import UrlEncoder, build_char_table, lookup_chars
+from AI_model.encoders_from_notebook import enc_char_url, enc_token_chars, enc_words
+from tests.conftest import SAMPLE_URLS
+
+
+@pytest.fixture(scope="module")
+def encoder(urlnet_meta):
+    return UrlEncoder(urlnet_meta["CHAR2ID"], urlnet_meta["WORD2ID"], urlnet_meta["TOKCHAR2ID"],
+                      max_len=urlnet_meta["MAX_LEN"], max_words=urlnet_meta["MAX_WORDS"],
+                      max_tok_char=urlnet_meta["MAX_TOK_CHAR"])
+
+
+def _reference(urls, meta):
+    """The notebook encoders, one URL at a time, stacked into batch arrays."""
+    def stack(rows, shape):
+        return np.stack(rows) if rows else np.empty((0,) + shape, np.int64)
+
+    return (stack([enc_char_url(u, meta["CHAR2ID"], max_len=meta["MAX_LEN"]) for u in urls], (meta["MAX_LEN"],)),
+            stack([enc_words(u, meta["WORD2ID"], max_words=meta["MAX_WORDS"]) for u in urls], (meta["MAX_WORDS"],)),
+            stack([enc_token_chars(u, meta["TOKCHAR2ID"], max_words=meta["MAX_WORDS"],
+                                   max_tok_char=meta["MAX_TOK_CHAR"]) for u in urls],
+                  (meta["MAX_WORDS"], meta["MAX_TOK_CHAR"])))
+
+
+def _random_urls(n, seed=0):
+    rng = random.Random(seed)
+    alphabet = "abcxyz0129-._~:/?#[]@!$&'()*+,;=%| \tÄéß€“💥\ud800İ"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 400))) for _ in range(n)]
+
+
+def test_encode_batch_is_bit_identical_to_notebook_encoders(encoder, urlnet_meta):
+    urls = SAMPLE_URLS + _random_urls(200)
+    for got, want in zip(encoder.encode_batch(urls), _reference(urls, urlnet_meta)):
+        assert got.dtype == want.dtype == np.int64
+        assert got.shape == want.shape
+        assert np.array_equal(got, want)
+
+
+def test_encode_single_and_empty_batch(encoder, urlnet_meta):
+    x_char, x_word, x_tokc = encoder.encode(SAMPLE_URLS[0])
+    want = _reference(SAMPLE_URLS[:1], urlnet_meta)
+    assert np.array_equal(x_char, want[0][0])
+    assert np.array_equal(x_word, want[1][0])
+    assert np.array_equal(x_tokc, want[2][0])
+
+    shapes = [a.shape for a in encoder.encode_batch([])]
+    assert shapes == [(0, 256), (0, 64), (0, 64, 16)]
+
+
+def test_lookup_chars_unknown_code_points():
+    table = build_char_table({"a": 2, "é": 3})
+    assert lookup_chars(table, "ab").tolist() == [2, 1]
+    assert lookup_chars(table, "aé€").tolist() == [2, 3, 1]
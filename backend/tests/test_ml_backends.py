@@ -0,0 +1,49 @@
+import pytest
+import torch
+
+from app.infrastructure.ml_backends import benchmark_backends, compile_model
+from tests.conftest import SAMPLE_URLS
+
+
+def _eager_and(backend, scorer, **kwargs):
+    inputs = scorer.encode_many(SAMPLE_URLS)
+    with torch.no_grad():
+        want = scorer.model(*inputs)["prob"]
+        runner = compile_model(scorer.model, backend, scorer.encode_many(SAMPLE_URLS[:2]), **kwargs)
+        got = runner(*inputs)["prob"]
+    return got, want
+
+
+def test_torchscript_matches_eager(scorer):
+    got, want = _eager_and("torchscript", scorer)
+    assert got.shape == want.shape
+    assert torch.allclose(got, want, atol=1e-5)
+
+
+def test_onnx_matches_eager(scorer, tmp_path):
+    pytest.importorskip("onnxruntime")
+    got, want = _eager_and("onnx", scorer, onnx_path=str(tmp_path / "urlnet.onnx"))
+    assert (tmp_path / "urlnet.onnx").stat().st_size > 0
+    assert torch.allclose(got, want, atol=1e-5)
+
+
+def test_unknown_backend_rejected(scorer):
+    with pytest.raises(ValueError, match="Unknown inference backend"):
+        compile_model(scorer.model, "tensorrt", scorer.encode_many(SAMPLE_URLS[:1]))
+
+
+def test_scorer_serves_from_backend(scorer, urlnet_paths):
+    from app.infrastructure.ml_model import URLScorer
+
+    traced = URLScorer(*urlnet_paths, backend="torchscript")
+    assert traced.backend == "torchscript"
+    assert traced.score_many(SAMPLE_URLS) == pytest.approx(scorer.score_many(SAMPLE_URLS), abs=1e-5)
+
+
+def test_benchmark_reports_latency_and_parity(scorer):
+    report = benchmark_backends(scorer.model, scorer.encode_many(SAMPLE_URLS), backends=["eager", "torchscript"],
+                                runs=3, warmup=1)
+    assert set(report) == {"eager", "torchscript"}
+    for row in report.values():
+        assert row["p50_ms"] > 0
+        assert row["max_abs_diff"] < 1e-5
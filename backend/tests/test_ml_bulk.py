@@ -0,0 +1,64 @@
+import json
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pytest
+
+from app.core.normalization import clear_normalization_caches, normalize_url
+from app.infrastructure.ml_bulk import CHECKPOINT_FILE, score_dataset
+from tests.conftest import SAMPLE_URLS
+
+
+def _write_feed(path, n=25):
+    urls = [SAMPLE_URLS[i % len(SAMPLE_URLS)] for i in range(n)]
+    pq.write_table(pa.table({"url": urls, "label": list(range(n))}), path)
+    return urls
+
+
+def _read(out_dir):
+    return ds.dataset(str(out_dir), format="parquet").to_table().sort_by("label").to_pylist()
+
+
+def test_bulk_scores_match_scorer_and_resume(tmp_path, scorer):
+    src, out = tmp_path / "feed.parquet", tmp_path / "scored"
+    urls = _write_feed(src)
+    clear_normalization_caches()
+    stats = score_dataset(str(src), str(out), batch_rows=10, chunk_rows=4, scorer=scorer)
+    assert stats["parts"] == 3 and stats["rows"] == 25
+    # Bulk feeds bypass the per-process normalisation cache
+    assert normalize_url.cache.stats()["size"] == 0
+    assert stats["errors"] == urls.count("")
+
+    rows = _read(out)
+    expected = {u: scorer.score(normalize_url(u)[0]) for u in set(urls) if u}
+    for row, u in zip(rows, urls):
+        assert row["url"] == u and row["ml_model_version"] == scorer.version
+        if u:
+            assert row["ml_score"] == pytest.approx(expected[u], abs=1e-6)
+            assert row["risk_band"] in {"SAFE", "LOW RISK", "MEDIUM RISK", "UNSAFE"}
+        else:
+            assert row["ml_score"] is None and row["error"]
+
+    # Resume after losing one part: only that part is recomputed
+    (out / "part-000001.parquet").unlink()
+    stats = score_dataset(str(src), str(out), batch_rows=10, chunk_rows=4, scorer=scorer)
+    assert stats["parts"] == 1 and stats["parts_skipped"] == 2
+    assert _read(out) == rows
+    assert json.loads((out / CHECKPOINT_FILE).read_text())["batch_rows"] == 10
+
+    with pytest.raises(RuntimeError, match="different batch_rows"):
+        score_dataset(str(src), str(out), batch_rows=7, scorer=scorer)
+
+
+def test_bulk_csv_on_process_pool(tmp_path, urlnet_paths, scorer):
+    from app.infrastructure.ml_model import URLScorer
+
+    src = tmp_path / "feed.csv"
+    src.write_text("url,label\nhttps://www.google.com/,0\nhttp://paypal.verify-login.xyz/a,1\n", encoding="utf-8")
+    parent = URLScorer(*urlnet_paths, backend="eager", quantize=False)
+    stats = score_dataset(str(src), str(tmp_path / "out"), workers=1, scorer=parent)
+    assert stats["rows"] == 2
+    rows = _read(tmp_path / "out")
+    assert [r["ml_score"] for r in rows] == pytest.approx(
+        scorer.score_many(["https://www.google.com/", "http://paypal.verify-login.xyz/a"]), abs=1e-6)
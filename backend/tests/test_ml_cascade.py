@@ -0,0 +1,115 @@
+import pytest
+
+from app.infrastructure.ml_cascade import CascadeScorer
+from benchmarks.run import synthetic_urls
+from tests.conftest import SAMPLE_URLS
+
+
+def test_cascade_scores_with_full_model_until_calibrated(scorer):
+    cascade = CascadeScorer(scorer, calibration_size=1000)
+    assert cascade.score_many(SAMPLE_URLS) == scorer.score_many(SAMPLE_URLS)
+    stats = cascade.cascade_stats
+    assert not stats["calibrated"] and stats["calibration_urls"] == len(SAMPLE_URLS)
+    assert stats["routing_rate"] is None
+
+
+def test_cascade_routes_only_uncertain_urls(scorer):
+    urls = synthetic_urls(300, seed=1)
+    full = scorer.score_many(urls)
+    # The random test model's scores sit in a narrow range; put one threshold in its middle
+    ordered = sorted(full)
+    cascade = CascadeScorer(scorer, band=(ordered[-1] - ordered[0]) / 10, audit_rate=1.0, min_agreement=0.0)
+    cascade.thresholds = (ordered[len(ordered) // 2],)
+    cascade.calibrate(synthetic_urls(400, seed=2))
+    assert cascade.cascade_stats["calibrated"]
+
+    got = cascade.score_many(urls)
+    for p, f in zip(got, full):
+        near = any(abs(p - th) < cascade.band for th in cascade.thresholds)
+        # Routed URLs carry the full score; early exits are away from every threshold
+        assert p == pytest.approx(f, abs=1e-6) or not near
+    stats = cascade.cascade_stats
+    assert stats["urls"] == len(urls)
+    assert stats["routed"] + stats["early_exit"] == len(urls)
+    assert stats["audited"] == stats["early_exit"]  # audit_rate=1 re-scores every early exit
+    assert 0 < stats["routed"] < len(urls)
+    assert 0.0 <= stats["early_exit_band_agreement"] <= 1.0
+
+
+def test_cascade_band_extremes(scorer):
+    urls = synthetic_urls(50, seed=3)
+    everything = CascadeScorer(scorer, band=1.0)
+    everything.calibrate(synthetic_urls(200, seed=4))
+    assert everything.score_many(urls) == pytest.approx(scorer.score_many(urls), abs=1e-6)
+    assert everything.cascade_stats["routing_rate"] == 1.0
+
+    nothing = CascadeScorer(scorer, band=0.0, audit_rate=0.0, min_agreement=0.0)
+    nothing.calibrate(synthetic_urls(200, seed=4))
+    nothing.score_many(urls)
+    assert nothing.cascade_stats["routing_rate"] == 0.0
+
+    with pytest.raises(ValueError, match="not a set of branches"):
+        CascadeScorer(scorer, stage1=("nope",))
+
+
+def test_early_exit_requires_held_out_band_agreement(scorer):
+    urls = synthetic_urls(300, seed=5)
+    full = scorer.score_many(urls)
+    ordered = sorted(full)
+    thresholds = tuple(ordered[len(ordered) * q // 4] for q in (1, 2, 3))
+    agreement = {}
+    for stage1 in (("word_cnn",), ("char_url",)):
+        cascade = CascadeScorer(scorer, stage1=stage1, band=0.0, audit_rate=0.0)
+        cascade.thresholds = thresholds
+        cascade.calibrate(synthetic_urls(1000, seed=6))
+        agreement[stage1[0]] = cascade.holdout_agreement
+        if not cascade.cascade_stats["early_exit_enabled"]:
+            # Below min_agreement the head is discarded and the full model keeps scoring everything
+            assert cascade.score_many(urls) == pytest.approx(full, abs=1e-6)
+            assert cascade.cascade_stats["routing_rate"] == 1.0
+    # On the fixture model with quartile thresholds (2k held-out URLs: word_cnn 0.31, char_url 0.96,
+    # char_url+word_cnn 0.996), one word token and 16 characters are close to chance across four bands
+    assert agreement["word_cnn"] < 0.5 and agreement["char_url"] > 0.9
+
+
+def _branch_rows(model):
+    """Rows passed through each branch module, counted with forward hooks."""
+    rows = {}
+    # word_cnn runs through .forward directly; its embedding lookup is a regular module call
+    for name, module in (("char_url", model.char_url), ("word_cnn", model.word_cnn.word_emb)):
+        rows[name] = 0
+        module.register_forward_hook(
+            lambda mod, args, out, name=name: rows.__setitem__(name, rows[name] + out.shape[0]))
+    return rows
+
+
+def test_cascade_never_runs_a_branch_twice(urlnet_paths):
+    from app.infrastructure.ml_model import URLScorer
+
+    scorer = URLScorer(*urlnet_paths)  # own instance: the hooks stay on its model
+    rows = _branch_rows(scorer.model)
+    urls = synthetic_urls(300, seed=7)
+    full = scorer.score_many(urls)
+    assert rows == {"char_url": 300, "word_cnn": 300}
+
+    ordered = sorted(full)
+    cascade = CascadeScorer(scorer, band=(ordered[-1] - ordered[0]) / 10, audit_rate=0.0,
+                            calibration_size=200, min_agreement=0.0)
+    cascade.thresholds = (ordered[len(ordered) // 2],)
+
+    # Calibrating: one full pass per URL also gives the stage-1 features
+    rows.update(char_url=0, word_cnn=0)
+    assert cascade.score_many(urls[:200]) == pytest.approx(full[:200], abs=1e-6)
+    assert rows == {"char_url": 200, "word_cnn": 200} and cascade.cascade_stats["early_exit_enabled"]
+
+    # Early exit: char_url once per URL, the word branch only for routed URLs
+    rows.update(char_url=0, word_cnn=0)
+    cascade.score_many(urls)
+    routed = cascade.cascade_stats["routed"]
+    assert rows == {"char_url": 300, "word_cnn": routed} and 0 < routed < 300
+
+    # Head rejected: exactly the full model's cost
+    cascade.head = None
+    rows.update(char_url=0, word_cnn=0)
+    assert cascade.score_many(urls) == pytest.approx(full, abs=1e-6)
+    assert rows == {"char_url": 300, "word_cnn": 300}
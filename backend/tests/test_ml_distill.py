@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.infrastructure.ml_distill import auc, conv_macs_per_url, run, split_holdout
+from app.infrastructure.ml_model import URLScorer
+from tests.conftest import SAMPLE_URLS
+
+
+def test_auc_matches_pairwise_definition():
+    scores = np.array([0.1, 0.4, 0.35, 0.8, 0.4])
+    labels = np.array([0, 0, 1, 1, 1], np.float32)
+    pairs = [(p, n) for p in scores[labels == 1] for n in scores[labels == 0]]
+    expected = np.mean([1.0 if p > n else 0.5 if p == n else 0.0 for p, n in pairs])
+    assert auc(scores, labels) == pytest.approx(expected)
+    assert auc(scores, np.ones(5)) is None
+
+
+def test_holdout_split_is_stable():
+    urls = [f"https://site{i}.example/" for i in range(200)]
+    mask = split_holdout(urls, 0.25)
+    assert (mask == split_holdout(list(reversed(urls)), 0.25)[::-1]).all()
+    assert 20 < mask.sum() < 80
+
+
+def test_distilled_char_only_student_loads_like_teacher(tmp_path, urlnet_paths):
+    teacher = URLScorer(*urlnet_paths, backend="eager", quantize=False)
+    urls = [u for u in SAMPLE_URLS if u] * 4 + [f"http://login{i}.verify-account.xyz/s?id={i}" for i in range(40)]
+    labels = [int("verify" in u or "paypal" in u) for u in urls]
+    src = tmp_path / "train.parquet"
+    pq.write_table(pa.table({"url": urls, "label": labels}), src)
+
+    report = run(str(src), str(tmp_path / "student"), holdout=0.3, teacher=teacher,
+                 student_kwargs={"emb_dim": 8, "channels": 4, "kernels": [3], "char_only": True},
+                 train_kwargs={"epochs": 2, "batch_size": 16, "log_every": 0})
+
+    student = URLScorer(str(tmp_path / "student" / "meta.json"), str(tmp_path / "student" / "urlnet_model.bin"),
+                        backend="eager", quantize=False)
+    assert not hasattr(student.model, "word_cnn")
+    assert 0.0 <= student.score("https://www.google.com/") <= 1.0
+    assert report["student"]["params"] < report["teacher"]["params"]
+    assert report["macs_ratio"] < 1.0
+    assert report["student"]["conv_macs_per_url"] == conv_macs_per_url(student.model, student.MAX_LEN,
+                                                                        student.MAX_WORDS)
+    assert set(report["student"]["at_thresholds"]) == {"th_low", "th_med", "th_high"}
+    assert 0.0 <= report["band_agreement"] <= 1.0 and len(report["history"]) == 2
+    assert json.loads((tmp_path / "student" / "report.json").read_text())["n"] == report["n"]
+
+
+def test_empty_holdout_is_rejected(tmp_path, urlnet_paths):
+    teacher = URLScorer(*urlnet_paths, backend="eager", quantize=False)
+    urls = [u for u in SAMPLE_URLS if u]
+    src = tmp_path / "train.parquet"
+    pq.write_table(pa.table({"url": urls, "label": [0] * len(urls)}), src)
+    with pytest.raises(ValueError, match="held out"):
+        run(str(src), str(tmp_path / "student"), holdout=0.0, teacher=teacher)
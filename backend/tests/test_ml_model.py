@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.infrastructure.ml_model import MicroBatcher
+from tests.conftest import SAMPLE_URLS
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 256])
+def test_score_many_matches_single_scores(scorer, batch_size):
+    batched = scorer.score_many(SAMPLE_URLS, batch_size=batch_size)
+    single = [scorer.score(u) for u in SAMPLE_URLS]
+    assert batched == pytest.approx(single, abs=1e-6)
+    assert all(0.0 <= p <= 1.0 for p in batched)
+    assert scorer.score_many([]) == []
+
+
+def test_length_bucketed_batches_match_full_width(scorer, monkeypatch):
+    urls = SAMPLE_URLS + ["http://a.io/", "https://" + "x" * 120 + ".com/" + "/".join(["seg"] * 20)]
+    monkeypatch.setattr(scorer, "length_buckets", False)
+    full = scorer.score_many(urls, batch_size=4)
+    monkeypatch.setattr(scorer, "length_buckets", True)
+    before = scorer.padding_stats
+    probs, counts = scorer.score_many_with_stats(urls, batch_size=4)
+    assert probs == full  # trimming keeps every conv window value the global max-pool can see
+    assert counts["urls"] == len(urls) and counts["batches"] == 3
+    assert counts["char_cells"] < counts["char_cells_untrimmed"]
+    after = scorer.padding_stats
+    assert after["urls"] == before["urls"] + len(urls)
+    assert after["char_waste"] < after["char_waste_untrimmed"]
+
+
+def test_micro_batcher_coalesces_concurrent_calls(scorer):
+    expected = [scorer.score(u) for u in SAMPLE_URLS]
+    batcher = MicroBatcher(scorer, max_batch_size=8, max_wait_ms=20)
+    try:
+        urls = SAMPLE_URLS * 4
+        with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+            got = list(pool.map(batcher.score, urls))
+        assert got == pytest.approx(expected * 4, abs=1e-6)
+        stats = batcher.stats
+        assert stats["items"] == len(urls)
+        assert stats["batches"] < len(urls)
+        assert stats["max_batch"] <= 8
+    finally:
+        batcher.close()
+
+
+def test_micro_batcher_propagates_errors(scorer):
+    class Broken:
+        def score_many(self, urls):
+            raise RuntimeError("boom")
+
+    batcher = MicroBatcher(Broken(), max_wait_ms=0)
+    try:
+        with pytest.raises(RuntimeError, match="boom"):
+            batcher.score("https://example.com")
+    finally:
+        batcher.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        batcher.score("https://example.com")
+
+
+def test_micro_batcher_close_fails_requests_left_in_the_queue():
+    import threading
+
+    started, release = threading.Event(), threading.Event()
+
+    class Slow:
+        def score_many(self, urls):
+            started.set()
+            release.wait(5)
+            return [0.5] * len(urls)
+
+    batcher = MicroBatcher(Slow(), max_batch_size=1, max_wait_ms=0)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        running = pool.submit(batcher.score, "https://a.example")
+        assert started.wait(5)
+        queued = pool.submit(batcher.score, "https://b.example")
+        while not batcher.stats["queue_depth"]:
+            pass
+        batcher.close(timeout=0.05)  # the worker is stuck on the first batch
+        with pytest.raises(RuntimeError, match="closed"):
+            queued.result(5)
+        release.set()
+        assert running.result(5) == 0.5
+
+
+def test_micro_batcher_exposes_scorer_attributes(scorer):
+    batcher = MicroBatcher(scorer, max_wait_ms=0)
+    try:
+        assert batcher.MAX_LEN == scorer.MAX_LEN
+        assert batcher.CHAR2ID is scorer.CHAR2ID
+    finally:
+        batcher.close()
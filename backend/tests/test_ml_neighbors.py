@@ -0,0 +1,185 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.infrastructure.base import Base
+from app.infrastructure.ml_neighbors import (NeighborIndex, NeighborIndexer, append_from_db, build_index_from_db,
+                                             UrlTable, get_neighbor_index, quantize_rows, set_neighbor_index)
+from app.infrastructure.models import RiskUrl
+from app.infrastructure.repositories import SqlAlchemyUrlRiskRepository
+from tests.conftest import SAMPLE_URLS
+
+
+def test_embeddings_feed_fc_like_scoring(scorer):
+    urls = [u for u in SAMPLE_URLS if u]
+    emb, probs = scorer.embed_and_score_many(urls, batch_size=3)
+    assert emb.shape == (len(urls), scorer.embedding_dim) and emb.dtype == np.float32
+    assert probs == pytest.approx(scorer.score_many(urls), abs=1e-5)
+    assert np.allclose(scorer.embed_many(urls[::-1])[::-1], emb, atol=1e-5)
+
+
+def test_int8_brute_force_matches_float_cosine():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(500, 48)).astype(np.float32)
+    codes, scales = quantize_rows(x)
+    assert np.abs(codes * scales[:, None] - x).max() <= scales.max() / 2 + 1e-6
+
+    index = NeighborIndex.build(x, ids=range(100, 600), urls=[f"u{i}" for i in range(500)])
+    assert index.centroids is None and index.memory_bytes < x.nbytes
+    q = x[:3] + 0.01 * rng.normal(size=(3, 48)).astype(np.float32)
+    unit = x / np.linalg.norm(x, axis=1, keepdims=True)
+    for j, hits in enumerate(index.search(q, k=5)):
+        expected = np.argsort(-(unit @ (q[j] / np.linalg.norm(q[j]))))[:5] + 100
+        assert [h["id"] for h in hits][:3] == list(expected[:3])
+        assert hits[0]["similarity"] > 0.99
+
+    # The query's own row can be excluded
+    assert index.search(x[:1], k=2, exclude_ids=[100])[0][0]["id"] != 100
+
+
+def test_ivf_finds_clustered_neighbours():
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(20, 32)).astype(np.float32)
+    labels = rng.integers(0, 20, 5000)
+    x = centers[labels] + 0.1 * rng.normal(size=(5000, 32)).astype(np.float32)
+    index = NeighborIndex.build(x, ids=np.arange(5000), urls=[str(i) for i in range(5000)], nlist=16)
+    assert index.stats["nlist"] == 16 and index.offsets[-1] == 5000
+    hits = index.search(centers[:5], k=10, nprobe=2)
+    recall = np.mean([labels[h["id"]] == j for j, row in enumerate(hits) for h in row])
+    assert recall > 0.9
+
+
+def _risk_db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[RiskUrl.__table__])
+    return sessionmaker(bind=engine, expire_on_commit=False)
+
+
+def _add_rows(factory, levels, start=0):
+    session = factory()
+    repo = SqlAlchemyUrlRiskRepository(session)
+    for i, level in enumerate(levels, start):
+        repo.create_or_update(full_url=f"http://login{i}.verify-account.xyz/", url_sha256=f"{i:064d}", scheme="http",
+                              host=f"login{i}.verify-account.xyz", registrable_domain="verify-account.xyz",
+                              source=None, notes=None, risk_level=level, phishing_flag=int(i == 3))
+    session.commit()
+    session.close()
+
+
+def test_build_from_db_indexes_flagged_rows(scorer):
+    factory = _risk_db()
+    _add_rows(factory, [4, 1, 3, 0, 4])
+    session = factory()
+    assert SqlAlchemyUrlRiskRepository(session).count_flagged(min_risk_level=3) == 4
+    assert SqlAlchemyUrlRiskRepository(session).count_flagged(min_risk_level=3, after_id=3) == 2
+    session.close()
+
+    index = build_index_from_db(factory, scorer, min_risk_level=3, page_rows=2)
+    assert sorted(index.ids.tolist()) == [1, 3, 4, 5]
+    assert index.model_version == scorer.version and index.dim == scorer.embedding_dim
+    hits = index.search(scorer.embed_many(["http://login0.verify-account.xyz/"]), k=1)[0]
+    assert hits[0]["url"] == "http://login0.verify-account.xyz/" and hits[0]["risk_level"] == 4
+
+
+def test_url_table_concat_and_take():
+    a = UrlTable.from_list(["http://a.test/", "http://\u00e9.test/x"])
+    b = UrlTable.from_list(["", "http://c.test/?q=1"])
+    both = UrlTable.concat([a, b, UrlTable.from_list([])])
+    assert list(both) == ["http://a.test/", "http://\u00e9.test/x", "", "http://c.test/?q=1"]
+    assert list(both.take(np.array([3, 0, 2, 1]))) == ["http://c.test/?q=1", "http://a.test/", "",
+                                                       "http://\u00e9.test/x"]
+    assert len(both.take(np.array([], np.int64))) == 0
+
+
+def test_append_matches_full_ivf_build():
+    rng = np.random.default_rng(2)
+    x = rng.normal(size=(3000, 16)).astype(np.float32)
+    urls = [str(i) for i in range(3000)]
+    full = NeighborIndex.build(x, ids=np.arange(3000), urls=urls, nlist=8)
+    base = NeighborIndex.build(x[:2000], ids=np.arange(2000), urls=urls[:2000], nlist=8)
+    codes, scales = quantize_rows(x[2000:] / np.linalg.norm(x[2000:], axis=1, keepdims=True))
+    grown = base.append(codes, scales, np.arange(2000, 3000), urls[2000:], np.zeros(1000))
+    assert len(grown) == 3000 and grown.last_id == 2999 and grown.offsets[-1] == 3000
+    assert grown.built_at == base.built_at and len(base) == 2000
+    # Every row sits in the list of its nearest (kept) centroid
+    lists = np.repeat(np.arange(8), np.diff(grown.offsets))
+    unit = grown.codes.astype(np.float32) @ grown.centroids.T
+    assert (np.argmax(unit, axis=1) == lists).all()
+    assert [grown.urls[i] for i in range(3000)] == [str(i) for i in grown.ids]
+    assert isinstance(grown.urls, UrlTable) and isinstance(full.urls, UrlTable)
+    assert grown.search(x[2500:2501], k=1, nprobe=8)[0][0]["id"] == 2500
+    assert full.search(x[2500:2501], k=1, nprobe=8)[0][0]["id"] == 2500
+
+
+def test_append_from_db_embeds_only_new_rows(scorer):
+    factory = _risk_db()
+    _add_rows(factory, [4, 1, 3])
+    index = build_index_from_db(factory, scorer, min_risk_level=3)
+    assert append_from_db(index, factory, scorer, min_risk_level=3) is index
+
+    calls = []
+    embed = scorer.embed_many
+    _add_rows(factory, [0, 4, 3], start=3)
+    scorer.embed_many = lambda urls: calls.append(list(urls)) or embed(urls)
+    try:
+        grown = append_from_db(index, factory, scorer, min_risk_level=3, page_rows=1)
+    finally:
+        del scorer.embed_many
+    assert calls == [["http://login3.verify-account.xyz/"], ["http://login4.verify-account.xyz/"],
+                     ["http://login5.verify-account.xyz/"]]
+    assert grown.ids.tolist() == [1, 3, 4, 5, 6] and grown.last_id == 6
+
+
+def test_saved_index_is_memory_mapped(tmp_path):
+    rng = np.random.default_rng(3)
+    x = rng.normal(size=(400, 24)).astype(np.float32)
+    index = NeighborIndex.build(x, ids=np.arange(400), urls=[f"http://ex{i}.test/\u00e9" for i in range(400)],
+                                model_version="v1", nlist=4)
+    first = index.save(tmp_path)
+    index.save(tmp_path)
+    latest = index.save(tmp_path)
+    assert (tmp_path / "CURRENT").read_text() == latest.name
+    assert not first.exists() and len(list(tmp_path.glob("index-*"))) == 2
+
+    loaded = NeighborIndex.load(latest)
+    assert loaded.shared and loaded.model_version == "v1" and loaded.built_at == index.built_at
+    assert loaded.urls[7] == index.urls[7] and len(loaded.urls) == 400
+    assert loaded.search(x[:2], k=3) == index.search(x[:2], k=3)
+
+
+class _Session:
+    def __init__(self, scorer):
+        self._scorer = self.scorer = scorer
+
+
+def test_one_indexer_builds_and_the_others_map_its_index(scorer, tmp_path):
+    factory = _risk_db()
+    _add_rows(factory, [4, 3])
+    builder = NeighborIndexer(factory, _Session(scorer), index_dir=tmp_path, refresh_s=0)
+    follower = NeighborIndexer(factory, _Session(scorer), index_dir=tmp_path, refresh_s=0)
+    try:
+        set_neighbor_index(None)
+        builder.run_once()
+        assert builder.is_builder and len(get_neighbor_index()) == 2
+        built_at = get_neighbor_index().built_at
+
+        set_neighbor_index(None)
+        follower.run_once()
+        assert not follower.is_builder and get_neighbor_index().shared and len(get_neighbor_index()) == 2
+
+        _add_rows(factory, [4], start=2)
+        set_neighbor_index(None)
+        builder.run_once()  # continues from the saved index: appends, no rebuild
+        assert get_neighbor_index().ids.tolist() == [1, 2, 3] and get_neighbor_index().built_at == built_at
+        follower.run_once()
+        assert get_neighbor_index().shared and len(get_neighbor_index()) == 3
+
+        builder.stop()
+        follower.run_once()
+        assert follower.is_builder
+    finally:
+        builder.stop()
+        follower.stop()
+        set_neighbor_index(None)
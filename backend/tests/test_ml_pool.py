@@ -0,0 +1,106 @@
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+import torch
+
+from app.infrastructure import ml_pool
+from app.infrastructure.ml_model import URLScorer
+from app.infrastructure.ml_pool import ProcessScorerPool
+from tests.conftest import SAMPLE_URLS, make_urlnet_state_dict
+
+
+def _worker_weights_shared() -> bool:
+    return all(p.is_shared() for p in ml_pool._worker_scorer.model.parameters())
+
+
+@pytest.fixture(scope="module")
+def pool(urlnet_paths):
+    p = ProcessScorerPool(URLScorer(*urlnet_paths, backend="eager", quantize=False),
+                          workers=2, max_batch_size=8, max_wait_ms=5.0)
+    yield p
+    p.close()
+
+
+def test_pool_matches_in_process_scorer(pool, scorer):
+    ref = scorer.score_many(SAMPLE_URLS)
+    assert pool.score_many(SAMPLE_URLS) == pytest.approx(ref, abs=1e-6)
+    assert pool.score(SAMPLE_URLS[0]) == pytest.approx(ref[0], abs=1e-6)
+    assert pool.score_many([]) == []
+
+
+def test_pool_workers_share_parent_weights(pool):
+    assert all(p.is_shared() for p in pool.scorer.model.parameters())
+    with pool._lock:
+        executor = pool._executor
+    assert all(executor.submit(_worker_weights_shared).result() for _ in range(4))
+    assert len(pool.worker_pids()) >= 1
+    assert pool.stats["executor"] == "process" and pool.stats["workers"] == 2
+
+
+def test_pool_concurrent_single_calls_are_batched(pool, scorer):
+    urls = SAMPLE_URLS * 4
+    ref = scorer.score_many(urls)
+    results = [None] * len(urls)
+
+    def call(i):
+        results[i] = pool.score(urls[i])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(urls))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == pytest.approx(ref, abs=1e-6)
+    assert pool.stats["max_batch"] > 1
+
+
+def test_pool_swap_and_rejects_quantized(pool, urlnet_paths, tmp_path):
+    weights = tmp_path / "other.bin"
+    torch.save(make_urlnet_state_dict(72, 28281, 53, seed=7), weights)
+    other = URLScorer(urlnet_paths[0], str(weights), backend="eager", quantize=False)
+    expected = other.score_many(SAMPLE_URLS[:3])
+    old = pool.swap(other)
+    try:
+        assert pool.score_many(SAMPLE_URLS[:3]) == pytest.approx(expected, abs=1e-6)
+    finally:
+        pool.swap(old)
+    with pytest.raises(ValueError, match="eager float"):
+        ProcessScorerPool(URLScorer(*urlnet_paths, backend="eager", quantize=True), workers=1)
+
+
+def test_pool_recovers_from_a_dead_worker(pool, scorer):
+    ref = scorer.score_many(SAMPLE_URLS)
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result()
+    # Bulk, direct and micro-batched calls all restart the pool instead of failing for good
+    assert pool.score_many(SAMPLE_URLS) == pytest.approx(ref, abs=1e-6)
+    assert pool.submit(ml_pool._ping).result() > 0
+    assert pool.score(SAMPLE_URLS[0]) == pytest.approx(ref[0], abs=1e-6)
+
+
+def test_pool_restart_does_not_block_stats(pool, monkeypatch):
+    spawning, release = threading.Event(), threading.Event()
+    start = pool._start
+
+    def slow_start(scorer):
+        spawning.set()
+        release.wait(10)
+        return start(scorer)
+
+    monkeypatch.setattr(pool, "_start", slow_start)
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result()
+    results = []
+    caller = threading.Thread(target=lambda: results.append(pool.submit(ml_pool._ping).result()))
+    caller.start()
+    assert spawning.wait(10)
+    # The new workers are still being started; stats must not wait for them
+    stats = threading.Thread(target=lambda: results.append(pool.stats["workers"]))
+    stats.start()
+    stats.join(2)
+    assert not stats.is_alive() and results == [2]
+    release.set()
+    caller.join(30)
+    assert results[1] > 0
@@ -0,0 +1,27 @@
+import pytest
+
+from app.infrastructure.ml_model import URLScorer
+from app.infrastructure.ml_quantization import accuracy_delta_report, quantize_model
+from tests.conftest import SAMPLE_URLS
+
+
+@pytest.fixture(scope="module")
+def quant_scorer(urlnet_paths):
+    return URLScorer(*urlnet_paths, backend="eager", quantize=True)
+
+
+def test_quantize_model_replaces_linear_and_embedding_layers(scorer):
+    q = quantize_model(scorer.model)
+    kinds = {type(m).__module__ for m in q.modules()}
+    assert any("quantized" in k for k in kinds)
+    assert type(scorer.model.fc).__name__ == "Linear"  # float model untouched
+    assert "quantized" in type(q.fc).__module__
+
+
+def test_quantized_scores_stay_close_to_float(scorer, quant_scorer):
+    assert quant_scorer.quantized and not scorer.quantized
+    report = accuracy_delta_report(scorer, quant_scorer, SAMPLE_URLS * 3, batch_size=8)
+    assert report["n"] == len(SAMPLE_URLS) * 3
+    assert report["max_abs_delta"] < 0.05
+    assert 0.0 <= report["band_agreement"] <= 1.0
+    assert report["quantized_model_bytes"] < report["float_model_bytes"]
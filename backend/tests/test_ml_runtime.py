@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.core.config import ML_EXEC_PROFILES, LLMSettings
+from app.infrastructure import ml_runtime
+from app.infrastructure.ml_runtime import parse_cpu_list, partition
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def test_parse_and_partition_cpus():
+    assert parse_cpu_list("0-3, 8,10-11") == [0, 1, 2, 3, 8, 10, 11]
+    cpus = list(range(10))
+    slices = [partition(cpus, 3, s) for s in range(3)]
+    assert slices == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    # More slots than CPUs: slots wrap onto single CPUs instead of getting nothing
+    assert partition([0, 1], 4, 3) == [1]
+
+
+def test_slots_are_exclusive_while_held():
+    cpus = [9001, 9002]  # a key no real worker uses
+    assert ml_runtime._claim_slot(cpus, 2) == 0
+    held = ml_runtime._slot_file
+    # A second claim (as a sibling worker would) must skip the held slot
+    assert ml_runtime._claim_slot(cpus, 2) == 1
+    assert held.closed
+    ml_runtime._slot_file.close()
+    ml_runtime._slot_file = None
+
+
+def _apply_in_subprocess(args: str = "", **env):
+    code = ("import json; from app.infrastructure.ml_runtime import apply_execution_profile; "
+            f"print(json.dumps(apply_execution_profile({args})))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True,
+                         env={**os.environ, "GEMINI_API_KEY": "test-key", **env}, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="needs Linux CPU affinity")
+def test_profiles_set_threads_and_affinity():
+    cpus = ml_runtime.available_cpus()
+    state = _apply_in_subprocess(ML_EXEC_PROFILE="throughput", ML_WEB_WORKERS="1")
+    assert state["profile"] == "throughput"
+    assert state["torch_threads"] == 1 and state["interop_threads"] == 1
+    assert state["cpu_affinity"] == cpus
+
+    state = _apply_in_subprocess(ML_EXEC_PROFILE="shared-node", ML_WEB_WORKERS="1", ML_INTRA_OP_THREADS="3")
+    assert state["torch_threads"] == 3 and state["cpu_affinity"] is None
+
+    state = _apply_in_subprocess(ML_EXEC_PROFILE="")
+    assert state["profile"] is None and state["cpu_affinity"] is None
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="needs Linux CPU affinity")
+def test_intra_op_override_wins_over_caller_threads():
+    # ProcessScorerPool workers pass threads_per_worker; ML_INTRA_OP_THREADS still applies to them
+    state = _apply_in_subprocess("workers=1, threads=2", ML_EXEC_PROFILE="shared-node", ML_INTRA_OP_THREADS="3")
+    assert state["torch_threads"] == 3
+    state = _apply_in_subprocess("workers=1, threads=2", ML_EXEC_PROFILE="shared-node")
+    assert state["torch_threads"] == 2
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="needs Linux CPU affinity")
+def test_overrides_apply_without_a_profile():
+    cpu = ml_runtime.available_cpus()[0]
+    state = _apply_in_subprocess(ML_EXEC_PROFILE="", ML_INTRA_OP_THREADS="2", ML_INTER_OP_THREADS="1",
+                                 ML_CPU_AFFINITY=str(cpu), ML_FLUSH_DENORMAL="false")
+    assert state["profile"] is None
+    assert state["torch_threads"] == 2 and state["interop_threads"] == 1
+    assert state["cpu_affinity"] == [cpu] and state["flush_denormal"] is False
+    # Nothing set: torch's defaults stay
+    state = _apply_in_subprocess(ML_EXEC_PROFILE="")
+    assert state["cpu_affinity"] is None and state["flush_denormal"] is None
+
+
+def test_unknown_profile_fails_at_settings_load():
+    assert set(ml_runtime.PROFILES) == set(ML_EXEC_PROFILES)
+    assert LLMSettings(ml_exec_profile=" Latency ").ml_exec_profile == "latency"
+    with pytest.raises(ValueError, match="Unknown ML_EXEC_PROFILE"):
+        LLMSettings(ml_exec_profile="fastest")
@@ -0,0 +1,189 @@
+import json
+import shutil
+import threading
+
+import pytest
+import torch
+
+from app.infrastructure import model_registry
+from app.infrastructure.llm import LLMSession
+from app.infrastructure.model_registry import ModelRegistry
+from tests.conftest import SAMPLE_URLS, make_urlnet_state_dict
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    reg = ModelRegistry(tmp_path / "AI_model")
+    monkeypatch.setattr(model_registry, "_registry", reg)
+    return reg
+
+
+def _publish(registry, version, urlnet_paths, tmp_path, seed):
+    meta_path, _ = urlnet_paths
+    weights = tmp_path / f"weights_{version}.bin"
+    torch.save(make_urlnet_state_dict(72, 28281, 53, seed=seed), weights)
+    return registry.publish(version, meta_path, weights)
+
+
+def test_publish_and_resolve(registry, urlnet_paths, tmp_path):
+    a = _publish(registry, "v1", urlnet_paths, tmp_path, seed=1)
+    assert a.verified and a.version == "v1"
+    assert set(a.checksums) == {"meta.json", "urlnet_model.bin"}
+    _publish(registry, "v2", urlnet_paths, tmp_path, seed=2)
+    assert registry.list_versions() == ["v1", "v2"]
+    assert registry.current_version() == "v2"
+    assert registry.resolve().version == "v2"
+    assert registry.resolve("v1") is registry.resolve("v1")  # cached
+    with pytest.raises(ValueError, match="already exists"):
+        _publish(registry, "v1", urlnet_paths, tmp_path, seed=3)
+
+
+def test_checksum_mismatch_is_rejected(registry, urlnet_paths, tmp_path):
+    a = _publish(registry, "v1", urlnet_paths, tmp_path, seed=1)
+    with open(a.weights_path, "ab") as f:
+        f.write(b"corrupt")
+    registry.refresh()
+    with pytest.raises(RuntimeError, match="Checksum mismatch"):
+        registry.resolve("v1")
+
+
+def test_missing_version(registry):
+    with pytest.raises(RuntimeError, match="not found"):
+        registry.resolve("nope")
+
+
+def test_hot_swap_under_load(registry, urlnet_paths, tmp_path):
+    _publish(registry, "v1", urlnet_paths, tmp_path, seed=1)
+    session = LLMSession()
+    try:
+        assert session.warm_up(batches=1)
+        assert session.scorer_state()["version"] == "v1"
+        before = session.scorer.score(SAMPLE_URLS[0])
+
+        _publish(registry, "v2", urlnet_paths, tmp_path, seed=2)
+        errors, stop = [], threading.Event()
+
+        def hammer():
+            while not stop.is_set():
+                try:
+                    session.scorer.score(SAMPLE_URLS[1])
+                except Exception as e:  # pragma: no cover - failure path
+                    errors.append(e)
+
+        threads = [threading.Thread(target=hammer) for _ in range(4)]
+        for t in threads:
+            t.start()
+        state = session.reload_scorer(wait=True)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        assert state == {"status": "done", "version": "v2", "error": None}
+        assert errors == []
+        assert session.scorer_state()["version"] == "v2"
+        assert session.scorer.score(SAMPLE_URLS[0]) != pytest.approx(before, abs=1e-9)
+
+        failed = session.reload_scorer(version="missing", wait=True)
+        assert failed["status"] == "failed"
+        assert session.scorer_state()["version"] == "v2"  # still serving the last good model
+    finally:
+        session.close()
+
+
+def test_versions_are_ordered_by_creation_not_name(registry, urlnet_paths, tmp_path):
+    _publish(registry, "v9", urlnet_paths, tmp_path, seed=1)
+    _publish(registry, "v10", urlnet_paths, tmp_path, seed=2)
+    (registry.versions_dir / "CURRENT").unlink()
+    assert registry.list_versions() == ["v9", "v10"]
+    assert registry.current_version() == "v10"
+
+
+def test_version_names_cannot_leave_the_registry(registry, urlnet_paths, tmp_path):
+    _publish(registry, "v1", urlnet_paths, tmp_path, seed=1)
+    for name in ("../..", "..", "v1/../v1", ".v1.tmp", "/etc"):
+        with pytest.raises(ValueError, match="Invalid model version"):
+            registry.resolve(name)
+    with pytest.raises(ValueError, match="Invalid model version"):
+        LLMSession().reload_scorer(version="../..")
+
+
+def test_manifest_without_checksums_is_rejected(registry, urlnet_paths, tmp_path):
+    _publish(registry, "v1", urlnet_paths, tmp_path, seed=1)
+    manifest = registry.versions_dir / "v1" / "manifest.json"
+    manifest.write_text(json.dumps({"version": "v1", "files": {}}), encoding="utf-8")
+    registry.refresh()
+    with pytest.raises(RuntimeError, match="no checksum"):
+        registry.resolve("v1")
+
+
+def test_reload_closes_the_replaced_scorer(monkeypatch):
+    class _Closable:
+        def __init__(self, version):
+            self.version, self.closed = version, False
+
+        def score_many(self, urls):
+            return [0.5] * len(urls)
+
+        def close(self):
+            self.closed = True
+
+    from app.infrastructure import ml_model
+    monkeypatch.setattr(ml_model, "get_model_artifact", lambda version=None: version)
+    monkeypatch.setattr(model_registry.ModelRegistry, "refresh", lambda self: None)
+    monkeypatch.setattr(LLMSession, "_wrap", staticmethod(lambda scorer: scorer))
+    monkeypatch.setattr(LLMSession, "_new_scorer", staticmethod(lambda artifact=None: _Closable(artifact)))
+    session = LLMSession()
+    old = session._scorer = _Closable("v1")
+    assert session.reload_scorer(version="v2", wait=True)["version"] == "v2"
+    assert old.closed and not session._scorer.closed
+
+
+def test_reload_waits_for_a_concurrent_first_load(monkeypatch):
+    loading, release = threading.Event(), threading.Event()
+
+    class _Closable:
+        def __init__(self, version):
+            self.version, self.closed = version, False
+            if version is None:  # the lazy first load blocks until released
+                loading.set()
+                release.wait(5)
+
+        def score_many(self, urls):
+            return [0.5] * len(urls)
+
+        def close(self):
+            self.closed = True
+
+    from app.infrastructure import ml_model
+    from app.infrastructure import ml_runtime
+    monkeypatch.setattr(ml_model, "get_model_artifact", lambda version=None: version)
+    monkeypatch.setattr(ml_runtime, "apply_execution_profile", lambda: {})
+    monkeypatch.setattr(model_registry.ModelRegistry, "refresh", lambda self: None)
+    monkeypatch.setattr(LLMSession, "_wrap", staticmethod(lambda scorer: scorer))
+    monkeypatch.setattr(LLMSession, "_new_scorer", staticmethod(lambda artifact=None: _Closable(artifact)))
+    session = LLMSession()
+    first = threading.Thread(target=lambda: session.scorer)
+    first.start()
+    assert loading.wait(5)
+    reload = threading.Thread(target=session.reload_scorer, kwargs={"version": "v2", "wait": True})
+    reload.start()
+    reload.join(0.2)
+    assert reload.is_alive()  # blocked on the lock held by the first load
+    release.set()
+    first.join(5)
+    reload.join(5)
+    # The reload replaced (and closed) the lazily loaded scorer instead of being overwritten by it
+    assert session._scorer.version == "v2" and not session._scorer.closed
+
+
+def test_flat_artifact_version_follows_its_weights(registry, urlnet_paths):
+    meta_path, _ = urlnet_paths
+    registry.root.mkdir(parents=True)
+    shutil.copyfile(meta_path, registry.root / "meta.json")
+    torch.save(make_urlnet_state_dict(72, 28281, 53, seed=1), registry.root / "urlnet_model.bin")
+    first = registry.resolve()
+    assert first.version.startswith("bundled-") and registry.resolve("bundled") is first
+
+    torch.save(make_urlnet_state_dict(72, 28281, 53, seed=2), registry.root / "urlnet_model.bin")
+    registry.refresh()
+    assert registry.resolve().version not in (first.version, "bundled")
@@ -0,0 +1,82 @@
+import pytest
+import torch
+
+from AI_model.modeldef_from_notebook import build_urlnet_from_state_dict
+from tests.conftest import make_urlnet_state_dict
+
+
+def _vocabs(char=72, word=300, tok=53):
+    return ({str(i): i for i in range(2, char)}, {str(i): i for i in range(2, word)},
+            {str(i): i for i in range(2, tok)})
+
+
+def _inputs(batch=3):
+    g = torch.Generator().manual_seed(0)
+    return (torch.randint(0, 72, (batch, 256), generator=g), torch.randint(0, 300, (batch, 64), generator=g),
+            torch.randint(0, 53, (batch, 64, 16), generator=g))
+
+
+def test_forward_is_static_and_reproducible():
+    sd = make_urlnet_state_dict(72, 300, 53)
+    a = build_urlnet_from_state_dict(*_vocabs(), sd)
+    b = build_urlnet_from_state_dict(*_vocabs(), sd)
+    names = set(dict(a.named_modules()))
+    x = _inputs()
+    with torch.no_grad():
+        assert torch.equal(a(*x)["prob"], b(*x)["prob"])
+    assert set(dict(a.named_modules())) == names  # forward created no layers
+    assert isinstance(a.char_url.proj, torch.nn.Identity)
+    assert a.word_cnn.proj.in_features == 32 + 16
+
+
+def test_missing_projection_fails_fast():
+    sd = make_urlnet_state_dict(72, 300, 53)
+    del sd["word_cnn.proj.weight"], sd["word_cnn.proj.bias"]
+    with pytest.raises(RuntimeError, match="word_cnn.*no projection"):
+        build_urlnet_from_state_dict(*_vocabs(), sd)
+
+
+def test_mismatched_projection_fails_fast():
+    sd = make_urlnet_state_dict(72, 300, 53)
+    sd["word_cnn.proj.weight"] = torch.zeros(32, 40)
+    with pytest.raises(RuntimeError, match="projection maps 40 -> 32"):
+        build_urlnet_from_state_dict(*_vocabs(), sd)
+
+
+def test_vocab_larger_than_embedding_fails_fast():
+    with pytest.raises(RuntimeError, match="char_url.*only 72 rows"):
+        build_urlnet_from_state_dict(*_vocabs(char=80), make_urlnet_state_dict(72, 300, 53))
+
+
+def test_fc_width_mismatch_fails_fast():
+    sd = make_urlnet_state_dict(72, 300, 53)
+    sd["fc.weight"] = torch.zeros(1, 100)
+    with pytest.raises(RuntimeError, match="fc expects 100"):
+        build_urlnet_from_state_dict(*_vocabs(), sd)
+
+
+def test_bag_pooling_matches_dense_padding_inclusive_mean():
+    sd = make_urlnet_state_dict(72, 300, 53)
+    dense = build_urlnet_from_state_dict(*_vocabs(), sd, tok_pooling="dense")
+    bag = build_urlnet_from_state_dict(*_vocabs(), sd, tok_pooling="bag")
+    assert isinstance(bag.char_tok.emb, torch.nn.EmbeddingBag)
+    assert set(bag.state_dict()) == set(dense.state_dict())
+    x_char, x_word, x_tokc = _inputs(batch=8)
+    x_tokc[:, :, 5:] = 0  # mostly-padded words
+    with torch.no_grad():
+        ref = dense(x_char, x_word, x_tokc)["prob"]
+        got = bag(x_char, x_word, x_tokc)["prob"]
+    assert torch.allclose(ref, got, atol=1e-6)
+
+
+def test_bag_exclude_padding_averages_real_characters_only():
+    sd = make_urlnet_state_dict(72, 300, 53)
+    model = build_urlnet_from_state_dict(*_vocabs(), sd, tok_pooling="bag_exclude_padding")
+    x_tokc = torch.zeros(1, 2, 16, dtype=torch.long)
+    x_tokc[0, 0, :3] = torch.tensor([4, 5, 6])
+    pooled = model.char_tok._pool_tokens(x_tokc)
+    expected = sd["char_tok.emb.weight"][[4, 5, 6]].mean(dim=0)
+    assert torch.allclose(pooled[0, 0], expected, atol=1e-6)
+    assert torch.count_nonzero(pooled[0, 1]) == 0  # all-padding word
+    with pytest.raises(ValueError, match="Unknown token pooling"):
+        build_urlnet_from_state_dict(*_vocabs(), sd, tok_pooling="max")
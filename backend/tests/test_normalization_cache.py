@@ -0,0 +1,39 @@
+import pytest
+
+from app.core.normalization import (
+    NormalizationCache,
+    clear_normalization_caches,
+    normalization_cache_stats,
+    normalize_email,
+    normalize_url,
+)
+
+
+def test_results_and_errors_are_memoized():
+    clear_normalization_caches()
+    first = normalize_url("https://Example.com:443/a?b=1")
+    assert normalize_url("https://Example.com:443/a?b=1") is first
+    for _ in range(2):
+        with pytest.raises(ValueError, match="@-sign"):
+            normalize_email("not-an-address")
+    stats = normalization_cache_stats()
+    assert stats["url"]["hits"] == 1 and stats["url"]["misses"] == 1
+    assert stats["email"]["error_hits"] == 1 and stats["email"]["size"] == 1
+
+
+def test_long_inputs_bypass_the_cache():
+    clear_normalization_caches()
+    url = "https://example.com/" + "a" * 2000
+    assert normalize_url(url) == normalize_url.__wrapped__(url)
+    assert normalization_cache_stats()["url"]["size"] == 0
+
+
+def test_lru_eviction():
+    cache = NormalizationCache(maxsize=2)
+    cache.put(("a",), True, 1)
+    cache.put(("b",), True, 2)
+    assert cache.get(("a",)) == (True, (True, 1))
+    cache.put(("c",), True, 3)
+    assert cache.get(("b",)) == (False, None)
+    assert cache.stats()["evictions"] == 1 and cache.stats()["size"] == 2
+    assert not NormalizationCache(maxsize=0).cacheable(("a",))
@@ -0,0 +1,19 @@
+from app.core.config import settings
+from app.core.normalization import normalize_email_many, normalize_phone_many, normalize_url, normalize_url_many
+
+
+def test_results_and_errors_are_aligned():
+    urls = ["https://a.example.co.uk/x", "", "https://a.example.co.uk/x", None]
+    results, errors = normalize_url_many(urls, workers=0)
+    assert results[0] == results[2] == normalize_url(urls[0])
+    assert results[1] is None and results[3] is None
+    assert errors[0] is None and errors[1] == errors[3] == "URL cannot be empty"
+
+    results, errors = normalize_phone_many(["+14155552671", "12"], workers=0)
+    assert results[0] == ("+14155552671", "+1", "4155552671") and errors[1]
+
+
+def test_process_pool_matches_in_process(monkeypatch):
+    monkeypatch.setattr(settings, "normalize_pool_min_items", 4)
+    addresses = [f"User{i}@Example.com" for i in range(10)] + ["bad"]
+    assert normalize_email_many(addresses, workers=2) == normalize_email_many(addresses, workers=0)
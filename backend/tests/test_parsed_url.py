@@ -0,0 +1,32 @@
+import pickle
+
+import pytest
+
+from app.core.normalization import normalize_url
+from app.core.parsed_url import ParsedUrl, ascii_safe_url
+
+URL = "HTTPS://Bücher.example.co.uk:443/Login Page?next=/a b#frag"
+
+
+def test_fields_match_the_standalone_helpers():
+    parsed = ParsedUrl(URL)
+    assert parsed.as_tuple() == normalize_url(URL)
+    assert parsed.registrable_domain == "example.co.uk" and str(parsed) == parsed.normalized
+    assert parsed.ascii_safe == ascii_safe_url(URL) and parsed.ascii_safe.startswith("https://xn--")
+    assert ParsedUrl.of(parsed) is parsed
+    with pytest.raises(ValueError):
+        ParsedUrl("  ")
+
+
+def test_scorer_reuses_tokens_and_encodings(scorer):
+    parsed = ParsedUrl("http://paypal.verify-account.xyz/login")
+    assert scorer.score(parsed) == scorer.score(parsed.normalized)
+    cached = dict(parsed._encodings)
+    assert len(cached) == 1
+    scorer.embed_and_score_many([parsed])
+    assert parsed._encodings == cached  # same widths: the encoding was reused
+    assert scorer.score_many([parsed, "https://www.google.com/"]) == \
+        scorer.score_many([parsed.normalized, "https://www.google.com/"])
+
+    clone = pickle.loads(pickle.dumps(parsed))
+    assert clone == parsed and clone.tokens == parsed.tokens and clone._encodings == {}
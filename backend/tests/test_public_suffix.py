@@ -0,0 +1,40 @@
+import socket
+
+import pytest
+
+from app.core.public_suffix import ExtractResult, PublicSuffixList, get_suffix_list
+
+HOSTS = [
+    "", "localhost", "example.com", "example.com.", "www.example.co.uk", "a.b.c.co.uk",
+    "foo.ck", "www.ck", "a.b.kawasaki.jp", "city.kawasaki.jp", "user.github.io",
+    "xn--fiqs8s.xn--55qx5d.cn", "bücher.de", "192.168.1.1", "256.1.1.1", "1.2.3", "foo。com",
+]
+
+
+def test_wildcard_exception_and_private_rules():
+    psl = PublicSuffixList(["uk", "co.uk", "*.ck", "!www.ck", "github.io"])
+    assert psl.extract("a.b.co.uk") == ExtractResult("a", "b", "co.uk")
+    assert psl.extract("x.foo.ck") == ExtractResult("", "x", "foo.ck")
+    assert psl.extract("www.ck") == ExtractResult("", "www", "ck")
+    assert psl.extract("u.github.io").registrable_domain == "u.github.io"
+    assert get_suffix_list().extract("u.github.io").registrable_domain == "github.io"  # ICANN rules only
+    assert psl.extract("fe80::1") == ExtractResult("", "fe80::1", "")
+
+
+def test_matches_tldextract():
+    tldextract = pytest.importorskip("tldextract")
+    psl = get_suffix_list()
+    for host in HOSTS:
+        e = tldextract.extract(host)
+        assert psl.extract(host) == (e.subdomain, e.domain, e.suffix), host
+
+
+def test_extract_many_is_offline_and_aligned(monkeypatch):
+    def no_network(*args, **kwargs):
+        raise AssertionError("network access")
+
+    monkeypatch.setattr(socket, "create_connection", no_network)
+    monkeypatch.setattr(socket.socket, "connect", no_network)
+    psl = PublicSuffixList.from_file()
+    assert psl.version and psl.rules > 5000
+    assert psl.extract_many(HOSTS + HOSTS) == [psl.extract(h) for h in HOSTS] * 2
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.infrastructure import ml_model
+from app.infrastructure.llm import LLMSession
+from app.infrastructure.model_registry import ModelArtifact
+
+
+def test_warm_up_loads_scorer(monkeypatch, urlnet_paths):
+    artifact = ModelArtifact("test", *urlnet_paths)
+    monkeypatch.setattr(ml_model, "get_model_artifact", lambda version=None: artifact)
+    session = LLMSession()
+    assert session.scorer_state()["loaded"] is False
+    try:
+        assert session.warm_up(batches=2) is True
+        state = session.scorer_state()
+        assert state["loaded"] and state["warmed_up"]
+        assert state["version"] == "test"
+        assert state["error"] is None
+    finally:
+        session.close()
+
+
+def test_warm_up_failure_is_recorded(monkeypatch, tmp_path):
+    missing = ModelArtifact("test", str(tmp_path / "missing.json"), str(tmp_path / "missing.bin"))
+    monkeypatch.setattr(ml_model, "get_model_artifact", lambda version=None: missing)
+    session = LLMSession()
+    assert session.warm_up() is False
+    state = session.scorer_state()
+    assert state["loaded"] is False and not state["warmed_up"]
+    assert "missing.json" in state["error"]
+
+
+def test_concurrent_first_access_loads_once(monkeypatch):
+    session = LLMSession()
+    loads, gate = [], threading.Barrier(4)
+
+    def load_scorer():
+        loads.append(1)
+        time.sleep(0.05)
+        session._scorer = object()
+        return session._scorer
+
+    monkeypatch.setattr(session, "load_scorer", load_scorer)
+
+    def first_request():
+        gate.wait()
+        return session.scorer
+
+    threads = [threading.Thread(target=first_request) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(loads) == 1
+
+
+class _FakeSession:
+    def __init__(self, warmed: bool):
+        self.warmed = warmed
+
+    def scorer_state(self):
+        return {"loaded": True, "warmed_up": self.warmed, "error": None}
+
+
+def test_ready_reports_model_and_database(monkeypatch):
+    client = TestClient(main.app)
+    monkeypatch.setattr(main, "get_llm_session", lambda: _FakeSession(warmed=True))
+    resp = client.get("/ready")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["ready"] is True
+    assert body["database"]["ok"] is True
+    assert body["model"]["warmed_up"] is True
+
+    monkeypatch.setattr(main, "get_llm_session", lambda: _FakeSession(warmed=False))
+    resp = client.get("/ready")
+    assert resp.status_code == 503
+    assert resp.json()["ready"] is False
+    # Liveness is unaffected by readiness
+    assert client.get("/health").status_code == 200
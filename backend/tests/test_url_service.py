@@ -0,0 +1,150 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.services.url_service as url_service
+from app.core.canonical import get_canonical_rules
+from app.core.config import settings
+from app.infrastructure.base import Base
+from app.infrastructure.llm import LLMSession
+from app.infrastructure.models import RiskUrl
+from app.services.url_service import UrlRescoreWorker, UrlRiskService
+
+
+class _FakeScorer:
+    def __init__(self, version, score=0.9):
+        self.version = version
+        self.value = score
+        self.calls = 0
+
+    def score(self, url):
+        self.calls += 1
+        return self.value
+
+    def score_many(self, urls):
+        self.calls += len(urls)
+        return [self.value] * len(urls)
+
+
+class _FakeSession:
+    TH_HIGH, TH_MED, TH_LOW = LLMSession.TH_HIGH, LLMSession.TH_MED, LLMSession.TH_LOW
+    client = None
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    # Only risk_url: the other tables reuse index names, which SQLite keeps schema-wide
+    Base.metadata.create_all(engine, tables=[RiskUrl.__table__])
+    llm = _FakeSession(_FakeScorer("v1"))
+    monkeypatch.setattr(url_service, "get_llm_session", lambda: llm)
+    return sessionmaker(bind=engine, expire_on_commit=False), llm
+
+
+def test_check_reuses_stored_score_of_current_model(db):
+    factory, llm = db
+    svc = UrlRiskService(factory())
+    entity = svc.check_or_create(url="https://paypal.verify-login.xyz/a")
+    assert entity.ml_score == pytest.approx(0.9) and entity.ml_model_version == "v1"
+    assert entity.risk_level == 4 and entity.notes is None and llm.scorer.calls == 1
+
+    # A reset risk level is restored from the stored score without running the model again
+    svc.set_risk_level(url="https://paypal.verify-login.xyz/a", risk_level=0)
+    assert svc.check_or_create(url="https://paypal.verify-login.xyz/a").risk_level == 4
+    assert llm.scorer.calls == 1
+
+
+def test_rescore_updates_only_stale_rows(db):
+    factory, llm = db
+    svc = UrlRiskService(factory())
+    svc.check_or_create(url="https://a.example.com/")
+    svc.check_or_create(url="https://b.example.com/")
+    # An analyst overrides b; the model's later opinion must not undo that
+    svc.set_risk_level(url="https://b.example.com/", risk_level=1)
+
+    llm.scorer = _FakeScorer("v2", score=0.05)
+    worker = UrlRescoreWorker(factory, batch_size=1)
+    assert worker.run_once() == 1 and worker.run_once() == 1 and worker.run_once() == 0
+    assert worker.stats["rescored"] == 2 and worker.stats["model_version"] == "v2"
+
+    a, b = svc.get(url="https://a.example.com/"), svc.get(url="https://b.example.com/")
+    assert (a.ml_model_version, b.ml_model_version) == ("v2", "v2")
+    assert a.ml_score == pytest.approx(0.05) and a.risk_level == 1
+    assert b.risk_level == 1 and worker.stats["risk_level_changed"] == 1
+
+
+def test_batch_import_writes_in_bulk(db):
+    factory, _ = db
+    svc = UrlRiskService(factory())
+    svc.check_or_create(url="https://known.example.com/")
+    summary = svc.batch_import([
+        ("https://known.example.com/", 3, 1, "seen in campaign"),
+        ("http://new.example.org/login", None, None, None),
+        ("", 2, None, None),
+        ("HTTP://NEW.example.org:80/login", 4, None, None),  # same row as the second item
+    ])
+    assert summary["total"] == 4 and summary["succeeded"] == 3 and summary["failed"] == 1
+    assert summary["errors"] == [{"input": "", "error": "URL cannot be empty"}]
+    known = svc.get(url="https://known.example.com/")
+    assert known.risk_level == 3 and known.phishing_flag == 1 and known.notes == "seen in campaign"
+    assert svc.get(url="http://new.example.org/login").risk_level == 4
+
+
+@pytest.fixture
+def canonical(monkeypatch):
+    monkeypatch.setattr(settings, "url_canonical", True)
+    get_canonical_rules.cache_clear()
+    yield
+    get_canonical_rules.cache_clear()
+
+
+def test_tracking_variant_resolves_to_existing_row(db, canonical):
+    factory, llm = db
+    svc = UrlRiskService(factory())
+    first = svc.check_or_create(url="https://login.example-bank.xyz/verify?id=7")
+    variant = svc.check_or_create(url="https://login.example-bank.xyz/verify/?utm_source=sms&id=7&fbclid=abc")
+    # Same row, scored once, still stored under the URL as first seen
+    assert variant.id == first.id and llm.scorer.calls == 1
+    assert variant.full_url == first.full_url and variant.canonical_sha256 == first.canonical_sha256
+
+    entity, already = svc.report(url="https://login.example-bank.xyz/verify?id=7&utm_medium=x")
+    assert entity.id == first.id and entity.report_count == 1 and not already
+    assert svc.set_notes(url="https://login.example-bank.xyz/verify?gclid=1&id=7", notes="campaign")
+    assert svc.get(url="https://login.example-bank.xyz/verify?id=7").notes == "campaign"
+
+
+def test_lookups_do_not_backfill_the_canonical_hash(db, monkeypatch):
+    factory, llm = db
+    svc = UrlRiskService(factory())
+    svc.check_or_create(url="https://login.example-bank.xyz/verify?id=7")
+    assert svc.get(url="https://login.example-bank.xyz/verify?id=7").canonical_sha256 is None
+
+    monkeypatch.setattr(settings, "url_canonical", True)
+    get_canonical_rules.cache_clear()
+    try:
+        reader = UrlRiskService(factory())
+        commits = []
+        monkeypatch.setattr(reader.session, "commit", lambda: commits.append(1))
+        assert reader.get(url="https://login.example-bank.xyz/verify?id=7").canonical_sha256 is None
+        assert commits == []
+        # The next write to the row records it
+        assert svc.set_notes(url="https://login.example-bank.xyz/verify?id=7", notes="seen")
+        assert svc.get(url="https://login.example-bank.xyz/verify?utm_source=x&id=7").notes == "seen"
+    finally:
+        get_canonical_rules.cache_clear()
+
+
+def test_rescore_uses_the_full_model_behind_a_cascade(scorer):
+    from app.infrastructure.ml_cascade import CascadeScorer
+    from app.infrastructure.ml_model import MicroBatcher
+
+    batcher = MicroBatcher(CascadeScorer(scorer))
+    try:
+        assert url_service.full_model_scorer(batcher) is scorer
+        assert url_service.full_model_scorer(scorer) is scorer
+    finally:
+        batcher.close()
@@ -0,0 +1,50 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from AI_model.vocab_array import ArrayVocab, build_hash_index
+from AI_model.vocab_bundle import VOCABS, build_bundle, load_meta
+
+
+def test_array_vocab_matches_dict(urlnet_meta):
+    vocab = urlnet_meta["WORD2ID"]
+    arr = ArrayVocab.from_dict(vocab)
+    keys = list(vocab)[:200] + ["not-a-word", "", "ü"]
+    assert [arr.get(k, 1) for k in keys] == [vocab.get(k, 1) for k in keys]
+    assert arr.lookup_many(keys, 1).tolist() == [vocab.get(k, 1) for k in keys]
+    assert len(arr) == len(vocab) and dict(arr.items()) == vocab
+    assert arr.max_id == max(vocab.values())
+    with pytest.raises(KeyError):
+        arr["not-a-word"]
+
+
+def test_colliding_hashes_are_rejected(monkeypatch):
+    import AI_model.vocab_array as va
+
+    monkeypatch.setattr(va, "key_hash", lambda key: 7)
+    with pytest.raises(ValueError):
+        build_hash_index({"a": 1, "b": 2})
+
+
+def test_bundle_arrays_are_memory_mapped(tmp_path, urlnet_meta, urlnet_paths):
+    meta_path = tmp_path / "meta.json"
+    shutil.copyfile(urlnet_paths[0], meta_path)
+    build_bundle(meta_path)
+    loaded = load_meta(meta_path, arrays=True)
+    for name in VOCABS:
+        assert isinstance(loaded[name], ArrayVocab) and loaded[name].shared
+        assert dict(loaded[name].items()) == urlnet_meta[name]
+    assert isinstance(loaded["WORD2ID"].hashes, np.ndarray)
+
+
+def test_scorer_scores_match_with_dict_vocabs(monkeypatch, urlnet_paths, scorer):
+    from app.core.config import llm_settings
+    from app.infrastructure.ml_model import URLScorer
+
+    monkeypatch.setattr(llm_settings, "ml_vocab_arrays", False)
+    plain = URLScorer(*urlnet_paths)
+    urls = ["https://www.google.com/", "http://paypal.verify.xyz/login", "http://例え.jp/ü?q=1"]
+    assert scorer.vocab_stats["kind"] == "array" and plain.vocab_stats["kind"] == "dict"
+    assert sum(scorer.vocab_stats["bytes"].values()) < sum(plain.vocab_stats["bytes"].values())
+    assert scorer.score_many(urls) == plain.score_many(urls)
@@ -0,0 +1,51 @@
+import json
+import shutil
+
+from AI_model.vocab_bundle import VOCABS, build_bundle, load_meta
+
+
+def _copy_meta(tmp_path, meta_path):
+    target = tmp_path / "meta.json"
+    shutil.copyfile(meta_path, target)
+    return target
+
+
+def test_bundle_round_trips_meta(tmp_path, urlnet_meta, urlnet_paths):
+    meta_path = _copy_meta(tmp_path, urlnet_paths[0])
+    assert load_meta(meta_path) is None  # no bundle yet
+
+    build_bundle(meta_path)
+    loaded = load_meta(meta_path)
+    for name in VOCABS:
+        assert loaded[name] == urlnet_meta[name]
+    for name in ("MAX_LEN", "MAX_WORDS", "MAX_TOK_CHAR"):
+        assert loaded[name] == urlnet_meta.get(name, loaded[name])
+
+
+def test_bundle_handles_keys_with_separator_characters(tmp_path):
+    meta_path = tmp_path / "meta.json"
+    vocab = {"a\nb": 1, "\x00": 2, "x\x1fy": 3, "ü": 4}
+    meta_path.write_text(json.dumps({name: vocab for name in VOCABS}), encoding="utf-8")
+    build_bundle(meta_path)
+    assert load_meta(meta_path)["WORD2ID"] == vocab
+
+
+def test_stale_bundle_is_ignored(tmp_path, urlnet_paths):
+    meta_path = _copy_meta(tmp_path, urlnet_paths[0])
+    build_bundle(meta_path)
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    meta["WORD2ID"]["brand-new-word"] = len(meta["WORD2ID"]) + 1
+    meta_path.write_text(json.dumps(meta), encoding="utf-8")
+    assert load_meta(meta_path) is None
+
+
+def test_scorer_prefers_bundle(tmp_path, urlnet_paths, scorer):
+    from app.infrastructure.ml_model import URLScorer
+
+    meta_path = _copy_meta(tmp_path, urlnet_paths[0])
+    build_bundle(meta_path)
+    bundled = URLScorer(str(meta_path), urlnet_paths[1])
+    assert bundled.vocab_source == "bundle"
+    assert scorer.vocab_source == "json"
+    assert bundled.score_many(["https://www.google.com/", "http://paypal.verify.xyz/login"]) == \
+        scorer.score_many(["https://www.google.com/", "http://paypal.verify.xyz/login"])